@@ -0,0 +1,90 @@
+"""
+Overlapped blocking I/O for Hugo-Obsidian sync.
+
+On FUSE and cloud-backed filesystems every open, write, mkdir and copy
+waits on the network, so syncing posts one after another spends most of
+its time idle. run_ordered() runs blocking calls on a bounded thread pool
+driven by an asyncio event loop, keeping up to `concurrency` of them in
+flight. Calls that share an ordering key never overlap and run in the
+order they were given, so writes into one directory stay ordered.
+Results are returned in input order for the caller to apply on its own
+thread.
+"""
+
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Hashable, Iterable, List, Optional, Tuple, TypeVar
+
+T = TypeVar("T")
+
+
+async def _run(
+    calls: Iterable[Tuple[Hashable, Callable[[], T]]], concurrency: int
+) -> Tuple[List[T], Dict[str, float]]:
+    loop = asyncio.get_running_loop()
+    slots = asyncio.Semaphore(concurrency)
+    last: Dict[Hashable, asyncio.Future] = {}
+    scheduled: List[asyncio.Future] = []
+    running = peak = 0
+    busy = 0.0
+    failed = False
+    started = time.perf_counter()
+
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+
+        async def run(call: Callable[[], T], previous: Optional[asyncio.Future]) -> T:
+            nonlocal running, peak, busy, failed
+            try:
+                if previous is not None:
+                    # Only ordering matters here; its error is raised by gather
+                    await asyncio.wait([previous])
+                if failed:
+                    return None  # Not started; gather raises the first error
+                running += 1
+                peak = max(peak, running)
+                start = time.perf_counter()
+                try:
+                    return await loop.run_in_executor(executor, call)
+                except BaseException:
+                    failed = True
+                    raise
+                finally:
+                    busy += time.perf_counter() - start
+                    running -= 1
+            finally:
+                slots.release()
+
+        for key, call in calls:
+            # Taking the slot before scheduling bounds both the calls in
+            # flight and how far ahead `calls` is consumed
+            await slots.acquire()
+            if failed:
+                slots.release()
+                break
+            task = asyncio.ensure_future(run(call, last.get(key)))
+            last[key] = task
+            scheduled.append(task)
+
+        results = await asyncio.gather(*scheduled)
+
+    elapsed = time.perf_counter() - started
+    return results, {
+        "io_tasks": len(scheduled),
+        "io_peak": peak,
+        "io_average": busy / elapsed if elapsed > 0 else 0.0,
+    }
+
+
+def run_ordered(
+    calls: Iterable[Tuple[Hashable, Callable[[], T]]], concurrency: int
+) -> Tuple[List[T], Dict[str, float]]:
+    """Run (ordering key, blocking call) pairs with up to concurrency in flight.
+
+    Returns the call results in input order and the achieved concurrency:
+    io_tasks (calls run), io_peak (most calls in flight at once) and
+    io_average (call time divided by wall time). The first error raised
+    by a call stops further calls from starting and is re-raised once the
+    running ones finish.
+    """
+    return asyncio.run(_run(calls, concurrency))
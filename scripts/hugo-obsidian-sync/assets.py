@@ -0,0 +1,188 @@
+"""
+Bundle asset transfer for Hugo-Obsidian sync.
+
+Assets are the files next to a directory-style post (images, attachments).
+Each one is fingerprinted on both sides like a post, so syncing a post only
+copies the assets that are new or whose content differs from the target.
+
+Assets are transferred according to the asset_transfer mode:
+  copy      full data copy (shutil.copy2)
+  hardlink  hard link to the source file; both sides share one inode
+  reflink   copy-on-write clone (FICLONE), e.g. on Btrfs or XFS
+  auto      reflink where supported, otherwise copy
+Every mode falls back to a copy when linking or cloning fails, such as
+across devices or on filesystems without clone support. Each mode builds
+the asset under a temp name and moves it over the target (see
+durability.py), so a target is never left half copied.
+"""
+
+import os
+import shutil
+from collections import Counter
+from pathlib import Path
+from typing import Dict, Optional
+
+try:
+    import fcntl
+except ImportError:  # Not available on Windows
+    fcntl = None
+
+from bundles import is_bundle_post
+from durability import is_temp_name, replace, temp_file
+from state import (
+    Fingerprint,
+    get_asset_fingerprints,
+    get_file_stat,
+    get_fingerprint,
+    record_asset_fingerprints,
+)
+from timing import count
+
+
+ASSET_TRANSFER_MODES = ("copy", "hardlink", "reflink", "auto")
+
+# ioctl request number of FICLONE from <linux/fs.h>: _IOW(0x94, 9, int)
+FICLONE = 0x40049409
+
+
+def _reflink(source: Path, dest: Path) -> None:
+    """Clone source into dest with the FICLONE ioctl, copying metadata like copy2."""
+    if fcntl is None:
+        raise OSError("FICLONE is not supported on this platform")
+    fd, temp = temp_file(dest)
+    try:
+        with open(source, "rb") as src, os.fdopen(fd, "wb") as dst:
+            fcntl.ioctl(dst.fileno(), FICLONE, src.fileno())
+        shutil.copystat(source, temp)
+        replace(temp, dest)
+    except BaseException:
+        temp.unlink(missing_ok=True)
+        raise
+
+
+def _hardlink(source: Path, dest: Path) -> None:
+    """Replace dest with a hard link to source."""
+    # os.link needs a free name: take a unique one and give it back
+    fd, temp = temp_file(dest)
+    os.close(fd)
+    temp.unlink()
+    os.link(source, temp)
+    try:
+        replace(temp, dest, data=False)
+    except BaseException:
+        temp.unlink(missing_ok=True)
+        raise
+
+
+def _copy(source: Path, dest: Path) -> None:
+    """Copy source over dest with shutil.copy2."""
+    fd, temp = temp_file(dest)
+    os.close(fd)
+    try:
+        shutil.copy2(source, temp)
+        replace(temp, dest)
+    except BaseException:
+        temp.unlink(missing_ok=True)
+        raise
+
+
+def transfer_asset(source: Path, dest: Path, mode: str = "copy") -> str:
+    """Transfer one asset file and return how it was done.
+
+    Returns "reflink", "hardlink" or "copy"; a failed reflink or hard link
+    falls back to a copy.
+    """
+    if mode in ("reflink", "auto"):
+        try:
+            _reflink(source, dest)
+            return "reflink"
+        except OSError:
+            pass
+    elif mode == "hardlink":
+        try:
+            _hardlink(source, dest)
+            return "hardlink"
+        except OSError:
+            pass
+    _copy(source, dest)
+    return "copy"
+
+
+def sync_assets(
+    post_path: Path,
+    target_dir: Path,
+    post_id: str,
+    state: Dict,
+    source_side: str,
+    target_side: str,
+    stats: Optional[Counter] = None,
+    transfer: str = "copy",
+) -> None:
+    """Transfer the assets next to post_path into target_dir where they differ.
+
+    An asset is skipped when the target already has a file with the same
+    hash. A target copy that changed since the last sync is never
+    overwritten: if the source is unchanged, the target's change is kept
+    and left for a sync in the other direction; if both changed, the
+    asset is reported as a conflict. Their recorded fingerprints are left
+    as they were, so the change is still seen as one later. Missing
+    targets are always copied. Recorded stat tuples let unchanged files on
+    either side be recognised without reading them.
+
+    If stats is given, the asset bytes copied and skipped are added to
+    stats["asset_bytes_copied"] and stats["asset_bytes_skipped"], and
+    conflicting assets to stats["asset_conflicts"]. transfer is one of
+    ASSET_TRANSFER_MODES.
+    """
+    stored_source = get_asset_fingerprints(state, source_side, post_id)
+    stored_target = get_asset_fingerprints(state, target_side, post_id)
+    source_fingerprints: Dict[str, Fingerprint] = {}
+    target_fingerprints: Dict[str, Fingerprint] = {}
+
+    for asset in sorted(post_path.parent.iterdir()):
+        if (
+            not asset.is_file()
+            or asset == post_path
+            or is_bundle_post(asset)
+            or is_temp_name(asset.name)  # Left over by an interrupted transfer
+        ):
+            continue
+        name = asset.name
+        source_hash, source_stat = get_fingerprint(asset, *stored_source.get(name, (None, None)))
+        if source_stat is None:
+            continue
+
+        dest = target_dir / name
+        stored_source_hash = stored_source.get(name, (None, None))[0]
+        stored_target_hash = stored_target.get(name, (None, None))[0]
+        target_fingerprint = get_fingerprint(dest, *stored_target.get(name, (None, None)))
+        source_fingerprint: Optional[Fingerprint] = (source_hash, source_stat)
+        counter: Optional[str] = "asset_bytes_skipped"
+        if target_fingerprint[1] is not None and target_fingerprint[0] == source_hash:
+            pass
+        elif target_fingerprint[1] is not None and stored_target_hash not in (
+            None, target_fingerprint[0]
+        ):
+            # Changed on the target side since the last sync: keep it, and
+            # keep the recorded fingerprints so it still reads as changed
+            target_fingerprint = stored_target[name]
+            counter = None
+            if stored_source_hash != source_hash:
+                print(f"  Asset conflict: {name} changed on both sides, not copied")
+                if stats is not None:
+                    stats["asset_conflicts"] += 1
+                source_fingerprint = stored_source.get(name)
+        else:
+            transfer_asset(asset, dest, transfer)
+            count("assets_transferred")
+            target_fingerprint = (source_hash, get_file_stat(dest))
+            counter = "asset_bytes_copied"
+        if stats is not None and counter is not None:
+            stats[counter] += source_stat[0]
+
+        if source_fingerprint is not None:
+            source_fingerprints[name] = source_fingerprint
+        target_fingerprints[name] = target_fingerprint
+
+    record_asset_fingerprints(state, source_side, post_id, source_fingerprints)
+    record_asset_fingerprints(state, target_side, post_id, target_fingerprints)
@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+"""
+Benchmark scan_and_fingerprint against the number of worker threads.
+
+Builds a synthetic Hugo tree in a temp directory and times a cold scan
+(empty state, so every post is hashed) for each worker count. Use
+--latency to add a per-file delay that mimics network-mounted or
+cloud-backed vaults, where threads pay off the most.
+
+Usage:
+    python bench/bench_scan.py
+    python bench/bench_scan.py --posts 5000 --latency 5 --jobs 1 2 4 8 16
+"""
+
+import argparse
+import shutil
+import sys
+import tempfile
+import time
+from pathlib import Path
+from unittest import mock
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import state  # noqa: E402
+from sync import scan_and_fingerprint  # noqa: E402
+
+
+def build_tree(root: Path, posts: int, body_size: int) -> None:
+    """Create a mix of directory-style and single-file posts."""
+    body = ("lorem ipsum dolor sit amet " * (body_size // 27 + 1))[:body_size]
+    for i in range(posts):
+        content = f"---\ntitle: Post {i}\n---\n{body}\n"
+        if i % 2:
+            post_dir = root / f"section-{i % 10}" / f"post-{i}"
+            post_dir.mkdir(parents=True)
+            (post_dir / "index.md").write_text(content)
+        else:
+            section = root / f"section-{i % 10}"
+            section.mkdir(parents=True, exist_ok=True)
+            (section / f"post-{i}.md").write_text(content)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--posts", type=int, default=2000)
+    parser.add_argument("--body-size", type=int, default=8192)
+    parser.add_argument("--latency", type=float, default=0.0, help="Extra ms per file read")
+    parser.add_argument("--jobs", type=int, nargs="+", default=[1, 2, 4, 8])
+    args = parser.parse_args()
+
+    root = Path(tempfile.mkdtemp())
+    try:
+        build_tree(root, args.posts, args.body_size)
+        real_hash = state.get_file_hash
+
+        def slow_hash(path):
+            time.sleep(args.latency / 1000)
+            return real_hash(path)
+
+        print(f"{args.posts} posts, {args.body_size} bytes each, {args.latency} ms latency")
+        baseline = None
+        with mock.patch.object(state, "get_file_hash", slow_hash):
+            for jobs in args.jobs:
+                start = time.perf_counter()
+                posts, _ = scan_and_fingerprint(root, {}, "hugo", jobs)
+                elapsed = time.perf_counter() - start
+                baseline = baseline or elapsed
+                print(
+                    f"  jobs={jobs:<3} {elapsed * 1000:9.1f} ms  "
+                    f"{len(posts)} posts  x{baseline / elapsed:.2f}"
+                )
+    finally:
+        shutil.rmtree(root)
+
+
+if __name__ == "__main__":
+    main()
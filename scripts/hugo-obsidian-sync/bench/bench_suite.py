@@ -0,0 +1,188 @@
+#!/usr/bin/env python3
+"""
+Benchmark suite: times the main stages of a sync on generated trees.
+
+Generates a Hugo site and an Obsidian vault with bench/generate.py and
+times, best of --repeat runs:
+  scan_posts        walking the Hugo site and the vault
+  hash              hashing every post on both sides
+  hugo_to_obsidian  converting every Hugo post
+  obsidian_to_hugo  converting every vault note
+  sync_cold         a full --pull into an empty vault with no state or cache
+  sync_noop         a second sync with nothing to do
+
+Results are written as JSON (to stdout or --output). --baseline prints
+how a previous results file compares.
+
+Usage:
+    python bench/bench_suite.py --output results.json
+    python bench/bench_suite.py --posts 5000 --languages en fr --baseline results.json
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Callable, Dict, List, Sequence
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from converters import hugo_to_obsidian, obsidian_to_hugo  # noqa: E402
+from generate import Params, generate_site, generate_vault  # noqa: E402
+from state import get_file_hash  # noqa: E402
+from sync import main as sync_main, scan_posts  # noqa: E402
+
+
+def measure(func: Callable[[], object], repeat: int, setup: Callable[[], None] = None) -> Dict:
+    """Time func repeat times, calling setup (untimed) before each run."""
+    runs: List[float] = []
+    for _ in range(repeat):
+        if setup:
+            setup()
+        start = time.perf_counter()
+        func()
+        runs.append(time.perf_counter() - start)
+    return {"best": min(runs), "median": statistics.median(runs), "runs": runs}
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=Path(__file__).resolve().parent,
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return ""
+
+
+def run_suite(params: Params, repeat: int, sync_args: Sequence[str] = ()) -> Dict:
+    root = Path(tempfile.mkdtemp())
+    try:
+        site = root / "site"
+        vault = root / "vault"
+        hugo_files = generate_site(site, params)
+        vault_files = generate_vault(vault, params)
+        hugo_texts = [path.read_text() for path in hugo_files]
+        vault_texts = [path.read_text() for path in vault_files]
+
+        results = {
+            "scan_posts": measure(lambda: (scan_posts(site), scan_posts(vault)), repeat),
+            "hash": measure(
+                lambda: [get_file_hash(path) for path in hugo_files + vault_files], repeat
+            ),
+            "hugo_to_obsidian": measure(
+                lambda: [hugo_to_obsidian(text) for text in hugo_texts], repeat
+            ),
+            "obsidian_to_hugo": measure(
+                lambda: [obsidian_to_hugo(text) for text in vault_texts], repeat
+            ),
+        }
+
+        target = root / "target"
+        state_file = root / "state.json"
+        config = root / "config.yaml"
+        config.write_text(
+            f"hugo_content: {site}\nobsidian_vault: {target}\nstate_file: {state_file}\n"
+        )
+        argv = ["--config", str(config), "--pull", *sync_args]
+
+        def reset():
+            shutil.rmtree(target, ignore_errors=True)
+            state_file.unlink(missing_ok=True)
+            # The conversion cache lives next to the state; a cold run has none
+            for name in ("conversions.db", "conversions.db-wal", "conversions.db-shm"):
+                state_file.with_name(name).unlink(missing_ok=True)
+
+        def sync():
+            with contextlib.redirect_stdout(io.StringIO()):
+                sync_main(argv)
+
+        results["sync_cold"] = measure(sync, repeat, setup=reset)
+        results["sync_noop"] = measure(sync, repeat)
+
+        return {
+            "meta": {
+                "commit": git_commit(),
+                "python": platform.python_version(),
+                "platform": platform.platform(),
+                "date": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            },
+            "params": params.to_dict(),
+            "sync_args": list(sync_args),
+            "files": {"hugo": len(hugo_files), "obsidian": len(vault_files)},
+            "results": results,
+        }
+    finally:
+        shutil.rmtree(root)
+
+
+def print_comparison(current: Dict, baseline: Dict) -> None:
+    if baseline.get("params") != current["params"]:
+        print("warning: baseline was run with different parameters", file=sys.stderr)
+    print(f"{'stage':<18} {'baseline':>10} {'current':>10} {'speedup':>8}", file=sys.stderr)
+    for stage, result in current["results"].items():
+        before = baseline.get("results", {}).get(stage)
+        if before is None:
+            continue
+        print(
+            f"{stage:<18} {before['best'] * 1000:8.1f}ms {result['best'] * 1000:8.1f}ms "
+            f"{before['best'] / result['best']:7.2f}x",
+            file=sys.stderr,
+        )
+
+
+def main():
+    defaults = Params()
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--posts", type=int, default=defaults.posts)
+    parser.add_argument("--directory-ratio", type=float, default=defaults.directory_ratio)
+    parser.add_argument("--languages", nargs="*", default=list(defaults.languages))
+    parser.add_argument("--assets", type=int, default=defaults.assets)
+    parser.add_argument("--asset-size", type=int, default=defaults.asset_size)
+    parser.add_argument("--paragraphs", type=int, default=defaults.paragraphs)
+    parser.add_argument("--shortcode-density", type=float, default=defaults.shortcode_density)
+    parser.add_argument("--seed", type=int, default=defaults.seed)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument(
+        "--convert-workers", type=int, default=1, help="Passed to the timed syncs"
+    )
+    parser.add_argument("--output", type=Path, help="Write results here instead of stdout")
+    parser.add_argument("--baseline", type=Path, help="Earlier results to compare against")
+    args = parser.parse_args()
+
+    params = Params(
+        posts=args.posts,
+        directory_ratio=args.directory_ratio,
+        languages=tuple(args.languages),
+        assets=args.assets,
+        asset_size=args.asset_size,
+        paragraphs=args.paragraphs,
+        shortcode_density=args.shortcode_density,
+        seed=args.seed,
+    )
+    sync_args = ["--convert-workers", str(args.convert_workers)]
+    results = run_suite(params, args.repeat, sync_args)
+
+    output = json.dumps(results, indent=2)
+    if args.output:
+        args.output.write_text(output + "\n")
+    else:
+        print(output)
+    if args.baseline:
+        print_comparison(results, json.loads(args.baseline.read_text()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""
+Benchmark the post walker on a synthetic vault.
+
+Builds a vault-like tree in a temp directory: bundle posts with images,
+single-file notes, an attachments folder, and .obsidian/.git folders full
+of files that are not posts. It then times the previous rglob-based scan
+and scan_posts with a cold and a warm directory cache.
+
+Usage:
+    python bench/bench_walk.py
+    python bench/bench_walk.py --files 50000 --repeat 5
+"""
+
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from sync import get_post_id, scan_posts  # noqa: E402
+
+
+def build_vault(root: Path, files: int) -> int:
+    """Create about `files` files, a tenth of them posts. Returns the file count."""
+    created = 0
+    posts = files // 10
+    for i in range(posts):
+        section = root / f"section-{i % 20}"
+        if i % 2:
+            bundle = section / f"post-{i}"
+            bundle.mkdir(parents=True, exist_ok=True)
+            (bundle / f"post-{i}.md").write_text(f"post {i}\n")
+            (bundle / "featured.png").write_bytes(b"png")
+            created += 2
+        else:
+            section.mkdir(parents=True, exist_ok=True)
+            (section / f"note-{i}.md").write_text(f"note {i}\n")
+            created += 1
+
+    # The rest is spread over folders the walker should not descend into
+    # (.git, .obsidian) and an attachments folder of images
+    remaining = files - created
+    for i in range(remaining):
+        if i % 3 == 0:
+            folder = root / ".git" / "objects" / f"{i % 256:02x}"
+        elif i % 3 == 1:
+            folder = root / ".obsidian" / "plugins" / f"plugin-{i % 50}"
+        else:
+            folder = root / "attachments" / f"batch-{i % 40}"
+        folder.mkdir(parents=True, exist_ok=True)
+        (folder / f"file-{i}.bin").write_bytes(b"x")
+    created += remaining
+
+    # Age every directory so the cache may trust its mtime
+    for dirpath, _, _ in os.walk(root):
+        os.utime(dirpath, ns=(0, 0))
+    return created
+
+
+def rglob_scan(directory: Path):
+    """The walk scan_posts did before: rglob over everything."""
+    md_files = [p for p in directory.rglob("*.md") if not p.name.startswith("_")]
+    return {get_post_id(p, directory): p for p in sorted(md_files)}
+
+
+def timed(label: str, repeat: int, func):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        best = min(best, time.perf_counter() - start)
+    print(f"  {label:<28} {best * 1000:9.1f} ms  {len(result)} posts")
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--files", type=int, default=50000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    root = Path(tempfile.mkdtemp())
+    try:
+        created = build_vault(root, args.files)
+        ignore = [".git", ".obsidian", ".trash", "attachments"]
+        print(f"{created} files")
+
+        timed("rglob (previous)", args.repeat, lambda: rglob_scan(root))
+        timed("scandir, default ignores", args.repeat, lambda: scan_posts(root))
+        timed("scandir, + attachments", args.repeat, lambda: scan_posts(root, ignore=ignore))
+
+        dir_cache = {}
+        scan_posts(root, ignore=ignore, dir_cache=dir_cache)
+        timed(
+            "scandir, warm dir cache",
+            args.repeat,
+            lambda: scan_posts(root, ignore=ignore, dir_cache=dir_cache),
+        )
+    finally:
+        shutil.rmtree(root)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,136 @@
+"""
+Deterministic synthetic Hugo sites and Obsidian vaults for benchmarks.
+
+The same parameters and seed always produce the same files (only mtimes
+differ between runs), so timings from different commits are comparable.
+
+Knobs:
+  posts             number of posts
+  directory_ratio   fraction of posts that are bundles (directories)
+  languages         bundle languages; ("en", "fr") writes index.en.md and
+                    index.fr.md, an empty tuple writes index.md
+  assets            assets per bundle
+  asset_size        bytes per asset
+  paragraphs        paragraphs per post body
+  shortcode_density fraction of paragraphs that carry a convertible
+                    construct (ref link, image, alert or mermaid diagram)
+"""
+
+import random
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+_WORDS = (
+    "lorem ipsum dolor sit amet consectetur adipiscing elit sed do eiusmod tempor "
+    "incididunt ut labore et dolore magna aliqua enim ad minim veniam quis nostrud"
+).split()
+
+
+@dataclass
+class Params:
+    posts: int = 1000
+    directory_ratio: float = 0.5
+    languages: Tuple[str, ...] = ()
+    assets: int = 1
+    asset_size: int = 64 * 1024
+    paragraphs: int = 12
+    shortcode_density: float = 0.2
+    seed: int = 0
+
+    def to_dict(self) -> Dict:
+        """Return the parameters as JSON-compatible values."""
+        params = asdict(self)
+        params["languages"] = list(self.languages)
+        return params
+
+
+def _paragraph(rng: random.Random) -> str:
+    return " ".join(rng.choice(_WORDS) for _ in range(rng.randint(30, 90))) + "."
+
+
+def _hugo_construct(rng: random.Random, post_ids: List[str]) -> str:
+    kind = rng.randrange(4)
+    if kind == 0:
+        target = rng.choice(post_ids).split("/")[-1]
+        return f'See [{target}]({{{{< ref "{target}.md" >}}}}) for details.'
+    if kind == 1:
+        return f"![figure](asset-{rng.randrange(4)}.png)"
+    if kind == 2:
+        return f"{{{{< alert >}}}}\n{_paragraph(rng)}\n{{{{< /alert >}}}}"
+    return "{{< mermaid >}}\ngraph LR\n  A --> B\n  B --> C\n{{< /mermaid >}}"
+
+
+def _obsidian_construct(rng: random.Random, post_ids: List[str]) -> str:
+    kind = rng.randrange(4)
+    if kind == 0:
+        target = rng.choice(post_ids).split("/")[-1]
+        return f"See [[{target}]] for details."
+    if kind == 1:
+        return f"![[asset-{rng.randrange(4)}.png]]"
+    if kind == 2:
+        return f"> [!info]\n> {_paragraph(rng)}"
+    return "```mermaid\ngraph LR\n  A --> B\n  B --> C\n```"
+
+
+def _body(rng: random.Random, params: Params, post_ids: List[str], construct) -> str:
+    paragraphs = []
+    for _ in range(params.paragraphs):
+        if rng.random() < params.shortcode_density:
+            paragraphs.append(construct(rng, post_ids))
+        paragraphs.append(_paragraph(rng))
+    return "\n\n".join(paragraphs) + "\n"
+
+
+def _layout(params: Params) -> List[Tuple[str, bool]]:
+    """Return (post ID, is bundle) for every post, spread over sections."""
+    rng = random.Random(params.seed)
+    return [
+        (f"section-{i % 20}/post-{i:06d}", rng.random() < params.directory_ratio)
+        for i in range(params.posts)
+    ]
+
+
+def generate_site(root: Path, params: Params) -> List[Path]:
+    """Write a Hugo content tree under root and return its markdown files."""
+    return _generate(root, params, hugo=True)
+
+
+def generate_vault(root: Path, params: Params) -> List[Path]:
+    """Write an Obsidian vault under root and return its markdown files.
+
+    Bundles use the vault layout (post/post.md), one note per language
+    named post.<lang>.md when languages are set.
+    """
+    return _generate(root, params, hugo=False)
+
+
+def _generate(root: Path, params: Params, hugo: bool) -> List[Path]:
+    layout = _layout(params)
+    post_ids = [post_id for post_id, _ in layout]
+    rng = random.Random(params.seed + 1)
+    construct = _hugo_construct if hugo else _obsidian_construct
+    asset = bytes(rng.randrange(256) for _ in range(min(params.asset_size, 4096)))
+    asset = (asset * (params.asset_size // max(len(asset), 1) + 1))[:params.asset_size]
+
+    files = []
+    for post_id, is_bundle in layout:
+        name = post_id.split("/")[-1]
+        front_matter = f"---\ntitle: {name}\ndate: 2024-01-01\n---\n\n"
+        if is_bundle:
+            bundle = root / post_id
+            bundle.mkdir(parents=True, exist_ok=True)
+            stem = "index" if hugo else name
+            names = [f"{stem}.{lang}.md" for lang in params.languages] or [f"{stem}.md"]
+            for md_name in names:
+                path = bundle / md_name
+                path.write_text(front_matter + _body(rng, params, post_ids, construct))
+                files.append(path)
+            for i in range(params.assets):
+                (bundle / f"asset-{i}.png").write_bytes(asset)
+        else:
+            path = root / f"{post_id}.md"
+            path.parent.mkdir(parents=True, exist_ok=True)
+            path.write_text(front_matter + _body(rng, params, post_ids, construct))
+            files.append(path)
+    return files
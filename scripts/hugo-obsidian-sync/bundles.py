@@ -0,0 +1,60 @@
+"""
+Page bundle layout for Hugo-Obsidian sync.
+
+A bundle is a directory holding a post and its assets. Hugo names the
+post index.md, or index.<lang>.md for each translation; the vault names
+it after the directory, <bundle>.md or <bundle>.<lang>.md:
+
+  Hugo                      Obsidian
+  my-post/index.md          my-post/my-post.md        post ID my-post
+  my-post/index.fr.md       my-post/my-post.fr.md     post ID my-post.fr
+  my-post/featured.png      my-post/featured.png      (shared by both)
+
+A translation's post ID is its bundle's ID plus ".<lang>", the same ID
+Hugo's translation-by-filename gives a single-file post (about.fr.md is
+about.fr). Assets belong to the bundle and are tracked under the bundle
+ID, so they are shared by all translations.
+"""
+
+import re
+from pathlib import Path
+from typing import Optional
+
+# <stem>.<lang>.md, with a language code like fr, pt-br or zh-hans
+_TRANSLATION_FILE = re.compile(r"(?P<stem>.+)\.(?P<lang>[a-z]{2,3}(?:[-_][a-z0-9]+)?)\.md")
+
+
+def translation_language(name: str, bundle_name: str) -> Optional[str]:
+    """Return the language of a bundle's translation file name, or None.
+
+    name is a translation of the bundle named bundle_name when it is
+    index.<lang>.md or <bundle_name>.<lang>.md.
+    """
+    match = _TRANSLATION_FILE.fullmatch(name)
+    if match and match["stem"] in ("index", bundle_name):
+        return match["lang"]
+    return None
+
+
+def bundle_language(path: Path) -> Optional[str]:
+    """Return the language of a bundle post file such as my-post/index.fr.md, or None."""
+    return translation_language(path.name, path.parent.name)
+
+
+def is_bundle_post(path: Path) -> bool:
+    """Return whether path is a bundle's post file, in any language or layout."""
+    return (
+        path.name == "index.md"
+        or path.stem == path.parent.name
+        or bundle_language(path) is not None
+    )
+
+
+def bundle_id(post_id: str, path: Path) -> str:
+    """Return the ID of the bundle a post file belongs to.
+
+    That is post_id without the language suffix of a translation file, and
+    post_id itself for any other post.
+    """
+    language = bundle_language(path)
+    return post_id[:-len(language) - 1] if language else post_id
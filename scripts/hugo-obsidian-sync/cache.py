@@ -0,0 +1,194 @@
+"""
+Persistent conversion cache for Hugo-Obsidian sync.
+
+Converted output is stored in a SQLite database keyed by (direction,
+converter version, source hash), so converting a source that was already
+converted once, e.g. after the state file was reset, is a lookup instead
+of a pass of the converters. The converter version is a hash of
+converters.py: editing a conversion rule changes it, and entries made by
+other versions are dropped when the cache is opened.
+
+The cache is bounded by the total size of the stored outputs, plus a
+small charge per entry. Lookups mark entries as used, and flush() evicts
+the least recently used entries beyond the bound. New entries and use
+times are buffered in memory and written by flush() in one transaction,
+which put() also runs once the buffered outputs reach a few MB (or the
+bound, if smaller), so a first sync of a large site never holds every
+converted post at once.
+The database is only opened once a post is actually converted.
+"""
+
+import hashlib
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import converters
+
+# Default bound on the stored outputs, in bytes
+DEFAULT_CACHE_SIZE = 64 * 1024 * 1024
+
+# Size charged per entry on top of its output, so entries for unchanged
+# sources (stored without output) are bounded too
+_ENTRY_OVERHEAD = 128
+
+# Buffered entry sizes at which put() flushes, unless max_size is smaller
+_FLUSH_SIZE = 4 * 1024 * 1024
+
+# Outputs live in their own table, so marking entries as used and summing
+# their sizes never touches the output pages
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    id INTEGER PRIMARY KEY,
+    direction TEXT NOT NULL,
+    version TEXT NOT NULL,
+    source_hash TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    used INTEGER NOT NULL,
+    UNIQUE (direction, version, source_hash)
+);
+CREATE INDEX IF NOT EXISTS entries_used ON entries (used);
+CREATE TABLE IF NOT EXISTS outputs (id INTEGER PRIMARY KEY, output BLOB NOT NULL);
+"""
+
+# (direction, source hash)
+Key = Tuple[str, str]
+
+
+def _entry_size(output: Optional[bytes]) -> int:
+    """Return the size an entry is charged: its output plus _ENTRY_OVERHEAD."""
+    return _ENTRY_OVERHEAD + (len(output) if output is not None else 0)
+
+
+def converter_version() -> str:
+    """Return a hash of the converters source, which changes with any rule."""
+    return hashlib.md5(Path(converters.__file__).read_bytes()).hexdigest()
+
+
+class ConversionCache:
+    """Size-bounded LRU cache of converted post bytes, stored in SQLite.
+
+    An entry's output is None when the converter left the source as it was;
+    get() then returns the source bytes it is given. Safe to use from
+    several threads.
+    """
+
+    def __init__(
+        self, path: Path, max_size: int = DEFAULT_CACHE_SIZE, version: Optional[str] = None
+    ):
+        self.path = path
+        self.max_size = max_size
+        self.version = version or converter_version()
+        self.hits = 0
+        self.misses = 0
+        self._added: Dict[Key, Optional[bytes]] = {}
+        self._added_size = 0
+        self._used: Dict[int, int] = {}  # entry id -> last use
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+
+    def _connect(self) -> sqlite3.Connection:
+        """Open the database on first use, so runs that convert nothing never do."""
+        if self._conn is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(str(self.path), check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            with conn:
+                conn.executescript(_SCHEMA)
+                stale = conn.execute(
+                    "SELECT id FROM entries WHERE version != ?", (self.version,)
+                ).fetchall()
+                conn.executemany("DELETE FROM entries WHERE id = ?", stale)
+                conn.executemany("DELETE FROM outputs WHERE id = ?", stale)
+            self._conn = conn
+        return self._conn
+
+    def get(self, direction: str, source_hash: str, source: bytes) -> Optional[bytes]:
+        """Return the cached output for a source, or None on a miss."""
+        key = (direction, source_hash)
+        with self._lock:
+            if key in self._added:
+                output = self._added[key]
+            else:
+                row = self._connect().execute(
+                    "SELECT entries.id, output FROM entries "
+                    "LEFT JOIN outputs ON outputs.id = entries.id "
+                    "WHERE direction = ? AND version = ? AND source_hash = ?",
+                    (direction, self.version, source_hash),
+                ).fetchone()
+                if row is None:
+                    self.misses += 1
+                    return None
+                entry_id, output = row
+                self._used[entry_id] = time.time_ns()
+            self.hits += 1
+        return source if output is None else bytes(output)
+
+    def put(self, direction: str, source_hash: str, output: Optional[bytes]) -> None:
+        """Record the output for a source; None means the source was unchanged."""
+        with self._lock:
+            self._added[(direction, source_hash)] = output
+            self._added_size += _entry_size(output)
+            if self._added_size >= min(self.max_size, _FLUSH_SIZE):
+                self._flush()
+
+    def take_counts(self) -> Dict[str, int]:
+        """Return and reset the hit and miss counts as cache_hits/cache_misses."""
+        with self._lock:
+            counts = {"cache_hits": self.hits, "cache_misses": self.misses}
+            self.hits = self.misses = 0
+        return counts
+
+    def flush(self) -> None:
+        """Write buffered entries and use times, then evict down to max_size."""
+        with self._lock:
+            self._flush()
+
+    def _flush(self) -> None:
+        if not self._added and not self._used:
+            return
+        now = time.time_ns()
+        conn = self._connect()
+        with conn:
+            for (direction, source_hash), output in self._added.items():
+                cursor = conn.execute(
+                    "INSERT OR IGNORE INTO entries "
+                    "(direction, version, source_hash, size, used) VALUES (?, ?, ?, ?, ?)",
+                    (direction, self.version, source_hash, _entry_size(output), now),
+                )
+                if cursor.rowcount and output is not None:
+                    conn.execute(
+                        "INSERT OR REPLACE INTO outputs VALUES (?, ?)",
+                        (cursor.lastrowid, output),
+                    )
+            conn.executemany(
+                "UPDATE entries SET used = ? WHERE id = ?",
+                [(when, entry_id) for entry_id, when in self._used.items()],
+            )
+            self._evict(conn)
+        self._added.clear()
+        self._added_size = 0
+        self._used.clear()
+
+    def _evict(self, conn: sqlite3.Connection) -> None:
+        total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+        if total <= self.max_size:
+            return
+        evicted: List[Tuple[int]] = []
+        for entry_id, size in conn.execute("SELECT id, size FROM entries ORDER BY used"):
+            if total <= self.max_size:
+                break
+            evicted.append((entry_id,))
+            total -= size
+        conn.executemany("DELETE FROM entries WHERE id = ?", evicted)
+        conn.executemany("DELETE FROM outputs WHERE id = ?", evicted)
+
+    def close(self) -> None:
+        """Flush and close the database."""
+        self.flush()
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
@@ -1,185 +1,765 @@
 """
 Bidirectional converters between Hugo and Obsidian markdown formats.
+
+Each direction is a single-pass tokenizer: one precompiled alternation
+describes every convertible construct, and the document is walked once
+from left to right, emitting unchanged text and converted tokens into a
+list that is joined at the end. The alternation is only tried where one
+of a few literal needles occurs, and needles are located with str.find,
+so text without any convertible syntax is skipped at memchr speed.
+
+A block-structure pre-pass first splits the document into prose and
+fenced code blocks. Only prose is tokenized; code blocks (and inline
+code spans inside prose) are copied through untouched.
+
+Both directions take an optional note index (links.NoteIndex) to resolve
+wikilinks and refs to the posts they point at. Links it cannot resolve
+keep their name-only form and are appended to the unresolved list.
 """
 
 import re
-from typing import Tuple
+from functools import partial
+from typing import Callable, Dict, Iterable, Iterator, List, Match, Optional, Pattern, Tuple
 
 
-def hugo_to_obsidian(content: str) -> str:
-    """Convert Hugo markdown to Obsidian format."""
-    result = content
+# Inline code span: a run of backticks up to the next run of the same length
+# on the same line. Copied through as-is in both directions.
+_CODE_SPAN = r'(?P<code>(?P<ticks>`+)(?!`)[^\n]*?(?<!`)(?P=ticks)(?!`))'
 
-    # Convert mermaid shortcode to code block
-    # {{< mermaid >}}...{{< /mermaid >}} -> ```mermaid...```
-    result = re.sub(
-        r'\{\{<\s*mermaid\s*>\}\}\n?(.*?)\n?\{\{<\s*/mermaid\s*>\}\}',
-        r'```mermaid\n\1\n```',
-        result,
-        flags=re.DOTALL
-    )
-
-    # Convert alert shortcode to Obsidian callout
-    # {{< alert >}}...{{< /alert >}} -> > [!info]...
-    def convert_alert(match):
-        alert_content = match.group(1).strip()
-        # Indent each line with > for callout
-        lines = alert_content.split('\n')
-        callout_lines = ['> [!info]'] + ['> ' + line for line in lines]
-        return '\n'.join(callout_lines)
-
-    result = re.sub(
-        r'\{\{<\s*alert\s*>\}\}\n?(.*?)\n?\{\{<\s*/alert\s*>\}\}',
-        convert_alert,
-        result,
-        flags=re.DOTALL
-    )
-
-    # Convert ref shortcode to wikilink
+
+# Block bodies are matched with unrolled loops ("everything up to the
+# first closing tag") rather than lazy .*?, which backtracks per character.
+# Hugo -> Obsidian tokens, tried in this order at each position:
+#   code         `inline code`
+#   mermaid      {{< mermaid >}}...{{< /mermaid >}}
+#   alert_open   {{< alert >}}      (paired with the next alert_close)
+#   alert_close  {{< /alert >}}
+#   ref          [text]({{< ref "post.md" >}})
+#   image        ![alt](image.png)  (not when it wraps a ref link)
+_HUGO_TOKENS = re.compile(
+    _CODE_SPAN
+    + r'|(?P<mermaid>\{\{<\s*mermaid\s*>\}\}\n?'
+    r'(?P<mermaid_body>[^{]*(?:\{(?!\{<\s*/mermaid\s*>\}\})[^{]*)*)\{\{<\s*/mermaid\s*>\}\})'
+    r'|(?P<alert_open>\{\{<\s*alert\s*>\}\}\n?)'
+    r'|(?P<alert_close>\{\{<\s*/alert\s*>\}\})'
+    r'|(?P<ref>\[(?P<ref_text>[^\]]+)\]\(\{\{<\s*ref\s+"(?P<ref_path>[^"]+)"\s*>\}\}\))'
+    r'|(?P<image>!(?!\[[^\]]+\]\(\{\{<\s*ref\s+"[^"]+"\s*>\}\}\))'
+    r'\[(?P<image_alt>[^\]]*)\]\((?P<image_path>[^)]+)\))'
+)
+
+# Obsidian -> Hugo link tokens: ![[image.png]] embeds and [[note|text]] wikilinks
+_OBSIDIAN_LINK_PATTERNS = (
+    r'(?P<embed>!\[\[(?P<embed_target>[^\]]+)\]\])'
+    r'|(?P<wikilink>\[\[(?P<wikilink_target>[^\]]+)\]\])'
+)
+
+# Obsidian -> Hugo tokens: inline code, callouts, then links. Mermaid code
+# blocks are fenced blocks and are handled after the block pre-pass.
+_OBSIDIAN_TOKENS = re.compile(
+    _CODE_SPAN
+    + r'|(?P<callout>(?m:^)>\s*\[!(?P<callout_type>\w+)\].*(?:\n>.*)*)'
+    r'|' + _OBSIDIAN_LINK_PATTERNS
+)
+_OBSIDIAN_LINK_TOKENS = re.compile(_CODE_SPAN + '|' + _OBSIDIAN_LINK_PATTERNS)
+
+# Hugo ref links only, for finding links without converting
+_HUGO_REF_TOKENS = re.compile(
+    _CODE_SPAN
+    + r'|(?P<ref>\[(?P<ref_text>[^\]]+)\]\(\{\{<\s*ref\s+"(?P<ref_path>[^"]+)"\s*>\}\}\))'
+)
+
+# Literals every token of a pattern starts with, as (needle, offset) pairs:
+# the token is tried at the needle's position plus offset. A needle that
+# starts with a newline also matches at the start of a prose span.
+_NEEDLES = {
+    _HUGO_TOKENS: (('`', 0), ('{{<', 0), ('![', 0), ('[', 0)),
+    _OBSIDIAN_TOKENS: (('`', 0), ('\n>', 1), ('![[', 0), ('[[', 0)),
+    _OBSIDIAN_LINK_TOKENS: (('`', 0), ('![[', 0), ('[[', 0)),
+    _HUGO_REF_TOKENS: (('`', 0), ('[', 0)),
+}
+
+# Literals that every convertible construct contains, per direction. A
+# document containing none of them is returned as the same object without
+# being tokenized. Code spans are not listed: they are copied through.
+_HUGO_MARKERS = ('{{<', '![')
+_OBSIDIAN_MARKERS = ('[[', '[!', 'mermaid')
+
+# detect_format signals as (marker, pattern): a pattern is only searched
+# for when its marker occurs, and a None pattern means the marker decides.
+_HUGO_SIGNALS = (
+    ('{{<', re.compile(r'\{\{<\s*mermaid\s*>\}\}')),
+    ('{{<', re.compile(r'\{\{<\s*alert\s*>\}\}')),
+    ('{{<', re.compile(r'\{\{<\s*ref\s+"')),
+)
+_OBSIDIAN_SIGNALS = (
+    ('```mermaid', None),
+    ('[!', re.compile(r'^>\s*\[!\w+\]', re.MULTILINE)),
+    ('[[', re.compile(r'\[\[[^\]]+\]\]')),
+    ('![[', re.compile(r'!\[\[[^\]]+\]\]')),
+)
+
+_CALLOUT_HEADER = re.compile(r'^>\s*\[!(\w+)\]\s*')
+_CALLOUT_PREFIX = re.compile(r'^>\s?')
+
+
+# (start, body_start, body_end, end, info) of a fenced code block: the
+# block spans [start, end), its content [body_start, body_end). An unclosed
+# fence runs to the end of the document, with body_end == end.
+Fence = Tuple[int, int, int, int, str]
+
+
+def _find_fences(content: str) -> List[Fence]:
+    """Locate fenced code blocks (``` or ~~~) in a document.
+
+    Fences are recognised at the start of a line after any indentation, so
+    fences nested in list items are found too. A closing fence uses the
+    same character, is at least as long as the opening one, and has
+    nothing but whitespace around it.
+    """
+    fences: List[Fence] = []
+    find = content.find
+    length = len(content)
+    pos = 0
+
+    # Next occurrence of each fence needle, refreshed once passed
+    hits = {'```': find('```'), '~~~': find('~~~')}
+    while True:
+        for needle, hit in hits.items():
+            if 0 <= hit < pos:
+                hits[needle] = find(needle, pos)
+        candidates = [hit for hit in hits.values() if hit >= 0]
+        if not candidates:
+            return fences
+        index = min(candidates)
+        char = content[index]
+        line_start = content.rfind('\n', 0, index) + 1
+        line_end = find('\n', index)
+        if line_end < 0:
+            line_end = length
+
+        run_end = index
+        while run_end < line_end and content[run_end] == char:
+            run_end += 1
+        info = content[run_end:line_end]
+
+        # Not a fence: text before it on the line, or backticks in the
+        # info string (that is inline code such as ```x```)
+        if content[line_start:index].strip(' \t') or (char == '`' and '`' in info):
+            pos = run_end
+            continue
+
+        run = content[index:run_end]
+        body_start = min(line_end + 1, length)
+        close = body_start
+        while True:
+            close = find(run, close)
+            if close < 0:
+                fences.append((line_start, body_start, length, length, info.strip()))
+                return fences
+            close_line_start = content.rfind('\n', 0, close) + 1
+            close_line_end = find('\n', close)
+            if close_line_end < 0:
+                close_line_end = length
+            closing = content[close_line_start:close_line_end].strip(' \t')
+            if closing.strip(char) == '':
+                break
+            close = close_line_end
+
+        end = min(close_line_end + 1, length)
+        fences.append((line_start, body_start, close_line_start, end, info.strip()))
+        pos = end
+
+
+def _segments(content: str) -> Iterator[Tuple[int, int, Optional[Fence]]]:
+    """Split a document into (start, end, fence) spans covering it in order.
+
+    fence is None for prose spans, which always start at a line start.
+    """
+    pos = 0
+    for fence in _find_fences(content):
+        if fence[0] > pos:
+            yield pos, fence[0], None
+        yield fence[0], fence[3], fence
+        pos = fence[3]
+    if pos < len(content) or pos == 0:
+        yield pos, len(content), None
+
+
+def _scan(content: str, tokens: Pattern, start: int, end: int) -> Iterator[Match]:
+    """Yield non-overlapping token matches in content[start:end], left to right."""
+    needles = _NEEDLES[tokens]
+    find = content.find
+    match_token = tokens.match
+
+    def next_hit(needle: str, offset: int, pos: int) -> int:
+        if pos == start and needle[0] == '\n' and content.startswith(needle[1:], start, end):
+            return start
+        index = find(needle, max(pos - offset, start), end)
+        return index + offset if index >= 0 else -1
+
+    hits = [next_hit(needle, offset, start) for needle, offset in needles]
+    while True:
+        pending = [hit for hit in hits if hit >= 0]
+        if not pending:
+            return
+        token_start = min(pending)
+        match = match_token(content, token_start, end)
+        if match is None:
+            pos = token_start + 1
+        else:
+            yield match
+            pos = match.end()
+        hits = [
+            next_hit(needle, offset, pos) if 0 <= hit < pos else hit
+            for hit, (needle, offset) in zip(hits, needles)
+        ]
+
+
+def _rewrite_prose(
+    out: List[str],
+    content: str,
+    start: int,
+    end: int,
+    tokens: Pattern,
+    handlers: Dict[str, Callable[[Match], str]],
+) -> None:
+    """Append content[start:end] to out, replacing tokens with their handlers' output."""
+    pos = start
+    for match in _scan(content, tokens, start, end):
+        out.append(content[pos:match.start()])
+        out.append(handlers[match.lastgroup](match))
+        pos = match.end()
+    out.append(content[pos:end])
+
+
+def _rewrite(
+    content: str,
+    tokens: Pattern,
+    handlers: Dict[str, Callable[[Match], str]],
+) -> str:
+    """Rewrite the prose of a document, copying code blocks through."""
+    out: List[str] = []
+    for start, end, fence in _segments(content):
+        if fence is None:
+            _rewrite_prose(out, content, start, end, tokens, handlers)
+        else:
+            out.append(content[start:end])
+    return ''.join(out)
+
+
+def _has_marker(content: str, markers: Tuple[str, ...]) -> bool:
+    """Return whether content contains any of the given literal markers."""
+    return any(marker in content for marker in markers)
+
+
+def _keep(match: Match) -> str:
+    return match.group(0)
+
+
+def _alert_to_callout(alert_content: str) -> str:
+    """Turn the body of an alert shortcode into an Obsidian callout."""
+    # Indent each line with > for callout
+    lines = alert_content.split('\n')
+    callout_lines = ['> [!info]'] + ['> ' + line for line in lines]
+    return '\n'.join(callout_lines)
+
+
+def _convert_ref(match: Match, links=None, unresolved: Optional[List[str]] = None) -> str:
     # [text]({{< ref "post.md" >}}) -> [[post|text]]
-    def convert_ref(match):
-        text = match.group(1)
-        ref_path = match.group(2)
+    text = match.group('ref_text')
+    ref_path = match.group('ref_path')
+    note_name = links.vault_link(ref_path) if links is not None else None
+    if note_name is None:
+        if links is not None and unresolved is not None:
+            unresolved.append(ref_path)
         # Remove .md extension and path components
         note_name = ref_path.replace('.md', '').split('/')[-1]
-        if text == note_name:
-            return f'[[{note_name}]]'
-        return f'[[{note_name}|{text}]]'
-
-    result = re.sub(
-        r'\[([^\]]+)\]\(\{\{<\s*ref\s+"([^"]+)"\s*>\}\}\)',
-        convert_ref,
-        result
-    )
-
-    # Convert standard markdown images to Obsidian embed
-    # ![alt](image.png) -> ![[image.png]]
-    # Only for local images (not URLs)
-    def convert_image(match):
-        alt = match.group(1)
-        path = match.group(2)
-        # Skip URLs
-        if path.startswith('http://') or path.startswith('https://'):
-            return match.group(0)
-        # Get just the filename
-        filename = path.split('/')[-1]
-        return f'![[{filename}]]'
+    if text == note_name:
+        return f'[[{note_name}]]'
+    return f'[[{note_name}|{text}]]'
+
 
-    result = re.sub(
-        r'!\[([^\]]*)\]\(([^)]+)\)',
-        convert_image,
-        result
-    )
+def _convert_image(match: Match) -> str:
+    # ![alt](image.png) -> ![[image.png]], only for local images (not URLs)
+    path = match.group('image_path')
+    if path.startswith('http://') or path.startswith('https://'):
+        return match.group(0)
+    # Get just the filename
+    filename = path.split('/')[-1]
+    return f'![[{filename}]]'
 
-    return result
 
+def _convert_shortcode_mermaid(match: Match) -> str:
+    # {{< mermaid >}}...{{< /mermaid >}} -> ```mermaid...```
+    # The diagram source is code and is copied through unconverted
+    body = match.group('mermaid_body')
+    if body.endswith('\n'):
+        body = body[:-1]
+    return f'```mermaid\n{body}\n```'
 
-def obsidian_to_hugo(content: str) -> str:
-    """Convert Obsidian markdown to Hugo format."""
-    result = content
 
-    # Convert mermaid code block to shortcode
-    # ```mermaid...``` -> {{< mermaid >}}...{{< /mermaid >}}
-    result = re.sub(
-        r'```mermaid\n(.*?)\n```',
-        r'{{< mermaid >}}\n\1\n{{< /mermaid >}}',
-        result,
-        flags=re.DOTALL
-    )
-
-    # Convert Obsidian callout to alert shortcode
-    # > [!info]... -> {{< alert >}}...{{< /alert >}}
-    def convert_callout(match):
-        # Get all the callout lines
-        callout_block = match.group(0)
-        lines = callout_block.split('\n')
-
-        # Extract content (remove > prefix and [!type] header)
-        content_lines = []
-        for i, line in enumerate(lines):
-            if i == 0:
-                # First line: > [!info] or > [!type] possibly with text after
-                after_type = re.sub(r'^>\s*\[!(\w+)\]\s*', '', line)
-                if after_type.strip():
-                    content_lines.append(after_type)
+_HUGO_HANDLERS = {
+    'code': _keep,
+    'mermaid': _convert_shortcode_mermaid,
+    'ref': _convert_ref,
+    'image': _convert_image,
+}
+
+
+class _AlertState:
+    """An alert shortcode left open by the prose converted so far.
+
+    While an alert is open, its converted body is collected in body so it
+    can be stripped and turned into callout lines once it closes. Code
+    blocks inside an alert become part of the callout.
+    """
+
+    def __init__(self):
+        self.body: Optional[List[str]] = None
+        self.opening = ''
+
+    def target(self, out: List[str]) -> List[str]:
+        """Return the list text is appended to: out, or the open alert's body."""
+        return out if self.body is None else self.body
+
+    def unclosed(self) -> str:
+        """Return an alert that never closed as written, and forget it."""
+        text = self.opening + ''.join(self.body or ())
+        self.body = None
+        return text
+
+
+def _hugo_handlers(links=None, unresolved: Optional[List[str]] = None):
+    """Return the Hugo token handlers, resolving refs with links if given."""
+    if links is None:
+        return _HUGO_HANDLERS
+    return {**_HUGO_HANDLERS, 'ref': partial(_convert_ref, links=links, unresolved=unresolved)}
+
+
+def _hugo_prose(
+    out: List[str],
+    content: str,
+    start: int,
+    end: int,
+    handlers: Dict[str, Callable[[Match], str]],
+    alert: _AlertState,
+) -> None:
+    """Append the conversion of Hugo prose content[start:end] to out or the open alert."""
+    pos = start
+    for match in _scan(content, _HUGO_TOKENS, start, end):
+        target = alert.target(out)
+        target.append(content[pos:match.start()])
+        pos = match.end()
+        kind = match.lastgroup
+
+        if kind == 'alert_open':
+            # {{< alert >}}...{{< /alert >}} -> > [!info]...
+            if alert.body is None:
+                alert.body = []
+                alert.opening = match.group(0)
             else:
-                # Subsequent lines: remove > prefix
-                content_lines.append(re.sub(r'^>\s?', '', line))
+                alert.body.append(match.group(0))
+        elif kind == 'alert_close':
+            if alert.body is None:
+                out.append(match.group(0))
+            else:
+                out.append(_alert_to_callout(''.join(alert.body).strip()))
+                alert.body = None
+        else:
+            target.append(handlers[kind](match))
+    alert.target(out).append(content[pos:end])
 
-        content = '\n'.join(content_lines).strip()
-        return f'{{{{< alert >}}}}\n{content}\n{{{{< /alert >}}}}'
 
-    # Match callout blocks (lines starting with > [!type] followed by > lines)
-    result = re.sub(
-        r'^>\s*\[!(\w+)\].*(?:\n>.*)*',
-        convert_callout,
-        result,
-        flags=re.MULTILINE
-    )
+def hugo_to_obsidian(content: str, links=None, unresolved: Optional[List[str]] = None) -> str:
+    """Convert Hugo markdown to Obsidian format.
+
+    Content with nothing to convert is returned as the same object. With a
+    note index, refs become links to the note they resolve to.
+    """
+    if not _has_marker(content, _HUGO_MARKERS):
+        return content
+
+    handlers = _hugo_handlers(links, unresolved)
+    out: List[str] = []
+    alert = _AlertState()
+    for start, end, fence in _segments(content):
+        if fence is None:
+            _hugo_prose(out, content, start, end, handlers, alert)
+        else:
+            alert.target(out).append(content[start:end])
 
-    # Convert wikilink to ref shortcode
+    # An alert that never closes is left as written
+    if alert.body is not None:
+        out.append(alert.unclosed())
+    return ''.join(out)
+
+
+def _convert_wikilink(match: Match, links=None, unresolved: Optional[List[str]] = None) -> str:
     # [[note|text]] -> [text]({{< ref "note.md" >}})
     # [[note]] -> [note]({{< ref "note.md" >}})
-    def convert_wikilink(match):
-        full_match = match.group(1)
-        if '|' in full_match:
-            note, text = full_match.split('|', 1)
-        else:
-            note = text = full_match
+    full_match = match.group('wikilink_target')
+    if '|' in full_match:
+        note, text = full_match.split('|', 1)
+    else:
+        note = text = full_match
 
-        # Add .md extension if not present
-        if not note.endswith('.md'):
-            note = note + '.md'
+    ref_path = links.hugo_ref(note) if links is not None else None
+    if ref_path is not None:
+        return f'[{text}]({{{{< ref "{ref_path}" >}}}})'
+    if links is not None and unresolved is not None:
+        unresolved.append(note)
 
-        return f'[{text}]({{{{< ref "{note}" >}}}})'
+    # Add .md extension if not present
+    if not note.endswith('.md'):
+        note = note + '.md'
 
-    result = re.sub(
-        r'\[\[([^\]]+)\]\]',
-        convert_wikilink,
-        result
-    )
+    return f'[{text}]({{{{< ref "{note}" >}}}})'
 
-    # Convert Obsidian image embed to standard markdown
+
+def _convert_embed(match: Match, link_handlers: Dict[str, Callable[[Match], str]]) -> str:
     # ![[image.png]] -> ![](image.png)
-    def convert_embed(match):
-        filename = match.group(1)
-        # Skip if it looks like a note link (no extension or .md)
-        if '.' not in filename or filename.endswith('.md'):
-            return match.group(0)
-        return f'![]({filename})'
+    filename = match.group('embed_target')
+    # A note embed (no extension or .md) is kept as a link to the note
+    note = filename.split('|', 1)[0]
+    if '.' not in note or note.endswith('.md'):
+        return '!' + _rewrite(match.group(0)[1:], _OBSIDIAN_LINK_TOKENS, link_handlers)
+    return f'![]({filename})'
+
+
+def _convert_callout(match: Match, link_handlers: Dict[str, Callable[[Match], str]]) -> str:
+    # > [!info]... -> {{< alert >}}...{{< /alert >}}
+    callout_block = match.group(0)
+    lines = callout_block.split('\n')
+
+    # Extract content (remove > prefix and [!type] header)
+    content_lines = []
+    for i, line in enumerate(lines):
+        if i == 0:
+            # First line: > [!info] or > [!type] possibly with text after
+            after_type = _CALLOUT_HEADER.sub('', line)
+            if after_type.strip():
+                content_lines.append(after_type)
+        else:
+            # Subsequent lines: remove > prefix
+            content_lines.append(_CALLOUT_PREFIX.sub('', line))
+
+    content = '\n'.join(content_lines).strip()
+    content = _rewrite(content, _OBSIDIAN_LINK_TOKENS, link_handlers)
+    return f'{{{{< alert >}}}}\n{content}\n{{{{< /alert >}}}}'
+
+
+def _obsidian_handlers(
+    links=None, unresolved: Optional[List[str]] = None
+) -> Dict[str, Callable[[Match], str]]:
+    """Return the Obsidian token handlers, resolving wikilinks with links if given."""
+    link_handlers: Dict[str, Callable[[Match], str]] = {
+        'code': _keep,
+        'wikilink': partial(_convert_wikilink, links=links, unresolved=unresolved),
+    }
+    # Note embeds and callout bodies are rewritten with the link handlers
+    link_handlers['embed'] = partial(_convert_embed, link_handlers=link_handlers)
+    return {
+        'callout': partial(_convert_callout, link_handlers=link_handlers),
+        **link_handlers,
+    }
+
+
+_OBSIDIAN_HANDLERS = _obsidian_handlers()
+
+
+def obsidian_to_hugo(content: str, links=None, unresolved: Optional[List[str]] = None) -> str:
+    """Convert Obsidian markdown to Hugo format.
 
-    result = re.sub(
-        r'!\[\[([^\]]+)\]\]',
-        convert_embed,
-        result
-    )
+    Content with nothing to convert is returned as the same object. With a
+    note index, wikilinks become refs to the path of the post they name.
+    """
+    if not _has_marker(content, _OBSIDIAN_MARKERS):
+        return content
+
+    handlers = _OBSIDIAN_HANDLERS if links is None else _obsidian_handlers(links, unresolved)
+    out: List[str] = []
+    for start, end, fence in _segments(content):
+        if fence is None:
+            _rewrite_prose(out, content, start, end, _OBSIDIAN_TOKENS, handlers)
+            continue
+
+        _, body_start, body_end, _, info = fence
+        if info == 'mermaid' and body_end < end:
+            body = content[body_start:max(body_end - 1, body_start)]
+            newline = '\n' if content.endswith('\n', body_end, end) else ''
+            out.append(_mermaid_shortcode(body, newline))
+        else:
+            out.append(content[start:end])
+    return ''.join(out)
+
+
+def _mermaid_shortcode(body: str, newline: str) -> str:
+    # ```mermaid...``` -> {{< mermaid >}}...{{< /mermaid >}}
+    return f'{{{{< mermaid >}}}}\n{body}\n{{{{< /mermaid >}}}}{newline}'
+
+
+# Streaming converts prose in chunks of at least this many characters
+STREAM_CHUNK = 1 << 16
 
-    return result
+_MERMAID_OPEN = re.compile(r'\{\{<\s*mermaid\s*>\}\}')
+_MERMAID_CLOSE = re.compile(r'\{\{<\s*/mermaid\s*>\}\}')
+_REF_PATH_OPEN = re.compile(r'\{\{<\s*ref\s+"\Z')
+
+
+def _fence_opening(line: str) -> Optional[Tuple[str, str]]:
+    """Return (run, info) if a line opens a fenced code block, as _find_fences decides."""
+    stripped = line.lstrip(' \t')
+    if not stripped.startswith(('```', '~~~')):
+        return None
+    char = stripped[0]
+    body = stripped.lstrip(char)
+    info = body.rstrip('\n')
+    if char == '`' and '`' in info:
+        return None
+    return stripped[:len(stripped) - len(body)], info.strip()
+
+
+def _fence_closes(line: str, run: str) -> bool:
+    """Return whether a line closes the fenced code block opened with run."""
+    return run in line and line.rstrip('\n').strip(' \t').strip(run[0]) == ''
+
+
+def _left_open(text: str, opener: str, closer: str) -> bool:
+    index = text.rfind(opener)
+    return index >= 0 and text.find(closer, index + len(opener)) < 0
+
+
+def _can_cut(text: str, hugo: bool) -> bool:
+    """Return whether no token can span the end of prose text.
+
+    Tokens only span lines inside brackets, link targets, shortcodes, ref
+    paths, mermaid shortcodes and (in the vault) callout headers, so text
+    that leaves none of them open can be converted on its own.
+    """
+    if _left_open(text, '[', ']') or _left_open(text, '](', ')') or _left_open(text, '{{<', '>}}'):
+        return False
+    quote = text.rfind('"')
+    shortcode = text.rfind('{{<', 0, quote) if quote >= 0 else -1
+    if shortcode >= 0 and _REF_PATH_OPEN.match(text, shortcode, quote + 1):
+        return False
+    if not hugo:
+        return not text.rstrip().endswith('>')
+    if 'mermaid' in text:
+        last = None
+        for last in _MERMAID_OPEN.finditer(text):
+            pass
+        if last is not None and not _MERMAID_CLOSE.search(text, last.end()):
+            return False
+    return True
+
+
+def stream_convert(
+    lines: Iterable[str],
+    fmt: str,
+    links=None,
+    unresolved: Optional[List[str]] = None,
+    found: Optional[List[str]] = None,
+    chunk_size: int = STREAM_CHUNK,
+) -> Iterator[str]:
+    """Convert a document from fmt ('hugo' or 'obsidian') to the other, line by line.
+
+    lines are the document's lines with universal newlines, e.g. a text
+    file. The concatenated output equals what hugo_to_obsidian or
+    obsidian_to_hugo return for the whole document, but only a bounded
+    part of it is held at once:
+
+      - code block lines are passed through as they come, except inside
+        an open alert (Hugo) or a mermaid block (vault), which are held
+        until they close;
+      - prose is collected into chunks of about chunk_size characters,
+        cut at a blank line where no link, shortcode or callout is left
+        open, and each chunk goes through the tokenizer on its own.
+
+    If found is given, the document's link targets are appended to it as
+    find_links returns them.
+    """
+    hugo = fmt == 'hugo'
+    if hugo:
+        handlers = _hugo_handlers(links, unresolved)
+        alert = _AlertState()
+        markers = _HUGO_MARKERS
+    else:
+        handlers = _OBSIDIAN_HANDLERS if links is None else _obsidian_handlers(links, unresolved)
+        markers = _OBSIDIAN_MARKERS
+
+    def convert(text: str) -> str:
+        if found is not None:
+            found.extend(find_links(text, fmt))
+        out: List[str] = []
+        if not _has_marker(text, markers):
+            (alert.target(out) if hugo else out).append(text)
+        elif hugo:
+            _hugo_prose(out, text, 0, len(text), handlers, alert)
+        else:
+            _rewrite_prose(out, text, 0, len(text), _OBSIDIAN_TOKENS, handlers)
+        return ''.join(out)
+
+    prose: List[str] = []
+    size = 0
+    cut_at = chunk_size
+    run = None  # opening run of the code block being passed through
+    mermaid: Optional[List[str]] = None  # held lines of a vault mermaid block
+
+    for line in lines:
+        if run is None:
+            opening = _fence_opening(line)
+            if opening is None:
+                prose.append(line)
+                size += len(line)
+                if size >= cut_at and not line.strip():
+                    text = ''.join(prose)
+                    if _can_cut(text, hugo):
+                        prose, size, cut_at = [], 0, chunk_size
+                        yield convert(text)
+                    else:
+                        # Look again once as much text has arrived
+                        cut_at = size * 2
+                continue
+            # A code block ends the prose before it
+            if prose:
+                yield convert(''.join(prose))
+                prose, size, cut_at = [], 0, chunk_size
+            run, info = opening
+            if not hugo and info == 'mermaid':
+                mermaid = [line]
+                continue
+        elif _fence_closes(line, run):
+            run = None
+            if mermaid is not None:
+                body = ''.join(mermaid[1:])[:-1]
+                yield _mermaid_shortcode(body, '\n' if line.endswith('\n') else '')
+                mermaid = None
+                continue
+        elif mermaid is not None:
+            mermaid.append(line)
+            continue
+
+        if hugo and alert.body is not None:
+            alert.body.append(line)
+        else:
+            yield line
+
+    if prose:
+        yield convert(''.join(prose))
+    if mermaid is not None:
+        # An unclosed block runs to the end of the document, unconverted
+        yield ''.join(mermaid)
+    if hugo and alert.body is not None:
+        yield alert.unclosed()
 
 
 def detect_format(content: str) -> str:
     """Detect if content is in Hugo or Obsidian format.
 
-    Returns 'hugo', 'obsidian', or 'unknown'.
+    Returns 'hugo', 'obsidian', or 'unknown'. The format with more distinct
+    signals present wins. Signals whose marker is absent are never searched
+    for, and the search stops as soon as one side's lead cannot be caught up.
     """
-    hugo_patterns = [
-        r'\{\{<\s*mermaid\s*>\}\}',
-        r'\{\{<\s*alert\s*>\}\}',
-        r'\{\{<\s*ref\s+"',
-    ]
-
-    obsidian_patterns = [
-        r'```mermaid',
-        r'^>\s*\[!\w+\]',
-        r'\[\[[^\]]+\]\]',
-        r'!\[\[[^\]]+\]\]',
-    ]
-
-    hugo_score = sum(1 for p in hugo_patterns if re.search(p, content))
-    obsidian_score = sum(1 for p in obsidian_patterns if re.search(p, content, re.MULTILINE))
-
-    if hugo_score > obsidian_score:
-        return 'hugo'
-    elif obsidian_score > hugo_score:
-        return 'obsidian'
+    hugo = [pattern for marker, pattern in _HUGO_SIGNALS if marker in content]
+    obsidian = [pattern for marker, pattern in _OBSIDIAN_SIGNALS if marker in content]
+    hugo_score = obsidian_score = 0
+
+    while hugo or obsidian:
+        if hugo and hugo.pop().search(content):
+            hugo_score += 1
+        if obsidian:
+            pattern = obsidian.pop()
+            if pattern is None or pattern.search(content):
+                obsidian_score += 1
+        if hugo_score > obsidian_score + len(obsidian):
+            return 'hugo'
+        if obsidian_score > hugo_score + len(hugo):
+            return 'obsidian'
     return 'unknown'
+
+
+def find_links(content: str, fmt: str) -> List[str]:
+    """Return the link targets in a post, in document order.
+
+    For fmt 'hugo' these are ref paths; for 'obsidian' they are wikilink
+    and note embed targets, anchors included and display text excluded.
+    Links in code are not returned.
+    """
+    found: List[str] = []
+    if fmt == 'hugo':
+        if '{{<' in content and 'ref' in content:
+            for start, end, fence in _segments(content):
+                if fence is None:
+                    found.extend(
+                        match.group('ref_path')
+                        for match in _scan(content, _HUGO_REF_TOKENS, start, end)
+                        if match.lastgroup == 'ref'
+                    )
+    elif '[[' in content:
+        for start, end, fence in _segments(content):
+            if fence is None:
+                for match in _scan(content, _OBSIDIAN_LINK_TOKENS, start, end):
+                    if match.lastgroup == 'wikilink':
+                        found.append(match.group('wikilink_target').split('|', 1)[0])
+                    elif match.lastgroup == 'embed':
+                        target = match.group('embed_target').split('|', 1)[0]
+                        if '.' not in target or target.endswith('.md'):
+                            found.append(target)
+    return found
+
+
+def retarget_links(content: str, fmt: str, retarget: Callable[[str], Optional[str]]) -> str:
+    """Rewrite the link targets of a post in its own format.
+
+    retarget is called with each target as find_links returns it and
+    returns the new target, or None to leave the link as it is. Display
+    text and anything outside links is kept; a retargeted bare wikilink
+    keeps its old target as display text ([[old]] -> [[new|old]]), as the
+    Hugo side keeps its link text.
+    """
+    def ref(match: Match) -> str:
+        target = retarget(match.group('ref_path'))
+        if target is None:
+            return match.group(0)
+        return f'[{match.group("ref_text")}]({{{{< ref "{target}" >}}}})'
+
+    def wikilink(match: Match) -> str:
+        note, _, text = match.group('wikilink_target').partition('|')
+        target = retarget(note)
+        return match.group(0) if target is None else f'[[{target}|{text or note}]]'
+
+    def embed(match: Match) -> str:
+        note, _, text = match.group('embed_target').partition('|')
+        if '.' in note and not note.endswith('.md'):
+            return match.group(0)
+        target = retarget(note)
+        return match.group(0) if target is None else f'![[{target}|{text or note}]]'
+
+    if fmt == 'hugo':
+        handlers = {
+            kind: _keep for kind in ('code', 'mermaid', 'alert_open', 'alert_close', 'image')
+        }
+        handlers['ref'] = ref
+        return _rewrite(content, _HUGO_TOKENS, handlers)
+    handlers = {'code': _keep, 'wikilink': wikilink, 'embed': embed}
+    return _rewrite(content, _OBSIDIAN_LINK_TOKENS, handlers)
+
+
+def convert_batch(
+    items: List[Tuple[str, str]], links=None
+) -> List[Tuple[Optional[str], List[str]]]:
+    """Convert a batch of (target side, content) pairs, e.g. in a worker process.
+
+    Content for target "obsidian" is Hugo markdown and is converted with
+    hugo_to_obsidian; content for target "hugo" goes through
+    obsidian_to_hugo. Returns (converted content, unresolved links) for
+    each item. Content with nothing to convert comes back as None instead
+    of a copy, so it is not sent back across the process boundary.
+    """
+    results: List[Tuple[Optional[str], List[str]]] = []
+    for target, content in items:
+        convert = hugo_to_obsidian if target == 'obsidian' else obsidian_to_hugo
+        unresolved: List[str] = []
+        converted = convert(content, links, unresolved)
+        results.append((None if converted is content else converted, unresolved))
+    return results
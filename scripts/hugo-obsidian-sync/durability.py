@@ -0,0 +1,183 @@
+"""
+Atomic writes and fsync durability for Hugo-Obsidian sync.
+
+Posts, assets and the JSON state are never written in place. Each one
+goes to a temp file next to its target, which os.replace then moves over
+the target, so a crash or a concurrent save by Obsidian leaves either the
+old file or the new one, never a truncated one. Directories are created
+with make_dirs, so their entries are synced like the files'.
+
+The durability setting decides when written files are forced to disk:
+  none    no fsync; the OS writes them back in its own time
+  batch   the files written and their directories are fsynced together
+          when the state is saved (default)
+  strict  each file is fsynced before it replaces its target, and the
+          directory right after
+Saving the state is the commit point: it first syncs everything still
+pending, so the state never records a file that a power loss could take
+back, and the state file is then synced itself. Posts written after the
+last state save are just seen as changed again by the next run.
+"""
+
+import errno
+import os
+import tempfile
+import threading
+from pathlib import Path
+from typing import Optional, Set, Tuple
+
+from timing import count, phase
+
+DURABILITY_MODES = ("none", "batch", "strict")
+
+# Mode of newly created files, applied to temp files (created 0600)
+_UMASK = os.umask(0)
+os.umask(_UMASK)
+
+_mode = "batch"
+_pending_files: Set[Path] = set()
+_pending_dirs: Set[Path] = set()
+_lock = threading.Lock()
+
+
+def set_durability(mode: str) -> None:
+    """Set the durability mode, one of DURABILITY_MODES, for the writes that follow."""
+    global _mode
+    _mode = mode
+
+
+def get_durability() -> str:
+    return _mode
+
+
+def file_mode(path: Path) -> int:
+    """Return the permissions for a file replacing path: path's own, or the default."""
+    try:
+        return os.stat(path).st_mode & 0o7777
+    except OSError:
+        return 0o666 & ~_UMASK
+
+
+def temp_file(path: Path) -> Tuple[int, Path]:
+    """Create a temp file next to path to be moved over it; returns (fd, temp path)."""
+    fd, name = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.", suffix=".tmp")
+    return fd, Path(name)
+
+
+def is_temp_name(name: str) -> bool:
+    """Return whether a file name is one of temp_file's, or an older .<name>.link."""
+    return name.startswith(".") and name.endswith((".tmp", ".link"))
+
+
+def _fsync(path: Path, directory: bool = False) -> None:
+    flags = os.O_RDONLY | (getattr(os, "O_DIRECTORY", 0) if directory else 0)
+    try:
+        fd = os.open(path, flags)
+    except PermissionError:
+        if directory:  # Windows cannot open directories
+            return
+        raise
+    try:
+        os.fsync(fd)
+    except OSError as e:
+        # Some filesystems cannot fsync a directory
+        if not directory or e.errno not in (errno.EINVAL, errno.EBADF, errno.ENOTSUP):
+            raise
+    finally:
+        os.close(fd)
+    count("fsyncs")
+
+
+def replace(temp: Path, path: Path, data: bool = True) -> None:
+    """Move a finished temp file over path, syncing it as the durability mode says.
+
+    data=False is for a temp file whose content needs no sync, such as a
+    hard link to an existing file; only the directory entry is synced.
+    """
+    if _mode == "strict" and data:
+        _fsync(temp)
+    os.replace(temp, path)
+    _written(path if data else None, path.parent)
+
+
+def move(source: Path, destination: Path) -> None:
+    """Rename a file or directory, syncing both parent directories as the mode says."""
+    os.rename(source, destination)
+    _written(None, source.parent, destination.parent)
+
+
+def _written(path: Optional[Path], *directories: Path) -> None:
+    if _mode == "strict":
+        for directory in directories:
+            _fsync(directory, directory=True)
+    elif _mode == "batch":
+        with _lock:
+            if path is not None:
+                _pending_files.add(path)
+            _pending_dirs.update(directories)
+
+
+def make_dirs(path: Path) -> None:
+    """Create a directory and its missing parents, syncing each new entry as the mode says."""
+    missing = []
+    while not path.exists():
+        missing.append(path)
+        path = path.parent
+    for directory in reversed(missing):
+        try:
+            directory.mkdir()
+        except FileExistsError:
+            continue  # Created meanwhile, e.g. by another write task
+        _written(None, directory.parent)
+
+
+def write_file(path: Path, data: bytes) -> os.stat_result:
+    """Write data to path through a temp file, keeping path's permissions.
+
+    Returns the stat of the file as written, taken before it replaces
+    path, so it never describes a later change made by someone else.
+    """
+    fd, temp = temp_file(path)
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+            f.flush()
+            st = os.fstat(f.fileno())
+        os.chmod(temp, file_mode(path))
+        replace(temp, path)
+    except BaseException:
+        temp.unlink(missing_ok=True)
+        raise
+    return st
+
+
+def sync_pending() -> None:
+    """Fsync the files, then the directories, written since the last call (batch mode)."""
+    with _lock:
+        files, directories = sorted(_pending_files), sorted(_pending_dirs)
+        _pending_files.clear()
+        _pending_dirs.clear()
+    if not files and not directories:
+        return
+    with phase("fsync"):
+        for path in files:
+            try:
+                _fsync(path)
+            except FileNotFoundError:
+                pass  # Moved or removed since it was written
+        for directory in directories:
+            try:
+                _fsync(directory, directory=True)
+            except FileNotFoundError:
+                pass
+
+
+def commit(path: Path, data: bytes) -> None:
+    """Write the state file as the commit point of a run.
+
+    Everything written before is synced first, then path itself, unless
+    the mode is none.
+    """
+    sync_pending()
+    write_file(path, data)
+    sync_pending()
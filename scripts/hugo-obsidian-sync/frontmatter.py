@@ -0,0 +1,187 @@
+"""
+Front matter reading and index for Hugo-Obsidian sync.
+
+Filters and the index only need a post's YAML header, so it is read line
+by line up to the closing --- and the body is never decoded. Posts
+without front matter, or with a header that does not parse, have none.
+
+The index is kept in state["meta"] as {post_id: entry}, with the title,
+date, draft flag, tags, series, series_order and language of each post,
+read from its Hugo file (or its note when there is none). Each entry
+stores the hash of the file it was read from and is only refreshed when
+that post's fingerprint changes. Synced posts are indexed from memory by
+the sync functions, so only posts that did not need syncing have their
+header read. `sync.py query` answers from state without opening any post.
+"""
+
+import datetime
+import io
+from pathlib import Path
+from typing import Any, BinaryIO, Dict, Iterable, List, Optional
+
+import yaml
+
+from bundles import bundle_language
+
+_DELIMITER = b"---"
+_CLOSERS = (b"---", b"...")
+
+
+def _parse_header(f: BinaryIO) -> Dict[str, Any]:
+    """Parse the front matter block at the start of a binary stream."""
+    if f.readline().lstrip(b"\xef\xbb\xbf").rstrip(b"\r\n") != _DELIMITER:
+        return {}
+    lines = []
+    for line in f:
+        if line.rstrip(b"\r\n") in _CLOSERS:
+            break
+        lines.append(line)
+    else:
+        return {}
+    try:
+        data = yaml.safe_load(b"".join(lines).decode("utf-8"))
+    except (yaml.YAMLError, UnicodeDecodeError):
+        return {}
+    return data if isinstance(data, dict) else {}
+
+
+def read_front_matter(path: Path) -> Dict[str, Any]:
+    """Return a post's front matter as a dict, reading only the header block."""
+    try:
+        with open(path, "rb") as f:
+            return _parse_header(f)
+    except OSError:
+        return {}
+
+
+def parse_front_matter(data: bytes) -> Dict[str, Any]:
+    """Return the front matter of a post already in memory."""
+    return _parse_header(io.BytesIO(data))
+
+
+def is_draft(front_matter: Dict[str, Any]) -> bool:
+    """Check a post's draft flag (a YAML boolean or the string "true")."""
+    return str(front_matter.get("draft", "")).lower() == "true"
+
+
+def _text(value: Any) -> Optional[str]:
+    if value is None:
+        return None
+    if isinstance(value, (datetime.date, datetime.datetime)):
+        return value.isoformat()
+    return str(value)
+
+
+def _text_list(value: Any) -> List[str]:
+    if value is None:
+        return []
+    if isinstance(value, (list, tuple)):
+        return [str(item) for item in value if item is not None]
+    return [str(value)]
+
+
+def index_entry(front_matter: Dict[str, Any], path: Path, file_hash: Optional[str]) -> Dict:
+    """Return the index entry for a post's front matter, as JSON-safe values."""
+    order = front_matter.get("series_order")
+    return {
+        "hash": file_hash,
+        "title": _text(front_matter.get("title")),
+        "date": _text(front_matter.get("date")),
+        "draft": is_draft(front_matter),
+        "tags": _text_list(front_matter.get("tags")),
+        "series": _text_list(front_matter.get("series")),
+        "series_order": order if isinstance(order, int) and not isinstance(order, bool) else None,
+        "language": _text(front_matter.get("language") or front_matter.get("lang"))
+        or bundle_language(path),
+    }
+
+
+def record_front_matter(
+    state: Dict, post_id: str, path: Path, file_hash: str, data: Optional[bytes] = None
+) -> None:
+    """Index the front matter of a post written or read by a sync.
+
+    It is parsed from data when the post's bytes are in memory, otherwise
+    read from the header of the file at path.
+    """
+    front_matter = read_front_matter(path) if data is None else parse_front_matter(data)
+    state.setdefault("meta", {})[post_id] = index_entry(front_matter, path, file_hash)
+
+
+def update_front_matter_index(
+    state: Dict,
+    post_ids: Iterable[str],
+    hugo_posts: Dict[str, Path],
+    obsidian_posts: Dict[str, Path],
+    fingerprints: Dict[str, Dict],
+) -> int:
+    """Refresh the state["meta"] entries of post_ids whose file hash changed.
+
+    The hash is the one recorded in state for the side read from, or its
+    scanned fingerprint for posts never synced. Entries of posts found on
+    neither side are dropped. Returns the number of headers read.
+    """
+    index = state.setdefault("meta", {})
+    read = 0
+    for post_id in post_ids:
+        for side, posts in (("hugo", hugo_posts), ("obsidian", obsidian_posts)):
+            path = posts.get(post_id)
+            if path is not None:
+                break
+        else:
+            index.pop(post_id, None)
+            continue
+        file_hash = state.get(side, {}).get(post_id)
+        if file_hash is None:
+            file_hash = (fingerprints[side].get(post_id) or (None,))[0]
+        entry = index.get(post_id)
+        if entry is not None and file_hash is not None and entry["hash"] == file_hash:
+            continue
+        index[post_id] = index_entry(read_front_matter(path), path, file_hash)
+        read += 1
+    for post_id in set(index).difference(hugo_posts, obsidian_posts):
+        del index[post_id]
+    return read
+
+
+def query_index(
+    index: Dict[str, Dict],
+    draft: Optional[bool] = None,
+    tag: Optional[str] = None,
+    series: Optional[str] = None,
+    language: Optional[str] = None,
+) -> List[str]:
+    """Return the sorted IDs of indexed posts matching every given criterion."""
+    return sorted(
+        post_id for post_id, entry in index.items()
+        if (draft is None or entry["draft"] == draft)
+        and (tag is None or tag in entry["tags"])
+        and (series is None or series in entry["series"])
+        and (language is None or entry["language"] == language)
+    )
+
+
+def incomplete_series(index: Dict[str, Dict]) -> Dict[str, Dict[str, List]]:
+    """Return {series: problems} for series with drafts or gaps in series_order.
+
+    problems has the draft post IDs, the missing parts between 1 and the
+    highest series_order, and the posts without a series_order.
+    """
+    members: Dict[str, List[str]] = {}
+    for post_id, entry in index.items():
+        for name in entry["series"]:
+            members.setdefault(name, []).append(post_id)
+
+    result = {}
+    for name, post_ids in sorted(members.items()):
+        orders = {index[post_id]["series_order"] for post_id in post_ids} - {None}
+        problems = {
+            "drafts": sorted(post_id for post_id in post_ids if index[post_id]["draft"]),
+            "missing": sorted(set(range(1, max(orders, default=0) + 1)) - orders),
+            "unordered": sorted(
+                post_id for post_id in post_ids if index[post_id]["series_order"] is None
+            ),
+        }
+        if any(problems.values()):
+            result[name] = problems
+    return result
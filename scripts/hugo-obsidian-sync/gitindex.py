@@ -0,0 +1,280 @@
+"""
+Git-index change detection for the Hugo side of the sync.
+
+Git keeps a stat tuple and a blob ID for every tracked file in
+.git/index, and refreshes them whenever it looks at the work tree (git
+status, checkout, pull). GitDetector reads that file directly, with no
+git process, and recognises a Hugo post as unchanged without reading it
+when both hold:
+
+  - the file's stat matches the index entry, so the entry's blob ID is
+    the file's current content, and
+  - that blob ID is the one recorded for the post at the last sync.
+
+This covers what the stored stat tuples cannot: a fresh clone or a
+branch switch rewrites files with new mtimes and inodes but the same
+content. After each sync, state["git"]["blobs"] records {post_id: [blob
+ID, hash]} for the posts whose recorded stat matches the index; a blob
+ID is only trusted while the post's recorded hash is still the one it
+was recorded with.
+
+With --since REV, one `git diff` lists the content files touched since
+REV (working tree changes included), and select() narrows the run to the
+posts those files belong to, like the post filters in filters.py. The
+posts left are fingerprinted as usual; the others are not looked at.
+"""
+
+import os
+import struct
+import subprocess
+from pathlib import Path
+from typing import Dict, List, Optional, Set, Tuple
+
+from bundles import is_bundle_post
+from state import Fingerprint, get_stored_stat
+
+# Index entry fields after the path: (mtime_ns, size, ino & 0xffffffff, blob ID)
+IndexEntry = Tuple[int, int, int, str]
+
+_HEADER = struct.Struct(">4sII")
+# ctime s/ns, mtime s/ns, dev, ino, mode, uid, gid, size
+_ENTRY = struct.Struct(">10I")
+
+_STAGE_MASK = 0x3000
+_EXTENDED_FLAG = 0x4000
+# Extended flags: skip-worktree and intent-to-add entries describe no file
+_SKIP_WORKTREE = 0x4000
+_INTENT_TO_ADD = 0x2000
+_REGULAR_FILE = 0o100000
+
+
+def find_git_dir(path: Path) -> Optional[Tuple[Path, Path]]:
+    """Return (work tree, git dir) of the repository containing path, or None."""
+    for directory in (path, *path.parents):
+        dot_git = directory / ".git"
+        if dot_git.is_dir():
+            return directory, dot_git
+        if dot_git.is_file():
+            # Worktrees and submodules: "gitdir: <path>"
+            content = dot_git.read_text().strip()
+            if content.startswith("gitdir:"):
+                git_dir = Path(content[len("gitdir:"):].strip())
+                return directory, (directory / git_dir).resolve()
+    return None
+
+
+def _object_id_size(git_dir: Path) -> int:
+    """Return the byte length of object IDs: 20 (SHA-1) or 32 (SHA-256)."""
+    try:
+        config = _common_dir(git_dir).joinpath("config").read_text()
+    except OSError:
+        return 20
+    return 32 if "objectformat = sha256" in config.replace("\t", " ").lower() else 20
+
+
+def _common_dir(git_dir: Path) -> Path:
+    """Return the directory holding refs and config, shared by linked worktrees."""
+    common = git_dir / "commondir"
+    if common.is_file():
+        return (git_dir / common.read_text().strip()).resolve()
+    return git_dir
+
+
+def _varint(data: bytes, offset: int) -> Tuple[int, int]:
+    """Decode git's offset varint (index v4 path prefix lengths)."""
+    byte = data[offset]
+    offset += 1
+    value = byte & 0x7F
+    while byte & 0x80:
+        byte = data[offset]
+        offset += 1
+        value = ((value + 1) << 7) | (byte & 0x7F)
+    return value, offset
+
+
+def read_index(git_dir: Path) -> Optional[Dict[str, IndexEntry]]:
+    """Parse .git/index into {work tree relative path: entry}.
+
+    Only stage-0 regular files are returned. Returns None for an index
+    this reader does not handle (unknown version, split index).
+    """
+    try:
+        data = (git_dir / "index").read_bytes()
+    except OSError:
+        return None
+    signature, version, count = _HEADER.unpack_from(data)
+    if signature != b"DIRC" or version not in (2, 3, 4):
+        return None
+    id_size = _object_id_size(git_dir)
+
+    entries: Dict[str, IndexEntry] = {}
+    offset = _HEADER.size
+    path = b""
+    for _ in range(count):
+        start = offset
+        fields = _ENTRY.unpack_from(data, offset)
+        offset += _ENTRY.size
+        blob = data[offset:offset + id_size].hex()
+        offset += id_size
+        (flags,) = struct.unpack_from(">H", data, offset)
+        offset += 2
+        extended = 0
+        if flags & _EXTENDED_FLAG and version >= 3:
+            (extended,) = struct.unpack_from(">H", data, offset)
+            offset += 2
+
+        if version == 4:
+            strip, offset = _varint(data, offset)
+            end = data.index(b"\0", offset)
+            path = path[:len(path) - strip] + data[offset:end]
+            offset = end + 1
+        else:
+            end = data.index(b"\0", offset)
+            path = data[offset:end]
+            # Entries are NUL-padded to a multiple of 8 bytes
+            offset = start + ((end - start + 8) & ~7)
+
+        mode, size = fields[6], fields[9]
+        if (
+            flags & _STAGE_MASK
+            or extended & (_SKIP_WORKTREE | _INTENT_TO_ADD)
+            or mode & 0o170000 != _REGULAR_FILE
+        ):
+            continue
+        mtime_ns = fields[2] * 1_000_000_000 + fields[3]
+        entries[path.decode("utf-8", "surrogateescape")] = (mtime_ns, size, fields[5], blob)
+
+    # A split index keeps most entries in a shared file; not handled
+    if data[offset:offset + 4] == b"link":
+        return None
+    return entries
+
+
+def changed_paths(work_tree: Path, rev: str, directory: Path) -> Set[str]:
+    """Return the work tree relative paths under directory touched since rev.
+
+    That is tracked files that differ between rev and the working tree,
+    plus untracked files that are not ignored. Raises ValueError if git
+    fails, e.g. for an unknown revision.
+    """
+    rel_dir = os.path.relpath(directory, work_tree)
+    commands = (
+        ["diff", "--name-only", "--no-renames", "-z", rev, "--", rel_dir],
+        ["ls-files", "--others", "--exclude-standard", "-z", "--", rel_dir],
+    )
+    paths: Set[str] = set()
+    for command in commands:
+        try:
+            result = subprocess.run(["git", "-C", str(work_tree), *command], capture_output=True)
+        except OSError as e:
+            raise ValueError(f"cannot run git: {e}") from e
+        if result.returncode != 0:
+            raise ValueError(result.stderr.decode("utf-8", "replace").strip())
+        paths.update(name for name in result.stdout.decode("utf-8").split("\0") if name)
+    return paths
+
+
+class GitDetector:
+    """Recognise unchanged Hugo posts from the git index and an optional revision."""
+
+    def __init__(self, content_dir: Path, state: Dict, since: Optional[str] = None):
+        found = find_git_dir(content_dir.resolve())
+        if found is None:
+            raise ValueError(f"not in a git repository: {content_dir}")
+        self.work_tree, self.git_dir = found
+        self.state = state
+        self.entries = read_index(self.git_dir) or {}
+        # Entries modified as late as the index itself may be racily clean
+        try:
+            self.index_mtime_ns = (self.git_dir / "index").stat().st_mtime_ns
+        except OSError:
+            self.index_mtime_ns = 0
+        self.content_dir = content_dir
+        self._content_rel = os.path.relpath(content_dir.resolve(), self.work_tree)
+        self.blobs: Dict[str, List[str]] = state.get("git", {}).get("blobs", {})
+        self.touched: Optional[Set[str]] = None
+        if since is not None:
+            self.touched = changed_paths(self.work_tree, since, content_dir.resolve())
+        self.unchanged = 0
+        # Work tree relative paths of posts whose blob differs from the recorded one
+        self.changed: List[str] = []
+
+    def _rel_path(self, path: Path) -> str:
+        rel = path.relative_to(self.content_dir).as_posix()
+        return rel if self._content_rel == "." else f"{self._content_rel}/{rel}"
+
+    def _entry(self, rel: str, file_stat: Optional[List[int]]) -> Optional[IndexEntry]:
+        """Return the index entry for rel if it describes a file with file_stat."""
+        entry = self.entries.get(rel)
+        if entry is None or file_stat is None:
+            return None
+        mtime_ns, size, ino, _ = entry
+        if (
+            mtime_ns >= self.index_mtime_ns
+            or size != file_stat[0]
+            or ino != file_stat[2] & 0xFFFFFFFF
+            or mtime_ns != file_stat[1]
+        ):
+            return None
+        return entry
+
+    def fingerprint(self, post_id: str, path: Path) -> Optional[Fingerprint]:
+        """Return the fingerprint of an unchanged post without reading it, or None.
+
+        None means the post may have changed and is fingerprinted as usual.
+        """
+        stored_hash = self.state.get("hugo", {}).get(post_id)
+        stored_stat = get_stored_stat(self.state, "hugo", post_id)
+        if stored_hash is None or stored_stat is None:
+            return None
+        rel = self._rel_path(path)
+
+        # The blob ID only vouches for the hash it was recorded with
+        blob, blob_hash = self.blobs.get(post_id, (None, None))
+        if blob is None or blob_hash != stored_hash:
+            return None
+        try:
+            st = os.stat(path)
+        except OSError:
+            return None
+        file_stat = [st.st_size, st.st_mtime_ns, st.st_ino]
+        entry = self._entry(rel, file_stat)
+        if entry is None:
+            return None
+        if entry[3] != blob:
+            self.changed.append(rel)
+            return None
+        self.unchanged += 1
+        return stored_hash, file_stat
+
+    def select(self, hugo_posts: Dict[str, Path], obsidian_posts: Dict[str, Path]) -> Set[str]:
+        """Return the IDs of the posts touched since the --since revision.
+
+        A bundle post is touched by any file in its directory. Posts synced
+        before whose Hugo file is gone are kept too, so deletions are seen.
+        """
+        touched = self.touched or set()
+        touched_dirs = {parent for rel in touched for parent in Path(rel).parents}
+        selected = {
+            post_id for post_id, path in hugo_posts.items()
+            if self._rel_path(path) in touched
+            or (is_bundle_post(path) and Path(self._rel_path(path.parent)) in touched_dirs)
+        }
+        selected.update(
+            post_id for post_id in obsidian_posts
+            if post_id not in hugo_posts and post_id in self.state.get("hugo", {})
+        )
+        return selected
+
+    def record(self, posts: Dict[str, Path]) -> None:
+        """Record the blob IDs of the posts whose recorded stat matches the index."""
+        blobs = {}
+        for post_id, path in posts.items():
+            entry = self._entry(self._rel_path(path), get_stored_stat(self.state, "hugo", post_id))
+            if entry is not None:
+                blobs[post_id] = [entry[3], self.state["hugo"].get(post_id)]
+        self.state["git"] = {"blobs": blobs}
+
+    def take_counts(self) -> Dict[str, int]:
+        """Return the posts recognised unchanged and seen changed as git_unchanged/git_changed."""
+        return {"git_unchanged": self.unchanged, "git_changed": len(self.changed)}
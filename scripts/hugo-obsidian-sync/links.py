@@ -0,0 +1,191 @@
+"""
+Note index for resolving links between posts.
+
+Wikilinks name a note ([[my-post]], or [[blog/my-post]] when the name is
+ambiguous) while Hugo's ref shortcode takes a content path
+({{< ref "blog/my-post.md" >}}, or "blog/my-bundle" for a page bundle).
+The index maps every post on either side to its Hugo ref path and is
+kept in state["links"] as {post_id: ref path}, updated only for the
+posts a sync looks at. NoteIndex derives lookups by note name and by
+path from it, so converters resolve each link with a dict lookup.
+
+Links that resolve to no post, or to several posts by name, are left as
+the converters wrote them before and reported by the caller.
+
+The posts each synced post links to are recorded in state["outlinks"]
+as {post_id: [target IDs]}, and the reverse index in state["backlinks"]
+as {target ID: [post IDs linking to it]}, so renaming a post only reads
+the posts that link to it. A target ID is the post ID a link resolves
+to, or the bundle ID for links to a bundle.
+"""
+
+import hashlib
+import json
+import os
+import threading
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Set
+
+from bundles import bundle_id, bundle_language
+
+
+def _ref_key(path: str) -> str:
+    """Return a ref path or link target without its .md suffix, index file or leading ./ or /."""
+    path = path.strip()
+    while path.startswith(("./", "/")):
+        path = path[1:] if path[0] == "/" else path[2:]
+    if path.endswith(".md"):
+        path = path[:-3]
+    for index in ("/index", "/_index"):
+        if path.endswith(index):
+            path = path[:-len(index)]
+    return path
+
+
+class NoteIndex:
+    """Hugo ref paths of all posts, looked up by vault link or ref path."""
+
+    def __init__(self, refs: Dict[str, str]):
+        self.refs = dict(refs)
+        self._by_path: Dict[str, str] = {}  # lowercased path -> ref path
+        self._by_name: Dict[str, Set[str]] = {}  # lowercased note name -> ref paths
+        for post_id, ref in self.refs.items():
+            for path in (_ref_key(ref), post_id.replace(os.sep, "/")):
+                key = path.lower()
+                self._by_path[key] = ref
+                self._by_name.setdefault(key.rpartition("/")[2], set()).add(ref)
+
+    def _lookup(self, key: str) -> Optional[str]:
+        key = key.lower()
+        if "/" in key:
+            ref = self._by_path.get(key)
+            if ref is not None:
+                return ref
+            key = key.rpartition("/")[2]
+        refs = self._by_name.get(key)
+        if refs is not None and len(refs) == 1:
+            return next(iter(refs))
+        return None
+
+    def resolve(self, link: str) -> Optional[str]:
+        """Return the ID of the post or bundle a wikilink target or ref path points at."""
+        ref = self._lookup(_ref_key(link.partition("#")[0]))
+        return None if ref is None else _ref_key(ref).replace("/", os.sep)
+
+    def targets(self, links: Iterable[str]) -> List[str]:
+        """Return the sorted IDs the given links resolve to, without duplicates."""
+        return sorted({target for target in map(self.resolve, links) if target is not None})
+
+    def link_digest(self, links: Iterable[str], fmt: str) -> str:
+        """Hash of what the links of a post in format fmt resolve to.
+
+        It only changes when one of those links resolves differently, so
+        conversions cached under it survive edits to unrelated posts.
+        """
+        resolve = self.vault_link if fmt == "hugo" else self.hugo_ref
+        data = json.dumps([(link, resolve(link)) for link in sorted(set(links))])
+        return hashlib.md5(data.encode("utf-8")).hexdigest()
+
+    def hugo_ref(self, target: str) -> Optional[str]:
+        """Return the ref path for a wikilink target like note#heading, or None."""
+        note, _, anchor = target.partition("#")
+        ref = self._lookup(_ref_key(note))
+        if ref is None:
+            return None
+        return f"{ref}#{anchor}" if anchor else ref
+
+    def vault_link(self, ref_path: str) -> Optional[str]:
+        """Return the wikilink target for a ref path, or None.
+
+        That is the note name, or the note's path when its name is shared
+        by several posts.
+        """
+        path, _, anchor = ref_path.partition("#")
+        ref = self._lookup(_ref_key(path))
+        if ref is None:
+            return None
+        link = _ref_key(ref)
+        name = link.rpartition("/")[2]
+        if len(self._by_name.get(name.lower(), ())) == 1:
+            link = name
+        return f"{link}#{anchor}" if anchor else link
+
+
+def note_ref(
+    post_id: str,
+    hugo_path: Optional[Path],
+    obsidian_path: Optional[Path],
+    stored_format: Optional[str] = None,
+) -> str:
+    """Return the Hugo ref path of a post, from whichever side has it.
+
+    A bundle is referenced by its directory (translations by their
+    bundle's) and a single-file post by its file.
+    """
+    if hugo_path is not None:
+        is_bundle = hugo_path.name == "index.md" or bundle_language(hugo_path) is not None
+        path = hugo_path
+    else:
+        path = obsidian_path
+        is_bundle = (
+            stored_format == "directory"
+            or bundle_language(path) is not None
+            or path.stem == path.parent.name
+        )
+    if is_bundle:
+        return bundle_id(post_id, path).replace(os.sep, "/")
+    return post_id.replace(os.sep, "/") + ".md"
+
+
+def update_note_index(
+    state: Dict,
+    post_ids: Iterable[str],
+    hugo_posts: Dict[str, Path],
+    obsidian_posts: Dict[str, Path],
+) -> NoteIndex:
+    """Refresh the state["links"] entries of post_ids and return the index.
+
+    Posts found on neither side are dropped from the index, along with
+    their outlinks.
+    """
+    refs = state.setdefault("links", {})
+    formats = state.get("format", {})
+    for post_id in post_ids:
+        hugo_path = hugo_posts.get(post_id)
+        obsidian_path = obsidian_posts.get(post_id)
+        if hugo_path is None and obsidian_path is None:
+            refs.pop(post_id, None)
+            if post_id in state.get("outlinks", {}):
+                record_outlinks(state, post_id, None)
+        else:
+            refs[post_id] = note_ref(post_id, hugo_path, obsidian_path, formats.get(post_id))
+    return NoteIndex(refs)
+
+
+# Posts are synced on several threads with --io-concurrency, and a post's
+# backlinks update reads and rewrites lists shared with other posts
+_backlinks_lock = threading.Lock()
+
+
+def record_outlinks(state: Dict, post_id: str, targets: Optional[List[str]]) -> None:
+    """Record the target IDs a post links to and update the backlinks.
+
+    targets of None forgets the post's links. Safe to call from several
+    threads at once.
+    """
+    with _backlinks_lock:
+        outlinks = state.setdefault("outlinks", {})
+        backlinks = state.setdefault("backlinks", {})
+        old = outlinks.pop(post_id, [])
+        if targets is not None:
+            outlinks[post_id] = targets
+        new = set(targets or ())
+        for target in old:
+            if target not in new:
+                referrers = backlinks.get(target, [])
+                if post_id in referrers:
+                    referrers.remove(post_id)
+                if not referrers:
+                    backlinks.pop(target, None)
+        for target in new.difference(old):
+            backlinks.setdefault(target, []).append(post_id)
@@ -0,0 +1,240 @@
+"""
+Post renames for Hugo-Obsidian sync.
+
+`sync.py rename OLD NEW` moves a post on both sides: a single-file post is
+moved as a file, a bundle as a directory with its translations and
+assets (in the vault, the notes named after the bundle are renamed with
+it). The posts linking to it are found through the backlinks index (see
+links.py) and only their links are rewritten, in each side's own format.
+State entries move to the new IDs, and the rewritten posts are
+fingerprinted from memory, so the next sync finds everything unchanged.
+"""
+
+import os
+from pathlib import Path
+from typing import Dict, List, Optional, Set, Tuple
+
+from bundles import bundle_id, translation_language
+from converters import retarget_links
+from durability import make_dirs, move, write_file
+from links import NoteIndex, update_note_index
+from state import hash_bytes, record_fingerprint, stat_tuple
+
+# State sections keyed by post ID, and the per-side ones
+_POST_SECTIONS = ("hugo", "obsidian", "format", "links", "outlinks", "meta")
+_SIDE_SECTIONS = ("stat", "assets")
+
+
+def renamed_ids(
+    old: str,
+    new: str,
+    hugo_posts: Dict[str, Path],
+    obsidian_posts: Dict[str, Path],
+    hugo_dir: Path,
+    obsidian_dir: Path,
+) -> Dict[str, str]:
+    """Return {old ID: new ID} for the posts moved by renaming old to new.
+
+    These are old itself, the translations of bundle old and, when old
+    is a bundle, the posts in subdirectories of it.
+    """
+    moved = {}
+    is_bundle = False
+    for directory, posts in ((hugo_dir, hugo_posts), (obsidian_dir, obsidian_posts)):
+        for post_id, path in posts.items():
+            if post_id == old or bundle_id(post_id, path) == old:
+                moved[post_id] = new + post_id[len(old):]
+                is_bundle = is_bundle or path.parent == directory / old
+    if is_bundle:
+        for posts in (hugo_posts, obsidian_posts):
+            for post_id in posts:
+                if post_id.startswith(old + os.sep):
+                    moved[post_id] = new + post_id[len(old):]
+    return moved
+
+
+def plan_moves(
+    old: str,
+    new: str,
+    moved: Dict[str, str],
+    directory: Path,
+    posts: Dict[str, Path],
+    vault: bool,
+) -> Tuple[List[Tuple[Path, Path]], Dict[str, Path]]:
+    """Return the (source, destination) renames for one side and the new post paths.
+
+    A bundle directory is moved first, then (in the vault) the notes in it
+    that are named after the bundle.
+    """
+    ids = [post_id for post_id in moved if post_id in posts]
+    if not ids:
+        return [], {}
+    old_dir, new_dir = directory / old, directory / new
+    old_name, new_name = Path(old).name, Path(new).name
+
+    if not any(posts[post_id].parent == old_dir for post_id in ids):
+        # Single-file post
+        target = directory / f"{new}.md"
+        return [(posts[old], target)], {new: target}
+
+    renames = [(old_dir, new_dir)]
+    paths = {}
+    for post_id in ids:
+        path = new_dir / posts[post_id].relative_to(old_dir)
+        name = path.name
+        if vault and path.parent == new_dir and (
+            name == f"{old_name}.md" or translation_language(name, old_name)
+        ):
+            renamed = path.with_name(new_name + name[len(old_name):])
+            renames.append((path, renamed))
+            path = renamed
+        paths[moved[post_id]] = path
+    return renames, paths
+
+
+def _move_keys(entries: Dict, keys: Dict[str, str]) -> None:
+    for old_key in [key for key in entries if key in keys]:
+        entries[keys[old_key]] = entries.pop(old_key)
+
+
+def rename_state(state: Dict, keys: Dict[str, str]) -> None:
+    """Move the state entries of renamed posts and bundles to their new IDs.
+
+    keys maps old post and bundle IDs to new ones. Stored stat tuples stay
+    valid: a rename keeps a file's size, mtime and inode.
+    """
+    for section in _POST_SECTIONS:
+        _move_keys(state.get(section, {}), keys)
+    for section in _SIDE_SECTIONS:
+        for entries in state.get(section, {}).values():
+            _move_keys(entries, keys)
+
+    # Link targets and referrers may both have moved
+    for post_id, targets in state.get("outlinks", {}).items():
+        state["outlinks"][post_id] = sorted(keys.get(target, target) for target in targets)
+    backlinks = state.get("backlinks", {})
+    _move_keys(backlinks, keys)
+    for target, referrers in backlinks.items():
+        backlinks[target] = [keys.get(post_id, post_id) for post_id in referrers]
+
+
+def migrate_translations(state: Dict, obsidian_dir: Path, dry_run: bool = False) -> int:
+    """Move bundle translations synced under their old IDs to <bundle>.<lang>.
+
+    Before translations were grouped with their bundle, my-post/index.fr.md
+    was a post of its own with ID my-post/index.fr, synced to the vault
+    under the same name. Its state entries (hashes, stats, assets) move to
+    my-post.fr, and unless dry_run the vault file is renamed to
+    my-post/my-post.fr.md, so the next sync finds it unchanged. Returns the
+    number of posts moved.
+    """
+    keys = {}
+    for post_id in set(state.get("hugo", {})) | set(state.get("obsidian", {})):
+        parent, _, name = post_id.rpartition(os.sep)
+        bundle_name = parent.rpartition(os.sep)[2]
+        language = translation_language(f"{name}.md", bundle_name) if parent else None
+        if not language or not name.startswith("index."):
+            continue
+        new_id = f"{parent}.{language}"
+        if new_id in state.get("hugo", {}) or new_id in state.get("obsidian", {}):
+            continue
+        keys[post_id] = new_id
+
+        old_path = obsidian_dir / f"{post_id}.md"
+        new_path = obsidian_dir / parent / f"{bundle_name}.{language}.md"
+        if not dry_run and old_path.exists() and not new_path.exists():
+            move(old_path, new_path)
+
+    rename_state(state, keys)
+    for new_id in keys.values():
+        state.setdefault("format", {})[new_id] = "directory"
+    return len(keys)
+
+
+def rewrite_links(
+    path: Path,
+    fmt: str,
+    keys: Dict[str, str],
+    old_index: NoteIndex,
+    new_index: NoteIndex,
+) -> Optional[bytes]:
+    """Point the links in a post at renamed posts; return the new bytes if any changed."""
+    def retarget(link: str) -> Optional[str]:
+        target = old_index.resolve(link)
+        if target not in keys:
+            return None
+        anchor = link.partition("#")[2]
+        new_link = keys[target].replace(os.sep, "/") + (f"#{anchor}" if anchor else "")
+        ref = new_index.hugo_ref(new_link)
+        return ref if fmt == "hugo" or ref is None else new_index.vault_link(ref)
+
+    data = path.read_bytes()
+    content = data.decode("utf-8")
+    rewritten = retarget_links(content, fmt, retarget)
+    return None if rewritten == content else rewritten.encode("utf-8")
+
+
+def rename_post(
+    old: str,
+    new: str,
+    state: Dict,
+    hugo_posts: Dict[str, Path],
+    obsidian_posts: Dict[str, Path],
+    hugo_dir: Path,
+    obsidian_dir: Path,
+    dry_run: bool = False,
+) -> Set[str]:
+    """Rename post (or bundle) old to new on both sides and update the links to it.
+
+    The post maps and state are updated in place. Returns the new IDs of
+    the posts whose links were rewritten.
+    """
+    moved = renamed_ids(old, new, hugo_posts, obsidian_posts, hugo_dir, obsidian_dir)
+    keys = {old: new, **moved}
+    backlinks = state.get("backlinks", {})
+    referrers = {
+        keys.get(post_id, post_id) for target in keys for post_id in backlinks.get(target, ())
+    }
+
+    sides = (
+        ("hugo", hugo_dir, hugo_posts, False),
+        ("obsidian", obsidian_dir, obsidian_posts, True),
+    )
+    plans = [
+        (side, posts, *plan_moves(old, new, moved, directory, posts, vault))
+        for side, directory, posts, vault in sides
+    ]
+    for side, _, renames, _ in plans:
+        for source, destination in renames:
+            print(f"  {'Would move' if dry_run else 'Move'}: {source} -> {destination}")
+    if dry_run:
+        for post_id in sorted(referrers):
+            print(f"  Would update links in: {post_id}")
+        return referrers
+
+    for _, posts, renames, paths in plans:
+        for source, destination in renames:
+            make_dirs(destination.parent)
+            move(source, destination)
+        for post_id in moved:
+            posts.pop(post_id, None)
+        posts.update(paths)
+
+    old_index = NoteIndex(state.get("links", {}))
+    rename_state(state, keys)
+    new_index = update_note_index(state, moved.values(), hugo_posts, obsidian_posts)
+
+    updated = set()
+    for post_id in sorted(referrers):
+        for side, _, posts, _ in sides:
+            path = posts.get(post_id)
+            if path is None:
+                continue
+            data = rewrite_links(path, side, keys, old_index, new_index)
+            if data is None:
+                continue
+            written = write_file(path, data)
+            record_fingerprint(state, side, post_id, hash_bytes(data), stat_tuple(written))
+            updated.add(post_id)
+            print(f"  Updated links in: {path}")
+    return updated
@@ -1,13 +1,31 @@
 """
 State tracking for Hugo-Obsidian sync.
 Tracks file hashes to detect changes since last sync.
+
+Each hash is stored next to the file's (size, mtime_ns, inode) stat tuple
+under state["stat"][side], so unchanged files can be recognised from a
+single stat() call without reading their content. Bundle assets are
+tracked the same way, as {name: [hash, stat]} under
+state["assets"][side][post_id].
+
+The state dict is persisted by a state store. JsonStateStore keeps the
+original single JSON file; SqliteStateStore keeps one row per post, and
+one row per entry of the other per-post indexes, in a WAL-mode database
+and only writes the rows that changed.
 """
 
 import hashlib
 import json
 import os
+import sqlite3
 from pathlib import Path
-from typing import Dict, Optional
+from typing import Any, Dict, List, Optional, Tuple
+
+from durability import commit, get_durability, make_dirs, sync_pending
+from timing import count, phase
+
+# (hash, [size, mtime_ns, inode]) of a file as seen during a scan
+Fingerprint = Tuple[str, Optional[List[int]]]
 
 
 def get_state_path(config_state_file: str) -> Path:
@@ -29,10 +47,247 @@ def load_state(state_path: Path) -> Dict:
 
 
 def save_state(state_path: Path, state: Dict) -> None:
-    """Save sync state to JSON file."""
-    state_path.parent.mkdir(parents=True, exist_ok=True)
-    with open(state_path, "w") as f:
-        json.dump(state, f, indent=2)
+    """Save sync state to JSON file, as the commit point of a run (see durability.py)."""
+    make_dirs(state_path.parent)
+    commit(state_path, json.dumps(state, indent=2).encode("utf-8"))
+
+
+class JsonStateStore:
+    """State store that reads and rewrites one JSON file, for small setups."""
+
+    def __init__(self, path: Path):
+        self.path = path
+
+    def load(self) -> Dict:
+        return load_state(self.path)
+
+    def save(self, state: Dict) -> None:
+        save_state(self.path, state)
+
+
+# Per-post sections are stored as one row per post ID in the posts table,
+# with stat tuples split into integer columns. The keyed sections below
+# are stored in the entries table, one row per key at the given depth
+# (e.g. state["dirs"][side]["listing"][rel_dir]), with the keys above it
+# joined by "/" as the row's parent. Any other top-level section is stored
+# whole as JSON in the sections table.
+_SIDES = ("hugo", "obsidian")
+_POST_SECTIONS = ("hugo", "obsidian", "format", "stat", "assets")
+_KEYED_SECTIONS = {"meta": 1, "links": 1, "outlinks": 1, "backlinks": 1, "git": 2, "dirs": 3}
+
+# A post's row as stored: (post_id, hugo hash, obsidian hash, format,
+# hugo size, mtime_ns, inode, obsidian size, mtime_ns, inode,
+# hugo assets JSON, obsidian assets JSON)
+PostRow = Tuple[Any, ...]
+
+# (section, parent, key) of a keyed section entry
+EntryKey = Tuple[str, str, str]
+
+_NO_STAT = (None, None, None)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS posts (
+    post_id TEXT PRIMARY KEY,
+    hugo TEXT, obsidian TEXT, format TEXT,
+    hugo_size INTEGER, hugo_mtime_ns INTEGER, hugo_ino INTEGER,
+    obsidian_size INTEGER, obsidian_mtime_ns INTEGER, obsidian_ino INTEGER,
+    hugo_assets TEXT, obsidian_assets TEXT
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS entries (
+    section TEXT, parent TEXT, key TEXT, value TEXT NOT NULL,
+    PRIMARY KEY (section, parent, key)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS sections (name TEXT PRIMARY KEY, value TEXT NOT NULL);
+"""
+
+
+def _post_rows(state: Dict) -> Dict[str, PostRow]:
+    """Split the per-post sections of a state dict into rows by post ID."""
+    hugo, obsidian = state.get("hugo", {}), state.get("obsidian", {})
+    formats = state.get("format", {})
+    hugo_stats, obsidian_stats = (state.get("stat", {}).get(side, {}) for side in _SIDES)
+    hugo_assets, obsidian_assets = (state.get("assets", {}).get(side, {}) for side in _SIDES)
+
+    return {
+        post_id: (
+            post_id,
+            hugo.get(post_id),
+            obsidian.get(post_id),
+            formats.get(post_id),
+            *(hugo_stats.get(post_id) or _NO_STAT),
+            *(obsidian_stats.get(post_id) or _NO_STAT),
+            json.dumps(hugo_assets[post_id]) if hugo_assets.get(post_id) else None,
+            json.dumps(obsidian_assets[post_id]) if obsidian_assets.get(post_id) else None,
+        )
+        for post_id in set().union(
+            hugo, obsidian, formats, hugo_stats, obsidian_stats, hugo_assets, obsidian_assets
+        )
+    }
+
+
+def _flatten(
+    entries: Dict[EntryKey, str], section: str, parent: str, value: Dict, depth: int
+) -> None:
+    """Add the entries of a keyed section, descending depth levels into value.
+
+    Values that are not non-empty dicts end the descent early and are
+    stored as they are, so any shape loads back unchanged.
+    """
+    for key, item in value.items():
+        if depth > 1 and isinstance(item, dict) and item:
+            _flatten(entries, section, f"{parent}/{key}" if parent else key, item, depth - 1)
+        else:
+            entries[(section, parent, key)] = json.dumps(item)
+
+
+def _split_sections(state: Dict) -> Tuple[Dict[EntryKey, str], Dict[str, str]]:
+    """Split the non-post sections of a state dict into entries and whole sections."""
+    entries: Dict[EntryKey, str] = {}
+    sections: Dict[str, str] = {}
+    for name, value in state.items():
+        if name in _POST_SECTIONS:
+            continue
+        if name in _KEYED_SECTIONS and isinstance(value, dict) and value:
+            _flatten(entries, name, "", value, _KEYED_SECTIONS[name])
+        else:
+            sections[name] = json.dumps(value)
+    return entries, sections
+
+
+class SqliteStateStore:
+    """State store backed by a SQLite database in WAL mode.
+
+    The rows read by load() are remembered, and save() upserts only the
+    posts and index entries whose row changed and deletes the ones that
+    disappeared, all in one transaction, so a sync that touches one post
+    writes a few rows whatever the size of the site. An interrupted save
+    leaves the previous state intact. Files written before the save are
+    synced first, and the transaction is synced on commit unless
+    durability is none (see durability.py).
+    """
+
+    def __init__(self, path: Path):
+        self.path = path
+        self._rows: Dict[str, PostRow] = {}
+        self._entries: Dict[EntryKey, str] = {}
+        self._sections: Dict[str, str] = {}
+
+    def _connect(self) -> sqlite3.Connection:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        conn = sqlite3.connect(str(self.path))
+        conn.execute("PRAGMA journal_mode=WAL")
+        synchronous = "NORMAL" if get_durability() == "none" else "FULL"
+        conn.execute(f"PRAGMA synchronous={synchronous}")
+        conn.executescript(_SCHEMA)
+        return conn
+
+    def load(self) -> Dict:
+        state: Dict = {"hugo": {}, "obsidian": {}, "format": {}}
+        self._rows = {}
+        self._entries = {}
+        self._sections = {}
+        if not self.path.exists():
+            return state
+
+        conn = self._connect()
+        try:
+            posts = conn.execute("SELECT * FROM posts").fetchall()
+            entries = conn.execute(
+                "SELECT section, parent, key, value FROM entries ORDER BY section, parent, key"
+            ).fetchall()
+            sections = conn.execute("SELECT name, value FROM sections").fetchall()
+        finally:
+            conn.close()
+
+        self._rows = {row[0]: row for row in posts}
+        for index, name in enumerate(("hugo", "obsidian", "format"), 1):
+            state[name] = {row[0]: row[index] for row in posts if row[index] is not None}
+        stats = {
+            side: {row[0]: list(row[index:index + 3]) for row in posts if row[index] is not None}
+            for side, index in zip(_SIDES, (4, 7))
+        }
+        assets = {
+            side: {row[0]: json.loads(row[index]) for row in posts if row[index]}
+            for side, index in zip(_SIDES, (10, 11))
+        }
+        for name, section in (("stat", stats), ("assets", assets)):
+            section = {side: entries for side, entries in section.items() if entries}
+            if section:
+                state[name] = section
+        for name, value in sections:
+            self._sections[name] = value
+            state[name] = json.loads(value)
+        for section, parent, key, value in entries:
+            self._entries[(section, parent, key)] = value
+            node = state.setdefault(section, {})
+            for part in parent.split("/") if parent else ():
+                node = node.setdefault(part, {})
+            node[key] = json.loads(value)
+        return state
+
+    def save(self, state: Dict) -> None:
+        rows = _post_rows(state)
+        changed = [row for post_id, row in rows.items() if self._rows.get(post_id) != row]
+        removed = [(post_id,) for post_id in self._rows if post_id not in rows]
+
+        entries, sections = _split_sections(state)
+        changed_entries = [
+            (*key, value) for key, value in entries.items() if self._entries.get(key) != value
+        ]
+        removed_entries = [key for key in self._entries if key not in entries]
+        changed_sections = [
+            (name, value) for name, value in sections.items()
+            if self._sections.get(name) != value
+        ]
+        removed_sections = [(name,) for name in self._sections if name not in sections]
+
+        sync_pending()
+        conn = self._connect()
+        try:
+            with conn:
+                conn.executemany(
+                    f"INSERT OR REPLACE INTO posts VALUES ({', '.join('?' * 12)})", changed
+                )
+                conn.executemany("DELETE FROM posts WHERE post_id = ?", removed)
+                conn.executemany(
+                    "INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?)", changed_entries
+                )
+                conn.executemany(
+                    "DELETE FROM entries WHERE section = ? AND parent = ? AND key = ?",
+                    removed_entries,
+                )
+                conn.executemany("INSERT OR REPLACE INTO sections VALUES (?, ?)", changed_sections)
+                conn.executemany("DELETE FROM sections WHERE name = ?", removed_sections)
+        finally:
+            conn.close()
+        self._rows = rows
+        self._entries = entries
+        self._sections = sections
+
+
+STATE_BACKENDS = {"json": JsonStateStore, "sqlite": SqliteStateStore}
+
+
+def open_state_store(path: Path, backend: Optional[str] = None):
+    """Return the state store for path.
+
+    Without an explicit backend, .db, .sqlite and .sqlite3 files use SQLite
+    and anything else uses JSON.
+    """
+    if backend is None:
+        backend = "sqlite" if path.suffix in (".db", ".sqlite", ".sqlite3") else "json"
+    return STATE_BACKENDS[backend](path)
+
+
+def migrate_json_state(json_path: Path, store) -> int:
+    """Copy a JSON state file into another state store.
+
+    Returns the number of posts migrated.
+    """
+    state = load_state(json_path)
+    store.load()
+    store.save(state)
+    return len(set(state["hugo"]) | set(state["obsidian"]))
 
 
 def get_file_hash(file_path: Path) -> str:
@@ -41,12 +296,21 @@ def get_file_hash(file_path: Path) -> str:
         return ""
 
     hasher = hashlib.md5()
-    with open(file_path, "rb") as f:
+    size = 0
+    with phase("hash"), open(file_path, "rb") as f:
         for chunk in iter(lambda: f.read(8192), b""):
             hasher.update(chunk)
+            size += len(chunk)
+    count("files_hashed")
+    count("bytes_hashed", size)
     return hasher.hexdigest()
 
 
+def hash_bytes(data: bytes) -> str:
+    """Calculate MD5 hash of in-memory content, matching get_file_hash."""
+    return hashlib.md5(data).hexdigest()
+
+
 def get_file_mtime(file_path: Path) -> float:
     """Get file modification time."""
     if not file_path.exists():
@@ -54,8 +318,118 @@ def get_file_mtime(file_path: Path) -> float:
     return file_path.stat().st_mtime
 
 
-def file_changed(file_path: Path, stored_hash: Optional[str]) -> bool:
-    """Check if file has changed since last sync."""
+def stat_tuple(st: os.stat_result) -> List[int]:
+    """Return the (size, mtime_ns, inode) stat tuple of a stat result."""
+    return [st.st_size, st.st_mtime_ns, st.st_ino]
+
+
+def get_file_stat(file_path: Path) -> Optional[List[int]]:
+    """Get the (size, mtime_ns, inode) stat tuple of a file, or None if missing."""
+    try:
+        st = file_path.stat()
+    except FileNotFoundError:
+        return None
+    return stat_tuple(st)
+
+
+def get_stored_stat(state: Dict, side: str, post_id: str) -> Optional[List[int]]:
+    """Get the stat tuple recorded for a post at the last sync."""
+    return state.get("stat", {}).get(side, {}).get(post_id)
+
+
+def record_fingerprint(
+    state: Dict,
+    side: str,
+    post_id: str,
+    file_hash: str,
+    file_stat: Optional[List[int]],
+) -> None:
+    """Record a post's hash and stat tuple for one side of the sync."""
+    state.setdefault(side, {})[post_id] = file_hash
+    state.setdefault("stat", {}).setdefault(side, {})[post_id] = file_stat
+
+
+def forget_fingerprint(state: Dict, side: str, post_id: str) -> None:
+    """Drop a post's hash and stat tuple for one side of the sync."""
+    state.get(side, {}).pop(post_id, None)
+    state.get("stat", {}).get(side, {}).pop(post_id, None)
+    state.get("assets", {}).get(side, {}).pop(post_id, None)
+
+
+def get_asset_fingerprints(state: Dict, side: str, post_id: str) -> Dict[str, Fingerprint]:
+    """Get the fingerprints recorded for a post's assets at the last sync."""
+    assets = state.get("assets", {}).get(side, {}).get(post_id, {})
+    return {name: (file_hash, file_stat) for name, (file_hash, file_stat) in assets.items()}
+
+
+def record_asset_fingerprints(
+    state: Dict,
+    side: str,
+    post_id: str,
+    fingerprints: Dict[str, Fingerprint],
+) -> None:
+    """Record the fingerprints of a post's assets, replacing earlier ones."""
+    assets = state.setdefault("assets", {}).setdefault(side, {})
+    if fingerprints:
+        assets[post_id] = {name: list(fingerprint) for name, fingerprint in fingerprints.items()}
+    else:
+        assets.pop(post_id, None)
+
+
+def update_fingerprint(
+    state: Dict,
+    side: str,
+    post_id: str,
+    fingerprint: Optional[Fingerprint],
+) -> None:
+    """Store a scanned fingerprint if it differs from the recorded one.
+
+    A missing fingerprint (the file no longer exists) forgets the post.
+    """
+    if fingerprint is None or fingerprint[1] is None:
+        forget_fingerprint(state, side, post_id)
+        return
+    file_hash, file_stat = fingerprint
+    stored_stat = get_stored_stat(state, side, post_id)
+    if state.get(side, {}).get(post_id) != file_hash or stored_stat != file_stat:
+        record_fingerprint(state, side, post_id, file_hash, file_stat)
+
+
+def get_fingerprint(
+    file_path: Path,
+    stored_hash: Optional[str],
+    stored_stat: Optional[List[int]],
+    paranoid: bool = False,
+) -> Fingerprint:
+    """Return (hash, stat) for a file.
+
+    The stored hash is reused when the stat tuple is unchanged; the file is
+    only read and hashed when it differs, or always in paranoid mode.
+    """
+    current_stat = get_file_stat(file_path)
+    if current_stat is None:
+        return "", None
+    if (
+        not paranoid
+        and stored_hash
+        and stored_stat is not None
+        and list(stored_stat) == current_stat
+    ):
+        return stored_hash, current_stat
+    return get_file_hash(file_path), current_stat
+
+
+def file_changed(
+    file_path: Path,
+    stored_hash: Optional[str],
+    stored_stat: Optional[List[int]] = None,
+    paranoid: bool = False,
+) -> bool:
+    """Check if file has changed since last sync.
+
+    Uses the stat tuple as a fast path and only hashes when it differs.
+    """
     if stored_hash is None:
         return True
-    return get_file_hash(file_path) != stored_hash
+    file_hash, _ = get_fingerprint(file_path, stored_hash, stored_stat, paranoid)
+    return file_hash != stored_hash
@@ -11,27 +11,88 @@ Usage:
     python sync.py --pull       # Hugo -> Obsidian only
     python sync.py --dry-run    # Show what would change
     python sync.py --force hugo # Hugo wins all conflicts
+    python sync.py --paranoid   # Hash every file instead of trusting stat()
+    python sync.py --jobs 8     # Scan and hash with 8 worker threads
+    python sync.py --convert-workers 4  # Convert large syncs in 4 processes
+    python sync.py --io-concurrency 16  # Overlap file I/O on slow filesystems
+    python sync.py --asset-transfer reflink  # Clone assets instead of copying
+    python sync.py --durability strict  # Fsync every file as it is written
+    python sync.py --only 'blog/*'  # Only sync posts whose ID matches a glob
+    python sync.py --watch      # Keep syncing as files change
+    python sync.py --stats      # Print per-phase timings and I/O counters
+    python sync.py rename blog/old blog/new  # Rename a post and update links to it
+    python sync.py query --tag llm  # List posts from the front matter index
 """
 
 import argparse
+import cProfile
 import difflib
+import fnmatch
+import hashlib
+import io
+import itertools
+import json
 import os
-import shutil
+import re
 import sys
+import time
+from collections import Counter, deque
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from functools import lru_cache, partial
 from pathlib import Path
-from typing import Dict, List, Optional, Tuple
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Pattern, Set, Tuple
 
 import yaml
 
-from converters import hugo_to_obsidian, obsidian_to_hugo
+from aio import run_ordered
+from assets import ASSET_TRANSFER_MODES, sync_assets
+from bundles import bundle_id, bundle_language, translation_language
+from cache import DEFAULT_CACHE_SIZE, ConversionCache
+from converters import (
+    convert_batch,
+    find_links,
+    hugo_to_obsidian,
+    obsidian_to_hugo,
+    stream_convert,
+)
+from durability import (
+    DURABILITY_MODES,
+    file_mode,
+    make_dirs,
+    replace,
+    set_durability,
+    temp_file,
+    write_file,
+)
+from filters import PostFilter, iso_date
+from frontmatter import (
+    incomplete_series,
+    query_index,
+    record_front_matter,
+    update_front_matter_index,
+)
+from gitindex import GitDetector
+from links import NoteIndex, record_outlinks, update_note_index
+from rename import migrate_translations, rename_post, renamed_ids
 from state import (
+    STATE_BACKENDS,
+    Fingerprint,
     file_changed,
+    forget_fingerprint,
     get_file_hash,
-    get_file_mtime,
+    get_fingerprint,
     get_state_path,
-    load_state,
-    save_state,
+    get_stored_stat,
+    hash_bytes,
+    migrate_json_state,
+    open_state_store,
+    record_asset_fingerprints,
+    record_fingerprint,
+    stat_tuple,
+    update_fingerprint,
 )
+from timing import count, format_report, phase, post_timer, start_recording, stop_recording
+from watch import open_watcher, watch_changes
 
 
 class SyncAction:
@@ -70,26 +131,278 @@ def get_post_id(path: Path, base_dir: Path) -> str:
     if path.stem == path.parent.name:
         return str(rel_path.parent)
 
+    # For bundle translations (index.fr.md or folder/folder.fr.md), use the
+    # directory name plus the language, as Hugo does for about.fr.md
+    language = bundle_language(path)
+    if language and path.parent != base_dir:
+        return f"{rel_path.parent}.{language}"
+
     # For single-file posts, use the filename without extension
     return str(rel_path.with_suffix(""))
 
 
-def scan_posts(directory: Path) -> Dict[str, Path]:
-    """Scan a directory for markdown posts and return {post_id: path}."""
-    posts = {}
+def _walked_post_id(rel_path: str, base_name: str) -> str:
+    """get_post_id for a "/"-separated markdown path from the walker.
+
+    Works on strings only, which keeps large scans clear of pathlib
+    overhead. base_name is the name of the scanned directory.
+    """
+    parent, _, name = rel_path.rpartition("/")
+    parent_name = parent.rpartition("/")[2] if parent else base_name
+    if name == "index.md" or name[:-3] == parent_name:
+        return parent.replace("/", os.sep) or "."
+    if parent and name.count(".") > 1:
+        language = translation_language(name, parent_name)
+        if language:
+            return f"{parent}.{language}".replace("/", os.sep)
+    return rel_path[:-3].replace("/", os.sep)
+
+
+# Names skipped by the walker unless config.yaml sets its own ignore list
+DEFAULT_IGNORE = [".git", ".obsidian", ".trash"]
+
+# Directory listings are only cached once the directory's mtime is this old,
+# so changes made within the same timestamp tick are never missed
+_RACY_MTIME_NS = 2_000_000_000
+
+# rel_dir -> [mtime_ns, markdown file names, subdirectory names]
+Listing = Dict[str, list]
+
+
+@lru_cache(maxsize=None)
+def _ignore_patterns(ignore: Tuple[str, ...]) -> Tuple[Optional[Pattern], Optional[Pattern]]:
+    """Compile ignore globs into (name pattern, relative path pattern).
+
+    Globs without a slash match entry names; globs with one match paths
+    relative to the scanned directory.
+    """
+    def compile_globs(globs: List[str]) -> Optional[Pattern]:
+        return re.compile("|".join(fnmatch.translate(glob) for glob in globs)) if globs else None
+
+    return (
+        compile_globs([glob for glob in ignore if "/" not in glob]),
+        compile_globs([glob for glob in ignore if "/" in glob]),
+    )
+
+
+def _is_ignored(name: str, rel_path: str, ignore: List[str]) -> bool:
+    """Return whether an entry matches an ignore glob by name or relative path."""
+    name_pattern, path_pattern = _ignore_patterns(tuple(ignore))
+    return bool(
+        (name_pattern and name_pattern.match(name))
+        or (path_pattern and path_pattern.match(rel_path))
+    )
+
+
+def ignore_filter(roots: List[Path], ignore: List[str]) -> Callable[[Path], bool]:
+    """Return a predicate telling whether an entry under one of roots is ignored.
+
+    Only the entry's own name and relative path are matched, as the
+    watchers prune ignored directories on their way down.
+    """
+    def ignored(path: Path) -> bool:
+        for root in roots:
+            if root in path.parents:
+                return _is_ignored(path.name, path.relative_to(root).as_posix(), ignore)
+        return False
+    return ignored
+
+
+def _path_ignored(rel_path: str, ignore: List[str]) -> bool:
+    """Return whether a relative path or any directory above it is ignored."""
+    parts = rel_path.split("/")
+    return any(
+        _is_ignored(parts[i], "/".join(parts[:i + 1]), ignore) for i in range(len(parts))
+    )
+
+
+def _list_dir(
+    root: str,
+    rel_dir: str,
+    ignore: List[str],
+    cached: Listing,
+    listing: Listing,
+) -> Tuple[List[str], List[str]]:
+    """Return the (markdown file names, subdirectory names) of one directory.
 
+    The cached listing is reused when the directory's mtime is unchanged,
+    costing one stat() instead of a scandir(). Fresh listings are recorded
+    in listing.
+    """
+    path = os.path.join(root, rel_dir)
+    mtime_ns = os.stat(path).st_mtime_ns
+    entry = cached.get(rel_dir)
+    if entry is not None and entry[0] == mtime_ns:
+        listing[rel_dir] = entry
+        count("dirs_cached")
+        return entry[1], entry[2]
+
+    count("dirs_listed")
+    files, subdirs = [], []
+    prefix = rel_dir + "/" if rel_dir else ""
+    with os.scandir(path) as entries:
+        for item in entries:
+            name = item.name
+            if item.is_dir(follow_symlinks=False):
+                if not _is_ignored(name, prefix + name, ignore):
+                    subdirs.append(name)
+            elif (
+                name.endswith(".md")
+                and not name.startswith("_")  # Skip non-post files
+                and not _is_ignored(name, prefix + name, ignore)
+            ):
+                files.append(name)
+    if time.time_ns() - mtime_ns > _RACY_MTIME_NS:
+        listing[rel_dir] = [mtime_ns, files, subdirs]
+    return files, subdirs
+
+
+def _walk_markdown(
+    root: str,
+    rel_dir: str,
+    ignore: List[str],
+    cached: Optional[Listing] = None,
+    listing: Optional[Listing] = None,
+) -> List[str]:
+    """Return the relative paths of post markdown files under root/rel_dir."""
+    cached = {} if cached is None else cached
+    listing = {} if listing is None else listing
+    found = []
+    pending = [rel_dir]
+    while pending:
+        current = pending.pop()
+        files, subdirs = _list_dir(root, current, ignore, cached, listing)
+        prefix = current + "/" if current else ""
+        found.extend(prefix + name for name in files)
+        pending.extend(prefix + name for name in subdirs)
+    return found
+
+
+def scan_posts(
+    directory: Path,
+    executor: Optional[Executor] = None,
+    ignore: Optional[List[str]] = None,
+    dir_cache: Optional[Dict] = None,
+) -> Dict[str, Path]:
+    """Scan a directory for markdown posts and return {post_id: path}.
+
+    Entries matching an ignore glob (by name or by path relative to
+    directory) are skipped along with their subtrees. If dir_cache is
+    given, directory listings are cached in it by mtime, so directories
+    whose entries did not change are not listed again on the next scan.
+
+    Top-level subdirectories are walked on the executor when one is given.
+    Posts are returned in sorted post-ID order either way.
+    """
     if not directory.exists():
-        return posts
+        return {}
+
+    ignore = DEFAULT_IGNORE if ignore is None else list(ignore)
+    cached: Listing = {}
+    if dir_cache is not None and dir_cache.get("ignore") == ignore:
+        cached = dir_cache.get("listing", {})
+    listing: Listing = {}
+
+    root = str(directory)
+    md_files, subdirs = _list_dir(root, "", ignore, cached, listing)
+    md_files = list(md_files)
+
+    def walk(subdir: str) -> List[str]:
+        return _walk_markdown(root, subdir, ignore, cached, listing)
+
+    mapper = executor.map if executor else map
+    for found in mapper(walk, subdirs):
+        md_files.extend(found)
+
+    if dir_cache is not None:
+        dir_cache.clear()
+        dir_cache.update(ignore=ignore, listing=dict(sorted(listing.items())))
+
+    # Sorted by path components, so the same file wins when two map to one ID
+    md_files.sort(key=lambda md_file: md_file.split("/"))
+    posts = {
+        _walked_post_id(md_file, directory.name): directory / md_file for md_file in md_files
+    }
+    return dict(sorted(posts.items()))
+
+
+def fingerprint_post(
+    state: Dict, side: str, post_id: str, path: Path, paranoid: bool = False
+) -> Fingerprint:
+    """Fingerprint a post's file, reusing its recorded hash when stat matches."""
+    return get_fingerprint(
+        path, state.get(side, {}).get(post_id), get_stored_stat(state, side, post_id), paranoid
+    )
+
+
+def scan_directory(
+    directory: Path,
+    state: Dict,
+    side: str,
+    jobs: int = 1,
+    paranoid: bool = False,
+    ignore: Optional[List[str]] = None,
+) -> Dict[str, Path]:
+    """Walk a directory for posts, with listings cached in state["dirs"][side].
+
+    Paranoid mode lists every directory again. With jobs > 1 top-level
+    subdirectories are walked on a thread pool.
+    """
+    dir_cache = state.setdefault("dirs", {}).setdefault(side, {})
+    if paranoid:
+        dir_cache.clear()
+    if jobs > 1:
+        with ThreadPoolExecutor(max_workers=jobs) as executor:
+            return scan_posts(directory, executor, ignore, dir_cache)
+    return scan_posts(directory, None, ignore, dir_cache)
 
-    for md_file in directory.rglob("*.md"):
-        # Skip non-post files
-        if md_file.name.startswith("_"):
-            continue
 
-        post_id = get_post_id(md_file, directory)
-        posts[post_id] = md_file
+def fingerprint_posts(
+    posts: Dict[str, Path],
+    state: Dict,
+    side: str,
+    jobs: int = 1,
+    paranoid: bool = False,
+    known: Optional[Callable[[str, Path], Optional[Fingerprint]]] = None,
+) -> Dict[str, Fingerprint]:
+    """Fingerprint posts, on a thread pool with jobs > 1.
+
+    known(post_id, path) may return a post's fingerprint without
+    stat/hash (see gitindex.py), or None to fingerprint it as usual.
+    """
+    def fingerprint(item: Tuple[str, Path]) -> Fingerprint:
+        if known is not None:
+            found = known(*item)
+            if found is not None:
+                return found
+        return fingerprint_post(state, side, item[0], item[1], paranoid)
+
+    if jobs > 1:
+        with ThreadPoolExecutor(max_workers=jobs) as executor:
+            fingerprints = list(executor.map(fingerprint, posts.items()))
+    else:
+        fingerprints = [fingerprint(item) for item in posts.items()]
+    return dict(zip(posts, fingerprints))
 
-    return posts
+
+def scan_and_fingerprint(
+    directory: Path,
+    state: Dict,
+    side: str,
+    jobs: int = 1,
+    paranoid: bool = False,
+    ignore: Optional[List[str]] = None,
+    known: Optional[Callable[[str, Path], Optional[Fingerprint]]] = None,
+) -> Tuple[Dict[str, Path], Dict[str, Fingerprint]]:
+    """Scan a directory and fingerprint every post.
+
+    With jobs > 1 the walk and the per-file stat/hash run on bounded
+    thread pools, which hides per-file latency on network and
+    cloud-backed filesystems. Both returned maps are in sorted post-ID
+    order.
+    """
+    posts = scan_directory(directory, state, side, jobs, paranoid, ignore)
+    return posts, fingerprint_posts(posts, state, side, jobs, paranoid, known)
 
 
 def determine_action(
@@ -97,16 +410,27 @@ def determine_action(
     hugo_path: Optional[Path],
     obsidian_path: Optional[Path],
     state: Dict,
+    paranoid: bool = False,
+    fingerprints: Optional[Dict[str, Dict[str, Fingerprint]]] = None,
 ) -> Tuple[str, Optional[str]]:
     """Determine what sync action to take for a post.
 
+    fingerprints maps each side to the {post_id: fingerprint} computed by
+    scan_and_fingerprint; when given, no file is stat'ed or hashed here.
+
     Returns (action, detail) tuple.
     """
     hugo_hash = state.get("hugo", {}).get(post_id)
     obsidian_hash = state.get("obsidian", {}).get(post_id)
 
-    hugo_exists = hugo_path is not None and hugo_path.exists()
-    obsidian_exists = obsidian_path is not None and obsidian_path.exists()
+    if fingerprints is not None:
+        hugo_fp = fingerprints["hugo"].get(post_id)
+        obsidian_fp = fingerprints["obsidian"].get(post_id)
+        hugo_exists = hugo_fp is not None and hugo_fp[1] is not None
+        obsidian_exists = obsidian_fp is not None and obsidian_fp[1] is not None
+    else:
+        hugo_exists = hugo_path is not None and hugo_path.exists()
+        obsidian_exists = obsidian_path is not None and obsidian_path.exists()
 
     # Handle new files
     if hugo_exists and not obsidian_exists and not obsidian_hash:
@@ -122,8 +446,19 @@ def determine_action(
 
     # Both exist - check for modifications
     if hugo_exists and obsidian_exists:
-        hugo_changed = file_changed(hugo_path, hugo_hash)
-        obsidian_changed = file_changed(obsidian_path, obsidian_hash)
+        if fingerprints is not None:
+            hugo_changed = hugo_hash is None or hugo_fp[0] != hugo_hash
+            obsidian_changed = obsidian_hash is None or obsidian_fp[0] != obsidian_hash
+        else:
+            hugo_changed = file_changed(
+                hugo_path, hugo_hash, get_stored_stat(state, "hugo", post_id), paranoid
+            )
+            obsidian_changed = file_changed(
+                obsidian_path,
+                obsidian_hash,
+                get_stored_stat(state, "obsidian", post_id),
+                paranoid,
+            )
 
         if hugo_changed and obsidian_changed:
             return SyncAction.CONFLICT, "Both sides modified"
@@ -135,6 +470,322 @@ def determine_action(
     return SyncAction.UNCHANGED, None
 
 
+def prune_state(state: Dict, side: str, post_ids: Set[str]) -> None:
+    """Forget fingerprints for posts that no longer exist on one side."""
+    for post_id in set(state.get(side, {})) - post_ids:
+        forget_fingerprint(state, side, post_id)
+
+    # Assets are recorded per bundle, which may only hold translations
+    # (my-post.fr); keep the entries of any bundle a post may belong to
+    bundles = post_ids | {post_id.rpartition(".")[0] for post_id in post_ids}
+    for bundle in set(state.get("assets", {}).get(side, {})) - bundles:
+        record_asset_fingerprints(state, side, bundle, {})
+
+
+def read_post(path: Path) -> Tuple[str, bytes, List[int]]:
+    """Read a post, returning its text (with universal newlines), raw bytes and stat tuple.
+
+    The stat is taken before the file is read, so an edit saved meanwhile
+    leaves a stale stat next to the hash, which the next scan notices.
+    """
+    with phase("read"), open(path, "rb") as f:
+        file_stat = stat_tuple(os.fstat(f.fileno()))
+        data = f.read()
+    count("files_read")
+    count("bytes_read", len(data))
+    text = data.decode("utf-8").replace("\r\n", "\n").replace("\r", "\n")
+    return text, data, file_stat
+
+
+def convert_post(
+    convert: Callable[..., str],
+    content: str,
+    data: bytes,
+    cache: Optional[ConversionCache] = None,
+    source_hash: Optional[str] = None,
+    links: Optional[NoteIndex] = None,
+    unresolved: Optional[List[str]] = None,
+) -> bytes:
+    """Convert a post read by read_post and return the target file's bytes.
+
+    Converters return content with nothing to convert as the same object;
+    the source bytes are then reused as-is unless newlines were normalised.
+    With a cache, source_hash (the hash of data) looks up and stores the
+    result. Links are resolved with the links index, and the ones that do
+    not resolve are appended to unresolved.
+    """
+    key = None
+    if cache is not None:
+        source_fmt = "hugo" if convert.__name__ == "hugo_to_obsidian" else "obsidian"
+        key = _cache_key(source_hash, content, source_fmt, links)
+        cached = cache.get(convert.__name__, key, data)
+        if cached is not None:
+            return cached
+    missing: List[str] = []
+    with phase("convert"):
+        converted = convert(content, links, missing)
+    result = _converted_bytes(content, converted, data)
+    if unresolved is not None:
+        unresolved.extend(missing)
+    # Posts with unresolved links are not cached, so every run reports them
+    if cache is not None and not missing:
+        cache.put(convert.__name__, key, None if result is data else result)
+    return result
+
+
+def record_post_links(
+    state: Dict,
+    post_id: str,
+    content: Optional[str],
+    data: bytes,
+    fmt: str,
+    links: NoteIndex,
+) -> None:
+    """Record the posts a post links to, from its text or else its bytes in format fmt."""
+    if content is None:
+        content = data.decode("utf-8")
+    record_outlinks(state, post_id, links.targets(find_links(content, fmt)))
+
+
+def _cache_key(
+    source_hash: Optional[str], content: str, fmt: str, links: Optional[NoteIndex]
+) -> Optional[str]:
+    """Return the conversion cache key of a source in format fmt.
+
+    For a source with links it includes what they resolve to in the note
+    index; a source without links is keyed by its hash alone.
+    """
+    if links is None or source_hash is None:
+        return source_hash
+    found = find_links(content, fmt)
+    if not found:
+        return source_hash
+    return f"{source_hash}:{links.link_digest(found, fmt)}"
+
+
+def _converted_bytes(content: str, converted: str, data: bytes) -> bytes:
+    """Return the bytes to write for converted, the conversion of content read as data."""
+    if converted is content and b"\r" not in data:
+        return data
+    return converted.encode("utf-8")
+
+
+# Conversion only moves to worker processes for syncs writing at least this
+# many posts; below it, process start-up costs more than it saves
+CONVERT_MIN_POSTS = 200
+
+# Upper bound on posts per batch sent to a worker
+_CONVERT_CHUNK = 32
+
+# Converter for each target side
+_CONVERTERS = {"obsidian": hugo_to_obsidian, "hugo": obsidian_to_hugo}
+
+
+# Note index of a conversion worker process, set once when it starts
+_worker_links: Optional[NoteIndex] = None
+
+
+def _init_convert_worker(links: Optional[NoteIndex]) -> None:
+    global _worker_links
+    _worker_links = links
+
+
+def _convert_worker_batch(items: List[Tuple[str, str]]) -> List[Tuple[Optional[str], List[str]]]:
+    return convert_batch(items, _worker_links)
+
+
+# Posts at least this large are streamed through the converters into a
+# temp file instead of being read whole (stream_min_mb in config.yaml)
+STREAM_MIN_BYTES = 8 * 2**20
+
+# (source bytes, target bytes, unresolved links, source stat) of a post
+# converted by convert_posts
+Converted = Tuple[bytes, bytes, List[str], List[int]]
+
+
+def convert_posts(
+    jobs: List[Tuple[str, Path]],
+    workers: int,
+    cache: Optional[ConversionCache] = None,
+    links: Optional[NoteIndex] = None,
+    stream_min_bytes: Optional[int] = STREAM_MIN_BYTES,
+) -> Iterator[Optional[Converted]]:
+    """Convert (target side, source path) jobs on a process pool.
+
+    Sources are read here and sent to the workers in chunks, a few chunks
+    ahead of the consumer; sources found in the cache are not sent. The
+    links index is sent to each worker once. Yields a Converted tuple per
+    job, in job order, or None for sources of at least stream_min_bytes,
+    which are left for the sync functions to stream.
+    """
+    chunk_size = max(1, min(_CONVERT_CHUNK, len(jobs) // (workers * 4)))
+    chunks = (jobs[i:i + chunk_size] for i in range(0, len(jobs), chunk_size))
+
+    with ProcessPoolExecutor(
+        max_workers=workers, initializer=_init_convert_worker, initargs=(links,)
+    ) as executor:
+        pending = deque()
+
+        def submit() -> None:
+            chunk = next(chunks, None)
+            if chunk is None:
+                return
+            posts, misses = [], []
+            for target, path in chunk:
+                if _streams(path, stream_min_bytes):
+                    posts.append(None)
+                    continue
+                content, data, file_stat = read_post(path)
+                direction = _CONVERTERS[target].__name__
+                source_hash = cached = None
+                if cache is not None:
+                    source_fmt = "hugo" if target == "obsidian" else "obsidian"
+                    source_hash = _cache_key(hash_bytes(data), content, source_fmt, links)
+                    cached = cache.get(direction, source_hash, data)
+                if cached is None:
+                    misses.append((target, content))
+                posts.append((content, data, file_stat, direction, source_hash, cached))
+            future = executor.submit(_convert_worker_batch, misses) if misses else None
+            pending.append((posts, future))
+
+        for _ in range(workers * 2):
+            submit()
+        while pending:
+            posts, future = pending.popleft()
+            results: Iterator[Tuple[Optional[str], List[str]]] = iter(())
+            if future is not None:
+                with phase("convert"):
+                    results = iter(future.result())
+            submit()
+            for post in posts:
+                if post is None:
+                    yield None
+                    continue
+                content, data, file_stat, direction, source_hash, cached = post
+                if cached is not None:
+                    yield data, cached, [], file_stat
+                    continue
+                converted, missing = next(results)
+                result = _converted_bytes(
+                    content, content if converted is None else converted, data
+                )
+                if cache is not None and not missing:
+                    cache.put(direction, source_hash, None if result is data else result)
+                yield data, result, missing, file_stat
+
+
+def write_post(path: Path, data: bytes) -> Tuple[bool, List[int]]:
+    """Write a post's bytes unless the file already holds exactly them.
+
+    Returns whether the file was written and the stat tuple of the file
+    holding data, taken before anyone else could change it. Sizes are compared first, so a
+    target that differs in length is replaced without being read. The
+    file is replaced through a temp file (see durability.py). Leaving
+    identical files alone keeps their mtimes, which avoids waking Hugo's
+    watcher, Obsidian's indexer and file-sync clients.
+    """
+    with phase("write"):
+        try:
+            st = os.stat(path)
+            if st.st_size == len(data):
+                count("bytes_read", len(data))
+                if path.read_bytes() == data:
+                    return False, stat_tuple(st)
+        except OSError:
+            pass
+        st = write_file(path, data)
+    count("files_written")
+    count("bytes_written", len(data))
+    return True, stat_tuple(st)
+
+
+class _HashingReader(io.RawIOBase):
+    """Binary file wrapper that hashes and counts the bytes read through it."""
+
+    def __init__(self, f):
+        self.f = f
+        self.hasher = hashlib.md5()
+        self.size = 0
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buffer) -> int:
+        size = self.f.readinto(buffer)
+        self.hasher.update(memoryview(buffer)[:size])
+        self.size += size
+        return size
+
+
+def _streams(source: Path, stream_min_bytes: Optional[int]) -> bool:
+    """Return whether a post is large enough to be streamed."""
+    return bool(stream_min_bytes) and source.stat().st_size >= stream_min_bytes
+
+
+def stream_post(
+    source: Path,
+    target: Path,
+    fmt: str,
+    links: Optional[NoteIndex] = None,
+    unresolved: Optional[List[str]] = None,
+) -> Tuple[Fingerprint, Fingerprint, bool, List[str]]:
+    """Convert a post in format fmt into target without holding either file whole.
+
+    The source is decoded line by line into stream_convert, and the output
+    goes to a temp file next to target, hashed as it is written. It
+    replaces target unless target already holds the same bytes. Returns
+    (source fingerprint, target fingerprint, whether target was written,
+    the source's link targets), with stats taken as in read_post and
+    write_post. The conversion cache is not used.
+    """
+    found: List[str] = []
+    hasher = hashlib.md5()
+    size = 0
+    fd, temp = temp_file(target)
+    try:
+        with phase("convert"), os.fdopen(fd, "wb") as out, open(source, "rb") as raw:
+            source_stat = stat_tuple(os.fstat(raw.fileno()))
+            reader = _HashingReader(raw)
+            lines = io.TextIOWrapper(io.BufferedReader(reader), encoding="utf-8", newline=None)
+            for chunk in stream_convert(lines, fmt, links, unresolved, found):
+                data = chunk.encode("utf-8")
+                hasher.update(data)
+                out.write(data)
+                size += len(data)
+            out.flush()
+            written_stat = os.fstat(out.fileno())
+        count("files_read")
+        count("bytes_read", reader.size)
+
+        target_hash = hasher.hexdigest()
+        try:
+            target_stat = target.stat()
+        except OSError:
+            target_stat = None
+        identical = (
+            target_stat is not None
+            and target_stat.st_size == size
+            and get_file_hash(target) == target_hash
+        )
+        if identical:
+            temp.unlink()
+            written_stat = target_stat
+        else:
+            os.chmod(temp, file_mode(target))
+            replace(temp, target)
+            count("files_written")
+            count("bytes_written", size)
+    except BaseException:
+        temp.unlink(missing_ok=True)
+        raise
+    return (
+        (reader.hasher.hexdigest(), source_stat),
+        (target_hash, stat_tuple(written_stat)),
+        not identical,
+        found,
+    )
+
+
 def show_diff(hugo_content: str, obsidian_content: str) -> None:
     """Display a diff between Hugo and Obsidian versions."""
     hugo_lines = hugo_content.splitlines(keepends=True)
@@ -193,19 +844,65 @@ def resolve_conflict(
         print("Invalid choice. Enter H, O, or S.")
 
 
+class SyncOptions:
+    """Run settings passed down to the sync functions.
+
+    asset_transfer is one of ASSET_TRANSFER_MODES. Conversion runs on
+    convert_workers processes once at least convert_min_posts posts are to
+    be written, and up to io_concurrency posts are written at once (see
+    aio.py). Conversions go through cache when one is given, except for
+    sources of at least stream_min_bytes, which are streamed. Links are
+    resolved with the links index, and (post_id, link) pairs for the ones
+    that do not resolve are appended to unresolved.
+    """
+
+    def __init__(
+        self,
+        *,
+        asset_transfer: str = "copy",
+        convert_workers: int = 1,
+        convert_min_posts: int = CONVERT_MIN_POSTS,
+        io_concurrency: int = 1,
+        cache: Optional[ConversionCache] = None,
+        links: Optional[NoteIndex] = None,
+        unresolved: Optional[List[Tuple[str, str]]] = None,
+        stream_min_bytes: Optional[int] = STREAM_MIN_BYTES,
+    ):
+        self.asset_transfer = asset_transfer
+        self.convert_workers = convert_workers
+        self.convert_min_posts = convert_min_posts
+        self.io_concurrency = io_concurrency
+        self.cache = cache
+        self.links = links
+        self.unresolved = unresolved
+        self.stream_min_bytes = stream_min_bytes
+
+
 def sync_post_to_obsidian(
     hugo_path: Path,
     obsidian_dir: Path,
     post_id: str,
     state: Dict,
+    *,
     dry_run: bool = False,
+    stats: Optional[Counter] = None,
+    converted: Optional[Converted] = None,
+    options: Optional[SyncOptions] = None,
 ) -> Optional[Path]:
-    """Sync a post from Hugo to Obsidian."""
+    """Sync a post from Hugo to Obsidian and record both fingerprints.
+
+    converted is the post's result from convert_posts, if it was converted
+    there, and stats gets the counts described in sync_posts.
+    """
     # Determine target path and record format
-    if hugo_path.name == "index.md":
-        # Directory-style post
-        target_dir = obsidian_dir / post_id
-        target_path = target_dir / f"{post_id.split('/')[-1]}.md"
+    language = bundle_language(hugo_path)
+    is_directory_style = hugo_path.name == "index.md" or language is not None
+    if is_directory_style:
+        # Directory-style post; translations share their bundle's directory
+        bundle = bundle_id(post_id, hugo_path)
+        name = bundle.split('/')[-1]
+        target_dir = obsidian_dir / bundle
+        target_path = target_dir / (f"{name}.{language}.md" if language else f"{name}.md")
         if not dry_run:
             state.setdefault("format", {})[post_id] = "directory"
     else:
@@ -220,19 +917,50 @@ def sync_post_to_obsidian(
         return target_path
 
     # Create directory if needed
-    target_dir.mkdir(parents=True, exist_ok=True)
-
-    # Convert and write content
-    hugo_content = hugo_path.read_text()
-    obsidian_content = hugo_to_obsidian(hugo_content)
-    target_path.write_text(obsidian_content)
-
-    # Copy assets for directory-style posts
-    if hugo_path.name == "index.md":
-        for asset in hugo_path.parent.iterdir():
-            if asset.is_file() and asset.name != "index.md":
-                dest = target_dir / asset.name
-                shutil.copy2(asset, dest)
+    make_dirs(target_dir)
+    if options is None:
+        options = SyncOptions()
+    links, cache = options.links, options.cache
+
+    # Convert and write content, fingerprinting both sides from memory
+    missing: List[str] = []
+    hugo_bytes: Optional[bytes] = None
+    if converted is None and _streams(hugo_path, options.stream_min_bytes):
+        (hugo_hash, hugo_stat), (obsidian_hash, obsidian_stat), written, found = stream_post(
+            hugo_path, target_path, "hugo", links, missing
+        )
+        if links is not None:
+            record_outlinks(state, post_id, links.targets(found))
+    else:
+        if converted is None:
+            hugo_content, hugo_bytes, hugo_stat = read_post(hugo_path)
+            hugo_hash = hash_bytes(hugo_bytes)
+            obsidian_bytes = convert_post(
+                hugo_to_obsidian, hugo_content, hugo_bytes, cache, hugo_hash, links, missing
+            )
+        else:
+            hugo_bytes, obsidian_bytes, missing, hugo_stat = converted
+            hugo_content = None
+            hugo_hash = hash_bytes(hugo_bytes)
+        if links is not None:
+            record_post_links(state, post_id, hugo_content, hugo_bytes, "hugo", links)
+        written, obsidian_stat = write_post(target_path, obsidian_bytes)
+        obsidian_hash = hugo_hash if obsidian_bytes is hugo_bytes else hash_bytes(obsidian_bytes)
+    if options.unresolved is not None:
+        options.unresolved.extend((post_id, link) for link in missing)
+    if not written and stats is not None:
+        stats["identical"] += 1
+    record_fingerprint(state, "hugo", post_id, hugo_hash, hugo_stat)
+    record_fingerprint(state, "obsidian", post_id, obsidian_hash, obsidian_stat)
+    record_front_matter(state, post_id, hugo_path, hugo_hash, hugo_bytes)
+
+    # Copy new or changed assets for directory-style posts
+    if is_directory_style:
+        with phase("assets"):
+            sync_assets(
+                hugo_path, target_dir, bundle, state, "hugo", "obsidian", stats,
+                options.asset_transfer,
+            )
 
     return target_path
 
@@ -242,9 +970,18 @@ def sync_post_to_hugo(
     hugo_dir: Path,
     post_id: str,
     state: Dict,
+    *,
     dry_run: bool = False,
+    stats: Optional[Counter] = None,
+    converted: Optional[Converted] = None,
+    options: Optional[SyncOptions] = None,
 ) -> Optional[Path]:
-    """Sync a post from Obsidian to Hugo."""
+    """Sync a post from Obsidian to Hugo, as sync_post_to_obsidian does the other way."""
+    # Translations are named after their bundle: my-post/my-post.fr.md
+    language = bundle_language(obsidian_path)
+    bundle = bundle_id(post_id, obsidian_path)
+    index_name = f"index.{language}.md" if language else "index.md"
+
     # Use stored format from state, or detect from existing Hugo structure
     stored_format = state.get("format", {}).get(post_id)
 
@@ -254,14 +991,17 @@ def sync_post_to_hugo(
         is_directory_style = False
     else:
         # Fallback: check if Hugo already has this as a directory
-        existing_dir = hugo_dir / post_id
-        existing_index = existing_dir / "index.md"
+        existing_dir = hugo_dir / bundle
+        existing_index = existing_dir / index_name
         existing_single = hugo_dir / f"{post_id}.md"
 
         if existing_index.exists():
             is_directory_style = True
         elif existing_single.exists():
             is_directory_style = False
+        elif language:
+            # A vault translation only exists inside its bundle directory
+            is_directory_style = True
         else:
             # New post - check if Obsidian has assets
             is_directory_style = False
@@ -272,8 +1012,8 @@ def sync_post_to_hugo(
 
     if is_directory_style:
         # Directory-style post
-        target_dir = hugo_dir / post_id
-        target_path = target_dir / "index.md"
+        target_dir = hugo_dir / bundle
+        target_path = target_dir / index_name
     else:
         # Single-file post
         target_path = hugo_dir / f"{post_id}.md"
@@ -284,24 +1024,524 @@ def sync_post_to_hugo(
         return target_path
 
     # Create directory if needed
-    target_dir.mkdir(parents=True, exist_ok=True)
-
-    # Convert and write content
-    obsidian_content = obsidian_path.read_text()
-    hugo_content = obsidian_to_hugo(obsidian_content)
-    target_path.write_text(hugo_content)
-
-    # Copy assets if directory-style
+    make_dirs(target_dir)
+    if options is None:
+        options = SyncOptions()
+    links, cache = options.links, options.cache
+
+    # Convert and write content, fingerprinting both sides from memory
+    missing: List[str] = []
+    hugo_bytes: Optional[bytes] = None
+    if converted is None and _streams(obsidian_path, options.stream_min_bytes):
+        (obsidian_hash, obsidian_stat), (hugo_hash, hugo_stat), written, found = stream_post(
+            obsidian_path, target_path, "obsidian", links, missing
+        )
+        if links is not None:
+            record_outlinks(state, post_id, links.targets(found))
+    else:
+        if converted is None:
+            obsidian_content, obsidian_bytes, obsidian_stat = read_post(obsidian_path)
+            obsidian_hash = hash_bytes(obsidian_bytes)
+            hugo_bytes = convert_post(
+                obsidian_to_hugo, obsidian_content, obsidian_bytes, cache, obsidian_hash, links,
+                missing,
+            )
+        else:
+            obsidian_bytes, hugo_bytes, missing, obsidian_stat = converted
+            obsidian_content = None
+            obsidian_hash = hash_bytes(obsidian_bytes)
+        if links is not None:
+            record_post_links(state, post_id, obsidian_content, obsidian_bytes, "obsidian", links)
+        written, hugo_stat = write_post(target_path, hugo_bytes)
+        hugo_hash = obsidian_hash if hugo_bytes is obsidian_bytes else hash_bytes(hugo_bytes)
+    if options.unresolved is not None:
+        options.unresolved.extend((post_id, link) for link in missing)
+    if not written and stats is not None:
+        stats["identical"] += 1
+    record_fingerprint(state, "obsidian", post_id, obsidian_hash, obsidian_stat)
+    record_fingerprint(state, "hugo", post_id, hugo_hash, hugo_stat)
+    record_front_matter(state, post_id, target_path, hugo_hash, hugo_bytes)
+
+    # Copy new or changed assets if directory-style
     if is_directory_style:
-        for asset in obsidian_path.parent.iterdir():
-            if asset.is_file() and asset != obsidian_path:
-                dest = target_dir / asset.name
-                shutil.copy2(asset, dest)
+        with phase("assets"):
+            sync_assets(
+                obsidian_path, target_dir, bundle, state, "obsidian", "hugo", stats,
+                options.asset_transfer,
+            )
 
     return target_path
 
 
-def main():
+def sync_posts(
+    post_ids: Iterable[str],
+    hugo_posts: Dict[str, Path],
+    obsidian_posts: Dict[str, Path],
+    fingerprints: Dict[str, Dict[str, Fingerprint]],
+    state: Dict,
+    hugo_dir: Path,
+    obsidian_dir: Path,
+    args: argparse.Namespace,
+    options: Optional[SyncOptions] = None,
+) -> Counter:
+    """Determine and apply the sync action for each post, in sorted order.
+
+    Runs in stages: actions are planned (and conflicts resolved) for every
+    post first, then the posts to write are converted and written in
+    order, on worker processes and overlapping tasks as options say (see
+    SyncOptions). Overlapped writes are ordered per directory by
+    _write_order_key, their written paths and stats are applied on this
+    thread in post order, and the achieved concurrency is added to the
+    stats as io_tasks, io_peak and io_average.
+
+    The stats also count posts whose target already held the converted
+    content as identical, and asset bytes as described in sync_assets.
+    Written paths are put back into the post maps. Returns counts of synced,
+    skipped and conflicting posts plus the sync functions' stats.
+    """
+    if options is None:
+        options = SyncOptions()
+    stats: Counter = Counter()
+    jobs: List[Tuple[str, str]] = []  # (post_id, side to write)
+
+    def sync_one(
+        post_id: str,
+        target: str,
+        converted: Optional[Converted],
+        post_stats: Counter,
+    ) -> Path:
+        with post_timer(post_id):
+            if target == "obsidian":
+                return sync_post_to_obsidian(
+                    hugo_posts[post_id], obsidian_dir, post_id, state, dry_run=args.dry_run,
+                    stats=post_stats, converted=converted, options=options,
+                )
+            return sync_post_to_hugo(
+                obsidian_posts[post_id], hugo_dir, post_id, state, dry_run=args.dry_run,
+                stats=post_stats, converted=converted, options=options,
+            )
+
+    def record(post_id: str, target: str, written_path: Path) -> None:
+        posts = obsidian_posts if target == "obsidian" else hugo_posts
+        posts[post_id] = written_path
+        stats["synced"] += 1
+
+    def write(post_id: str, target: str, converted: Optional[Converted] = None):
+        record(post_id, target, sync_one(post_id, target, converted, stats))
+
+    for post_id in sorted(post_ids):
+        hugo_path = hugo_posts.get(post_id)
+        obsidian_path = obsidian_posts.get(post_id)
+
+        action, detail = determine_action(
+            post_id, hugo_path, obsidian_path, state, args.paranoid, fingerprints
+        )
+
+        if action == SyncAction.UNCHANGED:
+            if not args.dry_run:
+                # Content matches the stored hashes; only new stats are recorded
+                for side in ("hugo", "obsidian"):
+                    update_fingerprint(state, side, post_id, fingerprints[side].get(post_id))
+            continue
+
+        print(f"[{action}] {post_id}")
+
+        # Handle based on action and mode: pick the side to write, if any
+        target = None
+        if action in (SyncAction.NEW_IN_HUGO, SyncAction.MODIFIED_IN_HUGO):
+            if not args.push:  # Pull or bidirectional
+                target = "obsidian"
+            else:
+                stats["skipped"] += 1
+
+        elif action in (SyncAction.NEW_IN_OBSIDIAN, SyncAction.MODIFIED_IN_OBSIDIAN):
+            if not args.pull:  # Push or bidirectional
+                target = "hugo"
+            else:
+                stats["skipped"] += 1
+
+        elif action == SyncAction.CONFLICT:
+            stats["conflicts"] += 1
+            if args.dry_run:
+                print(f"  Conflict detected - would prompt for resolution")
+                continue
+
+            resolution = resolve_conflict(post_id, hugo_path, obsidian_path, args.force)
+            if resolution == "hugo":
+                target = "obsidian"
+            elif resolution == "obsidian":
+                target = "hugo"
+            else:
+                stats["skipped"] += 1
+
+        elif action in (SyncAction.DELETED_IN_HUGO, SyncAction.DELETED_IN_OBSIDIAN):
+            print(f"  Deletion detected - skipping (manual review recommended)")
+            stats["skipped"] += 1
+
+        if target and args.dry_run:
+            # Nothing is converted in a dry run; report each post as planned
+            write(post_id, target)
+        elif target:
+            jobs.append((post_id, target))
+        elif not args.dry_run:
+            # Nothing written: record whatever changed on disk since last sync
+            for side in ("hugo", "obsidian"):
+                update_fingerprint(state, side, post_id, fingerprints[side].get(post_id))
+
+    converted_posts: Iterable[Optional[Converted]] = itertools.repeat(None)
+    if options.convert_workers > 1 and len(jobs) >= options.convert_min_posts:
+        sources = [
+            (target, hugo_posts[post_id] if target == "obsidian" else obsidian_posts[post_id])
+            for post_id, target in jobs
+        ]
+        converted_posts = convert_posts(
+            sources, options.convert_workers, options.cache, options.links,
+            options.stream_min_bytes,
+        )
+
+    if options.io_concurrency > 1 and jobs:
+        sources = {
+            (post_id, target): hugo_posts[post_id] if target == "obsidian" else obsidian_posts[post_id]
+            for post_id, target in jobs
+        }
+        bundles = {
+            (target, bundle_id(post_id, sources[post_id, target])) for post_id, target in jobs
+            if _writes_bundle(post_id, target, hugo_posts, obsidian_posts, state)
+        }
+
+        def call(post_id, target, converted):
+            post_stats: Counter = Counter()
+            return sync_one(post_id, target, converted, post_stats), post_stats
+
+        results, concurrency = run_ordered(
+            (
+                (
+                    _write_order_key(bundle_id(post_id, sources[post_id, target]), target, bundles),
+                    partial(call, post_id, target, converted),
+                )
+                for (post_id, target), converted in zip(jobs, converted_posts)
+            ),
+            options.io_concurrency,
+        )
+        for (post_id, target), (written_path, post_stats) in zip(jobs, results):
+            stats.update(post_stats)
+            record(post_id, target, written_path)
+        stats.update(concurrency)
+    else:
+        for (post_id, target), converted in zip(jobs, converted_posts):
+            write(post_id, target, converted)
+
+    return stats
+
+
+def _writes_bundle(
+    post_id: str,
+    target: str,
+    hugo_posts: Dict[str, Path],
+    obsidian_posts: Dict[str, Path],
+    state: Dict,
+) -> bool:
+    """Return whether syncing a post to target writes a bundle directory.
+
+    Decided without touching the filesystem: from the Hugo file name, or
+    from the recorded format and vault layout (post/post.md) when writing
+    to Hugo. Translations are always written into their bundle.
+    """
+    if target == "obsidian":
+        path = hugo_posts[post_id]
+        return path.name == "index.md" or bundle_language(path) is not None
+    path = obsidian_posts[post_id]
+    if bundle_language(path) is not None:
+        return True
+    stored_format = state.get("format", {}).get(post_id)
+    if stored_format is not None:
+        return stored_format == "directory"
+    return path.stem == path.parent.name
+
+
+def _write_order_key(post_id: str, target: str, bundles: Set[Tuple[str, str]]) -> Tuple[str, str]:
+    """Return the ordering key for writing a post in overlapped mode.
+
+    post_id is the post's bundle ID for a translation (see bundle_id) and
+    bundles holds the (target, bundle ID) pairs being written. A bundle
+    owns its directory, so its translations and any post whose ID lies
+    inside it on the same side share the bundle's key and are written in
+    order. Other posts get their own key: single-file posts in a shared
+    folder write distinct files and may overlap.
+    """
+    parts = post_id.split(os.sep)
+    for i in range(1, len(parts) + 1):
+        prefix = os.sep.join(parts[:i])
+        if (target, prefix) in bundles:
+            return target, prefix
+    return target, post_id
+
+
+def print_summary(stats: Counter) -> None:
+    """Print the counts returned by sync_posts."""
+    # Posts whose target already matched were not rewritten; count them apart
+    identical = stats["identical"]
+    print(
+        f"Summary: {stats['synced'] - identical} synced, {identical} already up to date, "
+        f"{stats['skipped']} skipped, {stats['conflicts']} conflicts"
+    )
+    if stats["asset_bytes_copied"] or stats["asset_bytes_skipped"]:
+        print(
+            f"Assets: {stats['asset_bytes_copied']:,} bytes copied, "
+            f"{stats['asset_bytes_skipped']:,} bytes unchanged"
+        )
+    if stats["asset_conflicts"]:
+        print(f"Asset conflicts: {stats['asset_conflicts']} changed on both sides, not copied")
+    lookups = stats["cache_hits"] + stats["cache_misses"]
+    if lookups:
+        print(
+            f"Conversion cache: {stats['cache_hits']} hits, {stats['cache_misses']} misses "
+            f"({stats['cache_hits'] / lookups:.0%} hit ratio)"
+        )
+    if stats["git_unchanged"] or stats["git_changed"]:
+        print(
+            f"Git index: {stats['git_unchanged']} Hugo posts recognised unchanged, "
+            f"{stats['git_changed']} changed since the last sync"
+        )
+    if stats["io_tasks"]:
+        print(
+            f"I/O: {stats['io_tasks']} posts written by overlapping tasks, "
+            f"{stats['io_peak']} at most and {stats['io_average']:.1f} on average in flight"
+        )
+
+
+def print_unresolved(unresolved: List[Tuple[str, str]]) -> None:
+    """Print the (post_id, link) pairs of links that resolved to no post."""
+    if not unresolved:
+        return
+    print(f"Unresolved links ({len(unresolved)}):")
+    for post_id, link in sorted(unresolved):
+        print(f"  {post_id}: {link}")
+
+
+def print_git_changes(paths: List[str]) -> None:
+    """Print the content files whose git blob differs from the last sync."""
+    if not paths:
+        return
+    print(f"Changed in git since the last sync ({len(paths)}):")
+    for path in sorted(paths):
+        print(f"  {path}")
+
+
+def apply_changes(
+    changed: Set[Path],
+    directory: Path,
+    posts: Dict[str, Path],
+    ignore: Optional[List[str]] = None,
+) -> Set[str]:
+    """Update a post map for changed paths and return the affected post IDs.
+
+    Paths outside directory or under an ignored entry are skipped. A changed
+    directory is rescanned for posts; posts at or under a path that no
+    longer exists are dropped.
+    """
+    ignore = DEFAULT_IGNORE if ignore is None else ignore
+    affected = set()
+    for path in changed:
+        if path != directory and directory not in path.parents:
+            continue
+        rel_path = "" if path == directory else path.relative_to(directory).as_posix()
+        if rel_path and _path_ignored(rel_path, ignore):
+            continue
+
+        for post_id, post_path in list(posts.items()):
+            if (post_path == path or path in post_path.parents) and not post_path.exists():
+                del posts[post_id]
+                affected.add(post_id)
+
+        if path.is_dir():
+            found = [
+                directory / md_file
+                for md_file in _walk_markdown(str(directory), rel_path, ignore)
+            ]
+        elif path.suffix == ".md" and not path.name.startswith("_") and path.is_file():
+            found = [path]
+        else:
+            found = []
+        for md_file in found:
+            post_id = get_post_id(md_file, directory)
+            posts[post_id] = md_file
+            affected.add(post_id)
+    return affected
+
+
+def watch(
+    hugo_posts: Dict[str, Path],
+    obsidian_posts: Dict[str, Path],
+    fingerprints: Dict[str, Dict[str, Fingerprint]],
+    state: Dict,
+    state_store,
+    hugo_dir: Path,
+    obsidian_dir: Path,
+    args: argparse.Namespace,
+    options: SyncOptions,
+    ignore: Optional[List[str]] = None,
+) -> None:
+    """Keep syncing the posts affected by file changes until interrupted.
+
+    The post maps, fingerprints and state from the initial sync stay in
+    memory; each debounced batch of changes only re-runs the posts it
+    touches, with the run's options and a refreshed links index. Writes
+    made by the sync come back as events and are then recognised as
+    unchanged.
+    """
+    roots = [hugo_dir, obsidian_dir]
+    watcher = open_watcher(
+        roots, poll=args.poll,
+        ignored=ignore_filter(roots, DEFAULT_IGNORE if ignore is None else ignore),
+    )
+    print(f"\nWatching {hugo_dir} and {obsidian_dir} ({watcher.name}), Ctrl-C to stop")
+
+    sides = (("hugo", hugo_dir, hugo_posts), ("obsidian", obsidian_dir, obsidian_posts))
+    try:
+        for changed in watch_changes(watcher, args.debounce):
+            affected: Set[str] = set()
+            for _, directory, posts in sides:
+                affected |= apply_changes(changed, directory, posts, ignore)
+
+            for side, _, posts in sides:
+                for post_id in affected:
+                    if post_id in posts:
+                        fingerprints[side][post_id] = fingerprint_post(
+                            state, side, post_id, posts[post_id], args.paranoid
+                        )
+                    else:
+                        fingerprints[side].pop(post_id, None)
+
+            options.links = update_note_index(state, affected, hugo_posts, obsidian_posts)
+            options.unresolved = []
+            stats = sync_posts(
+                affected, hugo_posts, obsidian_posts, fingerprints, state,
+                hugo_dir, obsidian_dir, args, options,
+            )
+            if not args.dry_run:
+                for side, _, posts in sides:
+                    prune_state(state, side, set(posts))
+                state_store.save(state)
+            if options.cache is not None:
+                options.cache.flush()
+                stats.update(options.cache.take_counts())
+            if stats:
+                print_summary(stats)
+            print_unresolved(options.unresolved)
+    except KeyboardInterrupt:
+        print("\nStopped watching")
+    finally:
+        watcher.close()
+
+
+def rename(
+    args: argparse.Namespace,
+    state: Dict,
+    state_store,
+    hugo_posts: Dict[str, Path],
+    obsidian_posts: Dict[str, Path],
+    fingerprints: Dict[str, Dict[str, Fingerprint]],
+    hugo_dir: Path,
+    obsidian_dir: Path,
+    links: NoteIndex,
+) -> None:
+    """Run the rename subcommand on the scanned posts (see rename.py)."""
+    old, new = (os.path.normpath(post_id.replace("/", os.sep)) for post_id in (args.old, args.new))
+    all_post_ids = set(hugo_posts) | set(obsidian_posts)
+    moved = renamed_ids(old, new, hugo_posts, obsidian_posts, hugo_dir, obsidian_dir)
+    if not moved:
+        print(f"Error: Post not found: {args.old}")
+        sys.exit(1)
+    taken = [
+        path for directory in (hugo_dir, obsidian_dir)
+        for path in (directory / new, directory / f"{new}.md") if path.exists()
+    ]
+    if taken or all_post_ids.intersection(moved.values()):
+        print(f"Error: Post already exists: {args.new}")
+        sys.exit(1)
+
+    # The backlinks index only covers what was synced, so both sides must match
+    pending = [
+        post_id for post_id in sorted(all_post_ids)
+        if determine_action(
+            post_id, hugo_posts.get(post_id), obsidian_posts.get(post_id), state,
+            args.paranoid, fingerprints,
+        )[0] != SyncAction.UNCHANGED
+    ]
+    if pending:
+        print(
+            f"Error: {len(pending)} posts have changes that are not synced yet "
+            f"(first: {pending[0]}); sync before renaming"
+        )
+        sys.exit(1)
+
+    # Posts synced before links were tracked are indexed once
+    for post_id in sorted(all_post_ids - set(state.get("outlinks", {}))):
+        side, posts = ("hugo", hugo_posts) if post_id in hugo_posts else ("obsidian", obsidian_posts)
+        content, data, _ = read_post(posts[post_id])
+        record_post_links(state, post_id, content, data, side, links)
+
+    print(f"Renaming {old} -> {new}")
+    updated = rename_post(
+        old, new, state, hugo_posts, obsidian_posts, hugo_dir, obsidian_dir, args.dry_run
+    )
+    if not args.dry_run:
+        state_store.save(state)
+    print(f"\n{len(moved)} posts renamed, links updated in {len(updated)} posts")
+
+
+def query(args: argparse.Namespace, state: Dict) -> None:
+    """Answer the query subcommand from the front matter index in state."""
+    index = state.get("meta", {})
+    if not index:
+        print("The front matter index is empty; run a sync first.")
+        return
+
+    if args.incomplete_series:
+        series = incomplete_series(index)
+        if args.json:
+            print(json.dumps(series, indent=2))
+            return
+        for name, problems in series.items():
+            details = []
+            if problems["missing"]:
+                details.append(f"missing parts {', '.join(map(str, problems['missing']))}")
+            if problems["drafts"]:
+                details.append(f"drafts: {', '.join(problems['drafts'])}")
+            if problems["unordered"]:
+                details.append(f"no series_order: {', '.join(problems['unordered'])}")
+            print(f"{name}: {'; '.join(details)}")
+        return
+
+    draft = True if args.drafts else False if args.published else None
+    post_ids = query_index(index, draft, args.tag, args.series, args.lang)
+    if args.json:
+        entries = {
+            post_id: {key: value for key, value in index[post_id].items() if key != "hash"}
+            for post_id in post_ids
+        }
+        print(json.dumps(entries, indent=2))
+        return
+    for post_id in post_ids:
+        entry = index[post_id]
+        draft_mark = " [draft]" if entry["draft"] else ""
+        print(f"{post_id}\t{entry['date'] or '-'}\t{entry['title'] or ''}{draft_mark}")
+
+
+def write_stats(recorder, stats: Counter, args: argparse.Namespace) -> None:
+    """Print the --stats report and/or write the --stats-json file."""
+    if args.stats:
+        print()
+        print(format_report(recorder))
+    if args.stats_json:
+        metrics = recorder.to_dict()
+        metrics["summary"] = dict(sorted(stats.items()))
+        args.stats_json.parent.mkdir(parents=True, exist_ok=True)
+        args.stats_json.write_text(json.dumps(metrics, indent=2) + "\n")
+
+
+def main(argv: Optional[List[str]] = None):
     parser = argparse.ArgumentParser(
         description="Bidirectional sync between Hugo and Obsidian"
     )
@@ -325,15 +1565,172 @@ def main():
         choices=["hugo", "obsidian"],
         help="Force one side to win all conflicts",
     )
+    parser.add_argument(
+        "--paranoid",
+        action="store_true",
+        help="Hash every file instead of trusting unchanged size/mtime/inode",
+    )
+    parser.add_argument(
+        "--jobs",
+        type=int,
+        help="Worker threads for scanning and hashing (default: jobs from config, or 1)",
+    )
+    parser.add_argument(
+        "--convert-workers",
+        type=int,
+        help="Worker processes for converting large syncs (default: convert_workers from "
+        "config, or 1)",
+    )
+    parser.add_argument(
+        "--io-concurrency",
+        type=int,
+        help="Overlap up to N posts' file I/O with asyncio, for high-latency filesystems "
+        "(default: io_concurrency from config, or 1 = sequential)",
+    )
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="Convert every post instead of reusing cached conversions",
+    )
+    parser.add_argument(
+        "--asset-transfer",
+        choices=ASSET_TRANSFER_MODES,
+        help="How bundle assets are transferred (default: asset_transfer from config, or copy)",
+    )
+    parser.add_argument(
+        "--durability",
+        choices=DURABILITY_MODES,
+        help="When written files are fsynced: never, in one batch before the state is saved, "
+        "or each as it is written (default: durability from config, or batch)",
+    )
+    parser.add_argument(
+        "--post",
+        action="append",
+        default=[],
+        metavar="ID",
+        help="Only sync this post (or bundle); may be repeated",
+    )
+    parser.add_argument(
+        "--only",
+        action="append",
+        default=[],
+        metavar="GLOB",
+        help="Only sync posts whose ID matches GLOB, e.g. 'blog/2024-*'; may be repeated",
+    )
+    parser.add_argument(
+        "--modified-since",
+        type=iso_date,
+        metavar="DATE",
+        help="Only sync posts with a file modified on or after DATE (ISO date or date-time)",
+    )
+    parser.add_argument(
+        "--drafts-only",
+        action="store_true",
+        help="Only sync posts whose front matter has draft: true",
+    )
+    parser.add_argument(
+        "--git-index",
+        action="store_true",
+        help="Recognise unchanged Hugo posts from the content repo's git index "
+        "(default: git_index from config, or off)",
+    )
+    parser.add_argument(
+        "--since",
+        metavar="REV",
+        help="Only sync the posts whose Hugo files were touched since git revision REV "
+        "(implies --git-index)",
+    )
+    parser.add_argument(
+        "--watch",
+        action="store_true",
+        help="After syncing, keep running and sync posts as their files change",
+    )
+    parser.add_argument(
+        "--debounce",
+        type=float,
+        default=0.5,
+        help="Seconds without changes before a batch is synced in watch mode (default: 0.5)",
+    )
+    parser.add_argument(
+        "--poll",
+        action="store_true",
+        help="Watch by polling instead of inotify",
+    )
+    parser.add_argument(
+        "--migrate-state",
+        type=Path,
+        metavar="JSON_FILE",
+        help="Import a JSON state file into the configured state store and exit",
+    )
+    parser.add_argument(
+        "--stats",
+        action="store_true",
+        help="Print per-phase timings, I/O counters and the slowest posts",
+    )
+    parser.add_argument(
+        "--stats-json",
+        type=Path,
+        metavar="FILE",
+        help="Write the --stats metrics to FILE as JSON",
+    )
+    parser.add_argument(
+        "--profile",
+        type=Path,
+        metavar="FILE",
+        help="Run under cProfile and write the profile to FILE",
+    )
     parser.add_argument(
         "--config",
         type=Path,
         default=Path(__file__).parent / "config.yaml",
         help="Path to config file",
     )
+    commands = parser.add_subparsers(dest="command", metavar="COMMAND")
+    rename_parser = commands.add_parser(
+        "rename",
+        help="Rename a post (or bundle) on both sides and update the links to it",
+    )
+    rename_parser.add_argument("old", help="Post ID to rename, e.g. blog/old-post")
+    rename_parser.add_argument("new", help="New post ID, e.g. blog/new-post")
+    query_parser = commands.add_parser(
+        "query",
+        help="List posts from the front matter index kept by syncs, without reading them",
+    )
+    drafts = query_parser.add_mutually_exclusive_group()
+    drafts.add_argument("--drafts", action="store_true", help="Only drafts")
+    drafts.add_argument("--published", action="store_true", help="Only posts that are not drafts")
+    query_parser.add_argument("--tag", help="Only posts with this tag")
+    query_parser.add_argument("--series", help="Only posts in this series")
+    query_parser.add_argument("--lang", help="Only posts in this language")
+    query_parser.add_argument(
+        "--incomplete-series",
+        action="store_true",
+        help="List series with drafts, gaps in series_order or posts without one",
+    )
+    query_parser.add_argument("--json", action="store_true", help="Print JSON")
+
+    args = parser.parse_args(argv)
+
+    recorder = start_recording() if args.stats or args.stats_json else None
+    try:
+        if args.profile:
+            profiler = cProfile.Profile()
+            try:
+                profiler.runcall(run, args, recorder)
+            finally:
+                profiler.dump_stats(str(args.profile))
+                print(f"Profile written to {args.profile}")
+        else:
+            run(args, recorder)
+    finally:
+        stop_recording()
+
 
-    args = parser.parse_args()
+def run(args: argparse.Namespace, recorder=None) -> None:
+    """Run a sync (and watch mode) for parsed arguments.
 
+    recorder is the timing recorder started for --stats/--stats-json.
+    """
     # Validate args
     if args.push and args.pull:
         print("Error: Cannot use --push and --pull together")
@@ -344,6 +1741,57 @@ def main():
     hugo_dir = Path(os.path.expanduser(config["hugo_content"]))
     obsidian_dir = Path(os.path.expanduser(config["obsidian_vault"]))
     state_path = get_state_path(config.get("state_file", "~/.config/hugo-obsidian-sync/state.json"))
+    state_backend = config.get("state_backend")
+    if state_backend is not None and state_backend not in STATE_BACKENDS:
+        print(f"Error: state_backend must be one of: {', '.join(STATE_BACKENDS)}")
+        sys.exit(1)
+    durability = args.durability or config.get("durability", "batch")
+    if durability not in DURABILITY_MODES:
+        print(f"Error: durability must be one of: {', '.join(DURABILITY_MODES)}")
+        sys.exit(1)
+    set_durability(durability)
+    state_store = open_state_store(state_path, state_backend)
+
+    if args.migrate_state:
+        if not args.migrate_state.exists():
+            print(f"Error: State file not found: {args.migrate_state}")
+            sys.exit(1)
+        migrated = migrate_json_state(args.migrate_state, state_store)
+        print(f"Migrated state for {migrated} posts to {state_path}")
+        return
+
+    # Load state; queries only read it and need neither directory
+    with phase("load_state"):
+        state = state_store.load()
+
+    if args.command == "query":
+        query(args, state)
+        return
+
+    asset_transfer = args.asset_transfer or config.get("asset_transfer", "copy")
+    if asset_transfer not in ASSET_TRANSFER_MODES:
+        print(f"Error: asset_transfer must be one of: {', '.join(ASSET_TRANSFER_MODES)}")
+        sys.exit(1)
+
+    convert_workers = args.convert_workers or config.get("convert_workers", 1)
+    convert_min_posts = config.get("convert_min_posts", CONVERT_MIN_POSTS)
+    io_concurrency = args.io_concurrency or config.get("io_concurrency", 1)
+    stream_min_bytes = int(config.get("stream_min_mb", STREAM_MIN_BYTES // 2**20) * 2**20)
+
+    # The conversion cache lives next to the state file unless configured
+    cache_setting = config.get("conversion_cache", True)
+    cache_path = None
+    if cache_setting and not args.no_cache and not args.dry_run:
+        cache_path = (
+            state_path.with_name("conversions.db") if cache_setting is True
+            else Path(os.path.expanduser(cache_setting))
+        )
+    cache_size = int(config.get("conversion_cache_mb", DEFAULT_CACHE_SIZE // 2**20) * 2**20)
+
+    ignore = config.get("ignore", DEFAULT_IGNORE)
+    if not isinstance(ignore, list) or not all(isinstance(p, str) for p in ignore):
+        print("Error: ignore must be a list of glob patterns")
+        sys.exit(1)
 
     # Validate directories
     if not hugo_dir.exists():
@@ -353,19 +1801,76 @@ def main():
     if not obsidian_dir.exists():
         print(f"Creating Obsidian vault directory: {obsidian_dir}")
         if not args.dry_run:
-            obsidian_dir.mkdir(parents=True, exist_ok=True)
+            make_dirs(obsidian_dir)
 
-    # Load state
-    state = load_state(state_path)
+    post_filter = PostFilter(args.post, args.only, args.modified_since, args.drafts_only)
+    if post_filter.active and args.watch:
+        print("Error: Cannot use post filters with --watch")
+        sys.exit(1)
 
-    # Scan both directories
-    hugo_posts = scan_posts(hugo_dir)
-    obsidian_posts = scan_posts(obsidian_dir)
+    # Translations synced as loose notes (my-post/index.fr.md) move to
+    # their bundle's layout once
+    migrated = migrate_translations(state, obsidian_dir, args.dry_run)
+    if migrated:
+        print(f"Moved {migrated} translations synced by an older version to the bundle layout")
+
+    # The git detector vouches for unchanged Hugo posts (not in paranoid mode)
+    git = None
+    if args.since or ((args.git_index or config.get("git_index", False)) and not args.paranoid):
+        try:
+            git = GitDetector(hugo_dir, state, args.since)
+        except ValueError as e:
+            print(f"Error: Cannot use the git index: {e}")
+            sys.exit(1)
+        if args.since:
+            print(f"Since {args.since}: {len(git.touched)} Hugo content files touched")
+
+    # Walk both directories, then fingerprint the posts the filters select.
+    # The post maps stay complete for the note index and state pruning.
+    jobs = args.jobs or config.get("jobs", 1)
+    with phase("scan"):
+        hugo_posts = scan_directory(hugo_dir, state, "hugo", jobs, args.paranoid, ignore)
+        obsidian_posts = scan_directory(
+            obsidian_dir, state, "obsidian", jobs, args.paranoid, ignore
+        )
+        all_post_ids = set(hugo_posts) | set(obsidian_posts)
+        if post_filter.active and args.command is None:
+            all_post_ids = post_filter.select(hugo_posts, obsidian_posts)
+        if args.since and args.command is None:
+            all_post_ids &= git.select(hugo_posts, obsidian_posts)
+        fingerprints = {
+            side: fingerprint_posts(
+                {post_id: path for post_id, path in posts.items() if post_id in all_post_ids},
+                state, side, jobs, args.paranoid, known,
+            )
+            for side, posts, known in (
+                ("hugo", hugo_posts, git.fingerprint if git is not None else None),
+                ("obsidian", obsidian_posts, None),
+            )
+        }
+    count("posts_hugo", len(hugo_posts))
+    count("posts_obsidian", len(obsidian_posts))
+
+    # Refresh the note index links are resolved with; posts gone from both
+    # sides are dropped from it
+    links = update_note_index(
+        state, set(hugo_posts) | set(obsidian_posts) | set(state.get("links", {})),
+        hugo_posts, obsidian_posts,
+    )
+    unresolved: List[Tuple[str, str]] = []
 
-    # Get all post IDs
-    all_post_ids = set(hugo_posts.keys()) | set(obsidian_posts.keys())
+    if args.command == "rename":
+        rename(
+            args, state, state_store, hugo_posts, obsidian_posts, fingerprints,
+            hugo_dir, obsidian_dir, links,
+        )
+        return
 
     print(f"Found {len(hugo_posts)} Hugo posts, {len(obsidian_posts)} Obsidian posts")
+    if post_filter.active:
+        print(f"Selected {len(all_post_ids)} posts matching the filters")
+    if args.since:
+        print(f"Selected {len(all_post_ids)} posts touched since {args.since}")
     print(f"Mode: {'dry-run' if args.dry_run else 'live'}")
     if args.push:
         print("Direction: Obsidian -> Hugo only")
@@ -375,85 +1880,60 @@ def main():
         print("Direction: Bidirectional")
     print()
 
-    # Process each post
-    synced = 0
-    skipped = 0
-    conflicts = 0
-
-    for post_id in sorted(all_post_ids):
-        hugo_path = hugo_posts.get(post_id)
-        obsidian_path = obsidian_posts.get(post_id)
-
-        action, detail = determine_action(post_id, hugo_path, obsidian_path, state)
-
-        if action == SyncAction.UNCHANGED:
-            continue
-
-        print(f"[{action}] {post_id}")
-
-        # Handle based on action and mode
-        if action == SyncAction.NEW_IN_HUGO:
-            if not args.push:  # Pull or bidirectional
-                sync_post_to_obsidian(hugo_path, obsidian_dir, post_id, state, args.dry_run)
-                synced += 1
-            else:
-                skipped += 1
-
-        elif action == SyncAction.NEW_IN_OBSIDIAN:
-            if not args.pull:  # Push or bidirectional
-                sync_post_to_hugo(obsidian_path, hugo_dir, post_id, state, args.dry_run)
-                synced += 1
-            else:
-                skipped += 1
-
-        elif action == SyncAction.MODIFIED_IN_HUGO:
-            if not args.push:
-                sync_post_to_obsidian(hugo_path, obsidian_dir, post_id, state, args.dry_run)
-                synced += 1
-            else:
-                skipped += 1
-
-        elif action == SyncAction.MODIFIED_IN_OBSIDIAN:
-            if not args.pull:
-                sync_post_to_hugo(obsidian_path, hugo_dir, post_id, state, args.dry_run)
-                synced += 1
-            else:
-                skipped += 1
-
-        elif action == SyncAction.CONFLICT:
-            conflicts += 1
-            if args.dry_run:
-                print(f"  Conflict detected - would prompt for resolution")
-                continue
-
-            resolution = resolve_conflict(post_id, hugo_path, obsidian_path, args.force)
-            if resolution == "hugo":
-                sync_post_to_obsidian(hugo_path, obsidian_dir, post_id, state, args.dry_run)
-                synced += 1
-            elif resolution == "obsidian":
-                sync_post_to_hugo(obsidian_path, hugo_dir, post_id, state, args.dry_run)
-                synced += 1
-            else:
-                skipped += 1
-
-        elif action in (SyncAction.DELETED_IN_HUGO, SyncAction.DELETED_IN_OBSIDIAN):
-            print(f"  Deletion detected - skipping (manual review recommended)")
-            skipped += 1
-
-    # Update state (unless dry-run)
-    if not args.dry_run:
-        # Rescan and update hashes
-        hugo_posts = scan_posts(hugo_dir)
-        obsidian_posts = scan_posts(obsidian_dir)
-
-        state["hugo"] = {pid: get_file_hash(path) for pid, path in hugo_posts.items()}
-        state["obsidian"] = {pid: get_file_hash(path) for pid, path in obsidian_posts.items()}
-
-        save_state(state_path, state)
-
-    # Summary
-    print()
-    print(f"Summary: {synced} synced, {skipped} skipped, {conflicts} conflicts")
+    cache = ConversionCache(cache_path, cache_size) if cache_path else None
+    options = SyncOptions(
+        asset_transfer=asset_transfer,
+        convert_workers=convert_workers,
+        convert_min_posts=convert_min_posts,
+        io_concurrency=io_concurrency,
+        cache=cache,
+        links=links,
+        unresolved=unresolved,
+        stream_min_bytes=stream_min_bytes,
+    )
+    try:
+        with phase("sync"):
+            stats = sync_posts(
+                all_post_ids, hugo_posts, obsidian_posts, fingerprints, state,
+                hugo_dir, obsidian_dir, args, options,
+            )
+
+        # Update state (unless dry-run). Written posts were fingerprinted from
+        # memory by the sync functions, so only stale entries remain to drop.
+        if not args.dry_run:
+            with phase("save_state"):
+                prune_state(state, "hugo", set(hugo_posts))
+                prune_state(state, "obsidian", set(obsidian_posts))
+                if git is not None:
+                    git.record(hugo_posts)
+                update_front_matter_index(
+                    state, all_post_ids, hugo_posts, obsidian_posts, fingerprints
+                )
+
+                state_store.save(state)
+        if git is not None:
+            stats.update(git.take_counts())
+        if cache is not None:
+            with phase("save_cache"):
+                cache.flush()
+            stats.update(cache.take_counts())
+
+        print()
+        print_summary(stats)
+        print_unresolved(unresolved)
+        if git is not None:
+            print_git_changes(git.changed)
+        if recorder is not None:
+            write_stats(recorder, stats, args)
+
+        if args.watch:
+            watch(
+                hugo_posts, obsidian_posts, fingerprints, state, state_store,
+                hugo_dir, obsidian_dir, args, options, ignore,
+            )
+    finally:
+        if cache is not None:
+            cache.close()
 
 
 if __name__ == "__main__":
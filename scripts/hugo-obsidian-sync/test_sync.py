@@ -3,18 +3,95 @@
 Tests for Hugo-Obsidian sync tool.
 """
 
+import builtins
+import contextlib
+import errno
+import io
+import json
+import os
 import shutil
+import sqlite3
+import subprocess
+import sys
 import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-
-from converters import hugo_to_obsidian, obsidian_to_hugo
-from state import load_state, save_state, get_file_hash
+from unittest import mock
+
+import sync
+import timing
+
+from aio import run_ordered
+from assets import sync_assets, transfer_asset
+from bundles import bundle_id, is_bundle_post
+from cache import ConversionCache
+from durability import make_dirs, set_durability, sync_pending, write_file
+from converters import (
+    detect_format,
+    find_links,
+    hugo_to_obsidian,
+    obsidian_to_hugo,
+    retarget_links,
+    stream_convert,
+)
+from frontmatter import read_front_matter
+from links import NoteIndex, record_outlinks
+from state import (
+    SqliteStateStore,
+    file_changed,
+    get_file_hash,
+    get_file_stat,
+    get_fingerprint,
+    load_state,
+    migrate_json_state,
+    open_state_store,
+    save_state,
+)
 from sync import (
+    DEFAULT_IGNORE,
+    _walked_post_id,
+    _write_order_key,
+    _writes_bundle,
+    apply_changes,
+    determine_action,
     get_post_id,
+    ignore_filter,
+    main,
+    scan_and_fingerprint,
     scan_posts,
     sync_post_to_obsidian,
     sync_post_to_hugo,
 )
+from watch import InotifyWatcher, PollingWatcher, inotify_available, watch_changes
+
+
+class CountingOpen:
+    """Count file opens of markdown posts while the context is active."""
+
+    def __init__(self, suffix=".md"):
+        self.suffix = suffix
+        self.opened = []
+        self._real_open = io.open
+
+    def _open(self, file, *args, **kwargs):
+        if str(file).endswith(self.suffix):
+            self.opened.append(Path(file))
+        return self._real_open(file, *args, **kwargs)
+
+    def __enter__(self):
+        self._patches = [
+            mock.patch.object(builtins, "open", self._open),
+            mock.patch.object(io, "open", self._open),
+        ]
+        for patch in self._patches:
+            patch.start()
+        return self
+
+    def __exit__(self, *exc):
+        for patch in self._patches:
+            patch.stop()
 
 
 class TestConverters:
@@ -73,6 +150,168 @@ graph LR
         roundtrip = obsidian_to_hugo(hugo_to_obsidian(hugo))
         assert roundtrip == hugo
 
+    def test_image_embed_obsidian_to_hugo(self):
+        assert obsidian_to_hugo("![[photo1.png]]") == "![](photo1.png)"
+        assert hugo_to_obsidian("![A photo](photo1.png)") == "![[photo1.png]]"
+
+    def test_callout_obsidian_to_hugo(self):
+        obsidian = """> [!info]
+> See [[other-post|this post]]
+> for details."""
+        expected = """{{< alert >}}
+See [this post]({{< ref "other-post.md" >}})
+for details.
+{{< /alert >}}"""
+        assert obsidian_to_hugo(obsidian) == expected
+
+    def test_alert_with_ref_hugo_to_obsidian(self):
+        hugo = """Intro
+
+{{< alert >}}
+Read [this]({{< ref "notes.md" >}}) first.
+{{< /alert >}}
+Outro ![](https://example.com/a.png)"""
+        expected = """Intro
+
+> [!info]
+> Read [[notes|this]] first.
+Outro ![](https://example.com/a.png)"""
+        assert hugo_to_obsidian(hugo) == expected
+
+    def test_code_blocks_not_converted(self):
+        hugo = """Use [this]({{< ref "a.md" >}}):
+
+```markdown
+[this]({{< ref "a.md" >}}) and ![x](img.png)
+{{< alert >}}not an alert{{< /alert >}}
+```
+
+Inline `![x](img.png)` stays, ![x](img.png) converts."""
+        expected = """Use [[a|this]]:
+
+```markdown
+[this]({{< ref "a.md" >}}) and ![x](img.png)
+{{< alert >}}not an alert{{< /alert >}}
+```
+
+Inline `![x](img.png)` stays, ![[img.png]] converts."""
+        assert hugo_to_obsidian(hugo) == expected
+
+    def test_code_blocks_not_converted_obsidian_to_hugo(self):
+        obsidian = """~~~
+[[note]] ![[img.png]]
+> [!info] not a callout
+~~~
+``[[note]]`` [[note]]"""
+        expected = """~~~
+[[note]] ![[img.png]]
+> [!info] not a callout
+~~~
+``[[note]]`` [note]({{< ref "note.md" >}})"""
+        assert obsidian_to_hugo(obsidian) == expected
+
+    def test_alert_containing_code_block(self):
+        hugo = """{{< alert >}}
+Run:
+```bash
+ls [a]({{< ref "a.md" >}})
+```
+{{< /alert >}}"""
+        expected = """> [!info]
+> Run:
+> ```bash
+> ls [a]({{< ref "a.md" >}})
+> ```"""
+        assert hugo_to_obsidian(hugo) == expected
+
+    def test_unclosed_shortcodes_left_as_written(self):
+        hugo = "{{< alert >}}\n[x]({{< ref \"a.md\" >}})\n{{< mermaid >}}\ngraph"
+        assert hugo_to_obsidian(hugo) == "{{< alert >}}\n[[a|x]]\n{{< mermaid >}}\ngraph"
+
+    def test_plain_content_returned_unchanged(self):
+        content = "# Title\n\nPlain [link](https://example.com) and `code`.\n"
+        assert hugo_to_obsidian(content) is content
+        assert obsidian_to_hugo(content) is content
+
+    def test_links_resolve_through_note_index(self):
+        links = NoteIndex({
+            os.path.join("blog", "first"): "blog/first.md",
+            os.path.join("blog", "trip"): "blog/trip",
+            os.path.join("notes", "todo"): "notes/todo.md",
+            os.path.join("blog", "todo"): "blog/todo.md",
+        })
+        unresolved = []
+        hugo = obsidian_to_hugo(
+            "[[first]] [[trip#day-1|Trip]] [[blog/todo]] [[todo]] [[gone]]", links, unresolved
+        )
+        assert hugo == (
+            '[first]({{< ref "blog/first.md" >}}) [Trip]({{< ref "blog/trip#day-1" >}}) '
+            '[blog/todo]({{< ref "blog/todo.md" >}}) [todo]({{< ref "todo.md" >}}) '
+            '[gone]({{< ref "gone.md" >}})'
+        )
+        assert unresolved == ["todo", "gone"]
+
+        unresolved = []
+        obsidian = hugo_to_obsidian(
+            '[first]({{< ref "first.md" >}}) [Trip]({{< ref "/blog/trip/index.md" >}}) '
+            '[todo]({{< ref "notes/todo.md" >}}) [x]({{< ref "x.md" >}})',
+            links, unresolved,
+        )
+        assert obsidian == "[[first]] [[trip|Trip]] [[notes/todo|todo]] [[x]]"
+        assert unresolved == ["x.md"]
+
+    def test_find_and_retarget_links_skip_code(self):
+        hugo = '[a]({{< ref "old.md#x" >}})\n```\n[b]({{< ref "old.md" >}})\n```\n'
+        assert find_links(hugo, "hugo") == ["old.md#x"]
+        assert retarget_links(hugo, "hugo", lambda link: "new.md#x") == (
+            '[a]({{< ref "new.md#x" >}})\n```\n[b]({{< ref "old.md" >}})\n```\n'
+        )
+        obsidian = "[[old|Old]] [[old]] ![[old]] ![[old.png]] `[[old]]`"
+        assert find_links(obsidian, "obsidian") == ["old", "old", "old"]
+        retargeted = retarget_links(obsidian, "obsidian", lambda link: "new")
+        assert retargeted == "[[new|Old]] [[new|old]] ![[new|old]] ![[old.png]] `[[old]]`"
+        assert find_links(retargeted, "obsidian") == ["new", "new", "new"]
+
+        # Both sides still convert into each other after a rename
+        hugo = obsidian_to_hugo(obsidian)
+        retargeted_hugo = retarget_links(hugo, "hugo", lambda link: "new.md")
+        assert obsidian_to_hugo(retargeted) == retargeted_hugo
+        assert hugo_to_obsidian(retargeted_hugo) == retargeted
+
+    def test_stream_convert_matches_whole_document(self):
+        links = NoteIndex({"notes": "notes.md", "other-post": "other-post.md"})
+        hugo = (
+            'Intro [a]({{< ref "notes.md" >}})\n\n'
+            "{{< mermaid >}}\ngraph LR\n\n    A --> B\n{{< /mermaid >}}\n\n"
+            "{{< alert >}}\nRead [this]({{< ref \"missing.md\" >}})\n\nfirst.\n{{< /alert >}}\n"
+            "```\n[b]({{< ref \"notes.md\" >}})\n\n```\n\n"
+            "A [split\n\nlink]({{< ref \"notes.md\" >}}) ![x](img.png)\n"
+        ) * 3
+        obsidian = (
+            "Intro [[notes|a]]\n\n```mermaid\ngraph LR\n\n    A --> B\n```\n\n"
+            "> [!info]\n> See [[other-post|this post]]\n\n> [[missing]]\n\n"
+            "~~~\n[[notes]]\n\n~~~\n![[img.png]] [[notes]]\n"
+        ) * 3
+        cases = ((hugo, "hugo", hugo_to_obsidian), (obsidian, "obsidian", obsidian_to_hugo))
+        for content, fmt, convert in cases:
+            expected_missing = []
+            expected = convert(content, links, expected_missing)
+            for chunk_size in (1, 16, 1 << 16):
+                missing, found = [], []
+                lines = io.StringIO(content)
+                streamed = "".join(
+                    stream_convert(lines, fmt, links, missing, found, chunk_size=chunk_size)
+                )
+                assert streamed == expected
+                assert missing == expected_missing
+                assert found == find_links(content, fmt)
+
+    def test_detect_format(self):
+        assert detect_format('{{< alert >}}\nx\n{{< /alert >}}') == "hugo"
+        assert detect_format("> [!info]\n> x\n\n![[a.png]]") == "obsidian"
+        assert detect_format('[[a]] and [a]({{< ref "a.md" >}})') == "unknown"
+        assert detect_format("plain text") == "unknown"
+
 
 class TestPostFormat:
     """Test that post format is preserved during sync."""
@@ -227,6 +466,1188 @@ class TestState:
         loaded = load_state(self.state_path)
         assert "format" in loaded
 
+    def test_sqlite_store_roundtrip(self):
+        state = {
+            "hugo": {"post1": "hash1", "post2": "hash3"},
+            "obsidian": {"post1": "hash2"},
+            "format": {"post1": "directory"},
+            "stat": {"hugo": {"post1": [7, 123, 9]}},
+            "assets": {"hugo": {"post1": {"a.png": ["hash4", [1, 2, 3]]}}},
+        }
+        store = open_state_store(self.temp_dir / "state.db")
+        assert isinstance(store, SqliteStateStore)
+        assert store.load() == {"hugo": {}, "obsidian": {}, "format": {}}
+        store.save(state)
+        assert open_state_store(self.temp_dir / "state.db").load() == state
+
+    def test_sqlite_store_writes_only_changed_rows(self):
+        db_path = self.temp_dir / "state.db"
+        store = open_state_store(db_path)
+        state = store.load()
+        state["hugo"].update({"post1": "hash1", "post2": "hash2", "post3": "hash3"})
+        store.save(state)
+
+        # A row that save() rewrote would lose this out-of-band edit
+        with sqlite3.connect(str(db_path)) as conn:
+            conn.execute("UPDATE posts SET hugo = 'edited' WHERE post_id = 'post1'")
+        conn.close()
+        state["hugo"]["post2"] = "changed"
+        del state["hugo"]["post3"]
+        store.save(state)
+
+        loaded = open_state_store(db_path).load()
+        assert loaded["hugo"] == {"post1": "edited", "post2": "changed"}
+
+    def test_sqlite_store_keeps_indexes_as_entries(self):
+        db_path = self.temp_dir / "state.db"
+        store = open_state_store(db_path)
+        state = store.load()
+        state.update({
+            "meta": {"post1": {"title": "One"}, "post2": {"title": "Two"}},
+            "links": {"post1": "/posts/post1.md"},
+            "outlinks": {"post1": ["post2"], "post2": []},
+            "backlinks": {"post2": ["post1"]},
+            "git": {"blobs": {"post1": ["abc", "hash1"]}},
+            "dirs": {
+                "hugo": {"ignore": [".git"], "listing": {"": [1, ["a.md"], []]}},
+                "obsidian": {},
+            },
+            "cache": {"hits": 1},
+        })
+        store.save(state)
+        assert open_state_store(db_path).load() == state
+
+        # An entry that save() rewrote would lose this out-of-band edit
+        with sqlite3.connect(str(db_path)) as conn:
+            conn.execute(
+                "UPDATE entries SET value = '{\"title\": \"Edited\"}' WHERE key = 'post1'"
+                " AND section = 'meta'"
+            )
+            assert conn.execute("SELECT COUNT(*) FROM sections").fetchone() == (1,)
+        conn.close()
+        state["meta"]["post2"]["title"] = "Changed"
+        del state["backlinks"]["post2"]
+        store.save(state)
+
+        loaded = open_state_store(db_path).load()
+        assert loaded["meta"] == {"post1": {"title": "Edited"}, "post2": {"title": "Changed"}}
+        assert loaded["backlinks"] == {}
+        assert loaded["dirs"] == state["dirs"]
+
+    def test_migrate_json_state(self):
+        state = {
+            "hugo": {"post1": "hash1"},
+            "obsidian": {"post1": "hash2", "post2": "hash3"},
+            "format": {"post1": "single"},
+        }
+        save_state(self.state_path, state)
+        store = open_state_store(self.temp_dir / "state.sqlite")
+        assert migrate_json_state(self.state_path, store) == 2
+        assert open_state_store(self.temp_dir / "state.sqlite").load() == state
+
+    def test_unchanged_stat_skips_hashing(self):
+        """A matching stat tuple should be trusted without reading the file."""
+        post = self.temp_dir / "post.md"
+        post.write_text("content")
+        file_hash, file_stat = get_fingerprint(post, None, None)
+
+        with mock.patch("state.get_file_hash", side_effect=AssertionError("hashed")):
+            assert not file_changed(post, file_hash, file_stat)
+
+    def test_paranoid_always_hashes(self):
+        post = self.temp_dir / "post.md"
+        post.write_text("content")
+        file_hash, file_stat = get_fingerprint(post, None, None)
+
+        with mock.patch("state.get_file_hash", return_value="other") as hasher:
+            assert file_changed(post, file_hash, file_stat, paranoid=True)
+        hasher.assert_called_once_with(post)
+
+    def test_stat_change_with_same_content_is_unchanged(self):
+        """Touching a file changes its stat but not its hash."""
+        post = self.temp_dir / "post.md"
+        post.write_text("content")
+        file_hash, file_stat = get_fingerprint(post, None, None)
+
+        stale_stat = [file_stat[0], file_stat[1] - 1, file_stat[2]]
+        assert not file_changed(post, file_hash, stale_stat)
+        assert get_fingerprint(post, file_hash, stale_stat) == (file_hash, file_stat)
+
+
+class TestSyncRun:
+    """Test full sync runs through main()."""
+
+    def setup_method(self):
+        self.temp_dir = Path(tempfile.mkdtemp())
+        self.hugo_dir = self.temp_dir / "hugo"
+        self.obsidian_dir = self.temp_dir / "obsidian"
+        self.hugo_dir.mkdir()
+        self.obsidian_dir.mkdir()
+        self.config_path = self.temp_dir / "config.yaml"
+        self.config_path.write_text(
+            f"hugo_content: {self.hugo_dir}\n"
+            f"obsidian_vault: {self.obsidian_dir}\n"
+            f"state_file: {self.temp_dir / 'state.json'}\n"
+        )
+        for name in ("first", "second", "third"):
+            (self.hugo_dir / f"{name}.md").write_text(f"---\ntitle: {name}\n---\nBody.")
+
+    def teardown_method(self):
+        shutil.rmtree(self.temp_dir)
+
+    def run_sync(self, *args):
+        argv = ["sync.py", "--config", str(self.config_path), *args]
+        with mock.patch.object(sys, "argv", argv):
+            main()
+
+    def test_noop_sync_opens_no_posts(self):
+        self.run_sync("--pull")
+
+        with CountingOpen() as counter:
+            self.run_sync()
+        assert counter.opened == []
+
+    def test_noop_sync_with_sqlite_state(self):
+        config = self.config_path.read_text().replace("state.json", "state.db")
+        self.config_path.write_text(config)
+        self.run_sync("--pull")
+        assert not (self.temp_dir / "state.json").exists()
+
+        with CountingOpen() as counter:
+            self.run_sync()
+        assert counter.opened == []
+
+    def test_modified_post_is_read_and_written_once(self):
+        self.run_sync("--pull")
+        (self.hugo_dir / "second.md").write_text("---\ntitle: second\n---\nEdited body.")
+
+        with CountingOpen() as counter:
+            self.run_sync()
+        assert sorted(counter.opened) == [
+            self.hugo_dir / "second.md",  # hashed for change detection
+            self.hugo_dir / "second.md",  # read for conversion
+        ]  # the target is written through a temp file, never read back
+
+        state = load_state(self.temp_dir / "state.json")
+        assert state["obsidian"]["second"] == get_file_hash(self.obsidian_dir / "second.md")
+        assert state["hugo"]["second"] == get_file_hash(self.hugo_dir / "second.md")
+
+    def test_large_posts_are_streamed(self):
+        (self.hugo_dir / "second.md").write_text(
+            '---\ntitle: second\ntags: [big]\n---\n'
+            + '{{< alert >}}\nSee [first]({{< ref "first.md" >}}).\n{{< /alert >}}\n\n' * 2000
+        )
+        expected = hugo_to_obsidian((self.hugo_dir / "second.md").read_text())
+        self.config_path.write_text(self.config_path.read_text() + "stream_min_mb: 0.01\n")
+
+        with mock.patch.object(sync, "read_post", wraps=sync.read_post) as read_post:
+            self.run_sync("--pull")
+        read = [call.args[0] for call in read_post.call_args_list]
+        assert self.hugo_dir / "second.md" not in read
+        assert self.hugo_dir / "first.md" in read
+        assert (self.obsidian_dir / "second.md").read_text() == expected
+        assert [p.name for p in self.obsidian_dir.iterdir() if p.name.startswith(".")] == []
+
+        state = load_state(self.temp_dir / "state.json")
+        assert state["obsidian"]["second"] == get_file_hash(self.obsidian_dir / "second.md")
+        assert state["hugo"]["second"] == get_file_hash(self.hugo_dir / "second.md")
+        assert state["outlinks"]["second"] == ["first"]
+        assert state["meta"]["second"]["tags"] == ["big"]
+
+        # Streaming the same post again leaves the identical target alone
+        os.utime(self.obsidian_dir / "second.md", ns=(0, 0))
+        (self.temp_dir / "state.json").unlink()
+        self.run_sync("--force", "hugo")
+        assert (self.obsidian_dir / "second.md").stat().st_mtime_ns == 0
+
+    def test_source_edited_during_sync_is_synced_next_time(self):
+        (self.hugo_dir / "second.md").write_text("---\ntitle: second\n---\n" + "Line.\n" * 2000)
+        self.config_path.write_text(self.config_path.read_text() + "stream_min_mb: 0.01\n")
+        real_read_post, real_stream_convert = sync.read_post, sync.stream_convert
+
+        def edit(name):
+            (self.hugo_dir / f"{name}.md").write_text(f"---\ntitle: {name}\n---\nEdited.")
+
+        # Each source is saved again right after it was read, before the
+        # state records its fingerprint
+        def read_post(path):
+            result = real_read_post(path)
+            if path.name == "first.md":
+                edit("first")
+            return result
+
+        def stream_convert(*args, **kwargs):
+            yield from real_stream_convert(*args, **kwargs)
+            edit("second")
+
+        with mock.patch.object(sync, "read_post", read_post), \
+                mock.patch.object(sync, "stream_convert", stream_convert):
+            self.run_sync("--pull")
+        assert "Edited." not in (self.obsidian_dir / "first.md").read_text()
+
+        self.run_sync("--pull")
+        assert "Edited." in (self.obsidian_dir / "first.md").read_text()
+        assert "Edited." in (self.obsidian_dir / "second.md").read_text()
+
+    def test_batch_durability_syncs_before_state_save(self):
+        events = []
+        real_replace = os.replace
+
+        def replace(source, target):
+            real_replace(source, target)
+            events.append(("replace", Path(target).name))
+
+        def fsync(path, directory=False):
+            events.append(("fsync", Path(path).name))
+
+        with mock.patch("os.replace", replace), mock.patch("durability._fsync", fsync):
+            self.run_sync("--pull", "--no-cache")
+        assert events == [
+            ("replace", "first.md"),
+            ("replace", "second.md"),
+            ("replace", "third.md"),
+            ("fsync", "first.md"),
+            ("fsync", "second.md"),
+            ("fsync", "third.md"),
+            ("fsync", "obsidian"),
+            ("replace", "state.json"),
+            ("fsync", "state.json"),
+            ("fsync", self.temp_dir.name),
+        ]
+
+        events.clear()
+        self.config_path.write_text(self.config_path.read_text() + "durability: none\n")
+        (self.hugo_dir / "first.md").write_text("Edited.")
+        with mock.patch("os.replace", replace), mock.patch("durability._fsync", fsync):
+            self.run_sync("--pull", "--no-cache")
+        assert events == [("replace", "first.md"), ("replace", "state.json")]
+
+    def test_identical_target_is_not_rewritten(self):
+        self.run_sync("--pull")
+        target = self.obsidian_dir / "first.md"
+        os.utime(target, ns=(0, 0))
+        (self.temp_dir / "state.json").unlink()
+
+        output = io.StringIO()
+        with contextlib.redirect_stdout(output):
+            self.run_sync("--force", "hugo")
+        assert target.stat().st_mtime_ns == 0
+        assert "0 synced, 3 already up to date" in output.getvalue()
+
+    def test_only_changed_assets_are_copied(self):
+        bundle = self.hugo_dir / "gallery"
+        bundle.mkdir()
+        (bundle / "index.md").write_text("![[a.png]]")
+        (bundle / "a.png").write_bytes(b"a" * 100)
+        (bundle / "b.png").write_bytes(b"b" * 10)
+        self.run_sync("--pull")
+        assert (self.obsidian_dir / "gallery" / "a.png").read_bytes() == b"a" * 100
+
+        (bundle / "index.md").write_text("![[a.png]] ![[b.png]]")
+        (bundle / "b.png").write_bytes(b"c" * 20)
+        output = io.StringIO()
+        with CountingOpen(".png") as counter, contextlib.redirect_stdout(output):
+            self.run_sync("--pull")
+        assert bundle / "b.png" in counter.opened
+        assert bundle / "a.png" not in counter.opened
+        assert (self.obsidian_dir / "gallery" / "b.png").read_bytes() == b"c" * 20
+        assert "Assets: 20 bytes copied, 100 bytes unchanged" in output.getvalue()
+
+    def test_changed_target_assets_are_not_overwritten(self):
+        bundle = self.hugo_dir / "gallery"
+        bundle.mkdir()
+        (bundle / "index.md").write_text("![[featured.png]]")
+        (bundle / "featured.png").write_bytes(b"old")
+        self.run_sync("--pull")
+        vault_image = self.obsidian_dir / "gallery" / "featured.png"
+
+        # A new Hugo image is kept when only the vault note changed
+        (bundle / "featured.png").write_bytes(b"new in hugo")
+        (self.obsidian_dir / "gallery" / "gallery.md").write_text("Edited ![[featured.png]]")
+        self.run_sync()
+        assert (bundle / "featured.png").read_bytes() == b"new in hugo"
+        assert vault_image.read_bytes() == b"old"
+
+        # ... and still reads as changed when the Hugo post syncs next
+        (bundle / "index.md").write_text("Edited again ![[featured.png]]")
+        self.run_sync()
+        assert vault_image.read_bytes() == b"new in hugo"
+
+        # Changed on both sides: reported, neither copy overwritten
+        (bundle / "featured.png").write_bytes(b"hugo edit")
+        vault_image.write_bytes(b"vault edit")
+        (bundle / "index.md").write_text("Third edit ![[featured.png]]")
+        output = io.StringIO()
+        with contextlib.redirect_stdout(output):
+            self.run_sync()
+        assert "Asset conflict: featured.png changed on both sides" in output.getvalue()
+        assert "Asset conflicts: 1" in output.getvalue()
+        assert vault_image.read_bytes() == b"vault edit"
+        assert (bundle / "featured.png").read_bytes() == b"hugo edit"
+
+    def test_bundle_translations_share_assets(self):
+        bundle = self.hugo_dir / "trip"
+        bundle.mkdir()
+        (bundle / "index.en.md").write_text("---\ntitle: Trip\n---\n![](map.png)")
+        (bundle / "index.fr.md").write_text("---\ntitle: Voyage\n---\n![](map.png)")
+        (bundle / "map.png").write_bytes(b"m" * 50)
+
+        output = io.StringIO()
+        with contextlib.redirect_stdout(output):
+            self.run_sync("--pull")
+        vault_bundle = self.obsidian_dir / "trip"
+        assert sorted(p.name for p in vault_bundle.iterdir()) == [
+            "map.png", "trip.en.md", "trip.fr.md"
+        ]
+        # Copied once, then recognised as unchanged for the other translation
+        assert "Assets: 50 bytes copied, 50 bytes unchanged" in output.getvalue()
+
+        shutil.rmtree(self.hugo_dir)
+        self.hugo_dir.mkdir()
+        (self.temp_dir / "state.json").unlink()
+        self.run_sync("--push")
+        assert sorted(p.name for p in bundle.iterdir()) == ["index.en.md", "index.fr.md", "map.png"]
+        assert (bundle / "index.fr.md").read_text() == "---\ntitle: Voyage\n---\n![](map.png)"
+
+    def test_translations_synced_as_loose_notes_are_migrated(self):
+        bundle = self.hugo_dir / "trip"
+        bundle.mkdir()
+        (bundle / "index.md").write_text("Trip ![](map.png)")
+        (bundle / "index.fr.md").write_text("Voyage")
+        (bundle / "map.png").write_bytes(b"m" * 50)
+        self.run_sync("--pull")
+
+        # Lay the vault and state out as older versions did: index.fr.md
+        # was a loose note with ID trip/index.fr
+        vault_bundle = self.obsidian_dir / "trip"
+        (vault_bundle / "trip.fr.md").rename(vault_bundle / "index.fr.md")
+        state = load_state(self.temp_dir / "state.json")
+        old_id = os.path.join("trip", "index.fr")
+        stats = state["stat"]
+        for entries in (state["hugo"], state["obsidian"], stats["hugo"], stats["obsidian"]):
+            entries[old_id] = entries.pop("trip.fr")
+        state["format"][old_id] = "single"
+        save_state(self.temp_dir / "state.json", state)
+
+        output = io.StringIO()
+        with contextlib.redirect_stdout(output):
+            self.run_sync()
+        assert "Moved 1 translations" in output.getvalue()
+        assert "0 synced, 0 already up to date, 0 skipped, 0 conflicts" in output.getvalue()
+        assert sorted(p.name for p in vault_bundle.iterdir()) == ["map.png", "trip.fr.md", "trip.md"]
+        state = load_state(self.temp_dir / "state.json")
+        assert old_id not in state["hugo"] and state["format"]["trip.fr"] == "directory"
+
+        (vault_bundle / "trip.fr.md").write_text("Voyage edited")
+        self.run_sync("--push")
+        assert (bundle / "index.fr.md").read_text() == "Voyage edited"
+        assert sorted(p.name for p in bundle.iterdir()) == ["index.fr.md", "index.md", "map.png"]
+
+    def test_wikilinks_resolve_to_post_paths(self):
+        (self.hugo_dir / "blog").mkdir()
+        shutil.move(str(self.hugo_dir / "first.md"), str(self.hugo_dir / "blog"))
+        (self.obsidian_dir / "note.md").write_text("[[first]] and [[third]], not [[gone]]")
+        (self.obsidian_dir / "other.md").write_text("[[missing|Missing]]")
+
+        output = io.StringIO()
+        with contextlib.redirect_stdout(output):
+            self.run_sync("--push")
+        assert (self.hugo_dir / "note.md").read_text() == (
+            '[first]({{< ref "blog/first.md" >}}) and [third]({{< ref "third.md" >}}), '
+            'not [gone]({{< ref "gone.md" >}})'
+        )
+        assert "Unresolved links (2):\n  note: gone\n  other: missing\n" in output.getvalue()
+        state = load_state(self.temp_dir / "state.json")
+        assert state["links"][os.path.join("blog", "first")] == "blog/first.md"
+
+    def test_rename_moves_bundle_and_rewrites_referrers(self):
+        bundle = self.hugo_dir / "trip"
+        bundle.mkdir()
+        (bundle / "index.en.md").write_text("Trip")
+        (bundle / "index.fr.md").write_text("Voyage")
+        (bundle / "map.png").write_bytes(b"png")
+        (self.hugo_dir / "first.md").write_text('See [it]({{< ref "trip" >}})')
+        self.run_sync("--pull")
+        (self.obsidian_dir / "note.md").write_text("[[trip|Trip]] and [[second]]")
+        self.run_sync()
+
+        with CountingOpen() as counter, contextlib.redirect_stdout(io.StringIO()):
+            self.run_sync("rename", "trip", "travel/japan")
+        # Only the posts linking to the bundle are read
+        assert {path.name for path in counter.opened} == {"first.md", "note.md"}
+        assert sorted(
+            str(path.relative_to(self.obsidian_dir / "travel"))
+            for path in (self.obsidian_dir / "travel").rglob("*")
+        ) == ["japan", os.path.join("japan", "japan.en.md"),
+              os.path.join("japan", "japan.fr.md"), os.path.join("japan", "map.png")]
+        assert (self.hugo_dir / "travel" / "japan" / "index.fr.md").read_text() == "Voyage"
+        assert not bundle.exists()
+        assert (self.hugo_dir / "first.md").read_text() == (
+            'See [it]({{< ref "travel/japan" >}})'
+        )
+        assert (self.obsidian_dir / "first.md").read_text() == "See [[japan|it]]"
+        assert (self.obsidian_dir / "note.md").read_text() == "[[japan|Trip]] and [[second]]"
+
+        state = load_state(self.temp_dir / "state.json")
+        assert state["backlinks"][os.path.join("travel", "japan")] == ["first", "note"]
+        output = io.StringIO()
+        with contextlib.redirect_stdout(output):
+            self.run_sync()
+        assert "Summary: 0 synced" in output.getvalue()
+
+    def test_rename_refuses_unsynced_changes(self):
+        self.run_sync("--pull")
+        (self.hugo_dir / "second.md").write_text("Edited.")
+        output = io.StringIO()
+        with contextlib.redirect_stdout(output):
+            try:
+                self.run_sync("rename", "first", "renamed")
+            except SystemExit as e:
+                assert e.code == 1
+            else:
+                assert False, "expected SystemExit"
+        assert "1 posts have changes that are not synced yet" in output.getvalue()
+        assert (self.hugo_dir / "first.md").exists()
+
+    def test_post_filters_skip_unselected_posts(self):
+        self.run_sync("--pull")
+        for name in ("first", "second"):
+            (self.hugo_dir / f"{name}.md").write_text(f"---\ntitle: {name}\n---\nEdited.")
+
+        with CountingOpen() as counter:
+            self.run_sync("--only", "fir*")
+        assert set(counter.opened) == {self.hugo_dir / "first.md"}
+        assert "Edited." in (self.obsidian_dir / "first.md").read_text()
+        assert "Edited." not in (self.obsidian_dir / "second.md").read_text()
+
+        self.run_sync("--post", "second")
+        assert "Edited." in (self.obsidian_dir / "second.md").read_text()
+        assert set(load_state(self.temp_dir / "state.json")["hugo"]) == {"first", "second", "third"}
+
+    def test_drafts_only_reads_front_matter(self):
+        # The body is never decoded, only the header block
+        (self.hugo_dir / "draft.md").write_bytes(b"---\ntitle: draft\ndraft: true\n---\n\xff")
+        assert read_front_matter(self.hugo_dir / "draft.md") == {"title": "draft", "draft": True}
+        assert read_front_matter(self.hugo_dir / "first.md") == {"title": "first"}
+
+        (self.hugo_dir / "draft.md").write_text("---\ntitle: draft\ndraft: true\n---\nBody.")
+        self.run_sync("--pull", "--drafts-only")
+        assert [path.name for path in self.obsidian_dir.iterdir()] == ["draft.md"]
+
+        self.run_sync("--pull", "--modified-since", "2000-01-01")
+        assert len(list(self.obsidian_dir.iterdir())) == 4
+
+    def test_query_answers_from_front_matter_index(self):
+        (self.hugo_dir / "first.md").write_text(
+            "---\ntitle: first\ndate: 2024-01-02\ntags: [llm]\nseries: [intro]\n"
+            "series_order: 1\n---\nBody."
+        )
+        (self.hugo_dir / "third.md").write_text(
+            "---\ntitle: third\ntags: llm\nseries: intro\nseries_order: 3\ndraft: true\n---\n"
+        )
+        self.run_sync("--pull")
+
+        def query(*args):
+            output = io.StringIO()
+            with CountingOpen() as counter, contextlib.redirect_stdout(output):
+                self.run_sync("query", *args)
+            assert counter.opened == []
+            return output.getvalue()
+
+        assert query("--tag", "llm") == "first\t2024-01-02\tfirst\nthird\t-\tthird [draft]\n"
+        assert query("--drafts").splitlines() == ["third\t-\tthird [draft]"]
+        assert json.loads(query("--incomplete-series", "--json")) == {
+            "intro": {"drafts": ["third"], "missing": [2], "unordered": []}
+        }
+
+        # Entries are refreshed when the post's fingerprint changes
+        (self.hugo_dir / "third.md").write_text("---\ntitle: third\nseries: intro\n---\n")
+        self.run_sync()
+        assert query("--tag", "llm").splitlines() == ["first\t2024-01-02\tfirst"]
+        assert query("--incomplete-series") == "intro: no series_order: third\n"
+
+        # Queries need neither directory, and create no vault
+        shutil.rmtree(self.hugo_dir)
+        shutil.rmtree(self.obsidian_dir)
+        assert query("--tag", "llm").splitlines() == ["first\t2024-01-02\tfirst"]
+        assert not self.obsidian_dir.exists()
+
+    def git(self, *args):
+        subprocess.run(
+            ["git", "-C", str(self.hugo_dir), "-c", "user.name=t", "-c", "user.email=t@t", *args],
+            check=True, capture_output=True,
+        )
+
+    def test_git_index_recognises_rewritten_posts(self):
+        self.git("init")
+        self.git("update-index", "--index-version", "4")
+        time.sleep(0.05)  # git leaves entries as new as the index itself unrefreshed
+        self.git("add", ".")
+        self.git("commit", "-m", "posts")
+        self.run_sync("--pull", "--git-index")
+        state = load_state(self.temp_dir / "state.json")
+        assert set(state["git"]["blobs"]) == {"first", "second", "third"}
+
+        # A checkout rewrites files: new mtimes and inodes, same content
+        for name in ("first", "second"):
+            path = self.hugo_dir / f"{name}.md"
+            data = path.read_bytes()
+            path.unlink()
+            path.write_bytes(data)
+            mtime_ns = path.stat().st_mtime_ns - 10**10
+            os.utime(path, ns=(mtime_ns, mtime_ns))
+        (self.hugo_dir / "third.md").write_text("---\ntitle: third\n---\nEdited.")
+        time.sleep(0.05)
+        self.git("commit", "-am", "edit")
+
+        output = io.StringIO()
+        with CountingOpen() as counter, contextlib.redirect_stdout(output):
+            self.run_sync("--git-index")
+        assert self.hugo_dir / "first.md" not in counter.opened
+        assert self.hugo_dir / "second.md" not in counter.opened
+        assert "Git index: 2 Hugo posts recognised unchanged, 1 changed" in output.getvalue()
+        assert "Changed in git since the last sync (1):\n  third.md\n" in output.getvalue()
+        assert "Edited." in (self.obsidian_dir / "third.md").read_text()
+
+    def test_since_only_looks_at_touched_posts(self):
+        self.git("init")
+        self.git("add", ".")
+        self.git("commit", "-m", "posts")
+        self.run_sync("--pull")
+        (self.hugo_dir / "second.md").write_text("---\ntitle: second\n---\nEdited.")
+        self.git("commit", "-am", "edit")
+        (self.hugo_dir / "fourth.md").write_text("---\ntitle: fourth\n---\nNew.")
+
+        with mock.patch("state.get_file_stat", wraps=get_file_stat) as file_stat:
+            self.run_sync("--since", "HEAD~1")
+        statted = {call.args[0] for call in file_stat.call_args_list}
+        assert self.hugo_dir / "first.md" not in statted
+        assert self.hugo_dir / "second.md" in statted
+        assert "Edited." in (self.obsidian_dir / "second.md").read_text()
+        assert (self.obsidian_dir / "fourth.md").exists()
+
+    def test_since_does_not_take_older_hugo_edits_as_synced(self):
+        self.git("init")
+        self.git("add", ".")
+        self.git("commit", "-m", "posts")
+        self.run_sync("--pull")
+        (self.hugo_dir / "first.md").write_text("---\ntitle: first\n---\nHugo edit.")
+        self.git("commit", "-am", "edit first")
+        (self.hugo_dir / "second.md").write_text("---\ntitle: second\n---\nOther.")
+        self.git("commit", "-am", "edit second")
+        (self.obsidian_dir / "first.md").write_text("---\ntitle: first\n---\nVault edit.")
+
+        # first.md was touched before HEAD~1: it is left out, not overwritten
+        output = io.StringIO()
+        with contextlib.redirect_stdout(output):
+            self.run_sync("--since", "HEAD~1")
+        assert "Selected 1 posts touched since HEAD~1" in output.getvalue()
+        assert "Hugo edit." in (self.hugo_dir / "first.md").read_text()
+
+        output = io.StringIO()
+        with contextlib.redirect_stdout(output), mock.patch("builtins.input", return_value="s"):
+            self.run_sync()
+        assert "Hugo edit." in (self.hugo_dir / "first.md").read_text()
+        assert "[conflict] first" in output.getvalue()
+
+    def test_process_pool_conversion_matches_in_process(self):
+        (self.hugo_dir / "crlf.md").write_bytes(b"---\r\ntitle: crlf\r\n---\r\nBody.\r\n")
+        bundle = self.hugo_dir / "bundle"
+        bundle.mkdir()
+        (bundle / "index.md").write_text(
+            '{{< alert >}}\nSee [first]({{< ref "first.md" >}})\n{{< /alert >}}'
+        )
+        (bundle / "a.png").write_bytes(b"png")
+        self.run_sync("--pull")
+        expected = {
+            path.relative_to(self.obsidian_dir): path.read_bytes()
+            for path in self.obsidian_dir.rglob("*") if path.is_file()
+        }
+
+        shutil.rmtree(self.obsidian_dir)
+        (self.temp_dir / "state.json").unlink()
+        with open(self.config_path, "a") as f:
+            f.write("convert_min_posts: 2\n")
+        with mock.patch("sync.convert_posts", wraps=sync.convert_posts) as convert_posts:
+            self.run_sync("--pull", "--convert-workers", "2")
+        assert convert_posts.call_count == 1
+        assert {
+            path.relative_to(self.obsidian_dir): path.read_bytes()
+            for path in self.obsidian_dir.rglob("*") if path.is_file()
+        } == expected
+
+    def test_overlapped_io_matches_sequential(self):
+        bundle = self.hugo_dir / "bundle"
+        bundle.mkdir()
+        (bundle / "index.md").write_text("![](a.png)")
+        (bundle / "a.png").write_bytes(b"png")
+        self.run_sync("--pull")
+        expected = {
+            path.relative_to(self.obsidian_dir): path.read_bytes()
+            for path in self.obsidian_dir.rglob("*") if path.is_file()
+        }
+        expected_state = load_state(self.temp_dir / "state.json")
+
+        shutil.rmtree(self.obsidian_dir)
+        (self.temp_dir / "state.json").unlink()
+        output = io.StringIO()
+        with contextlib.redirect_stdout(output):
+            self.run_sync("--pull", "--io-concurrency", "4")
+        assert "I/O: 4 posts written by overlapping tasks" in output.getvalue()
+        assert {
+            path.relative_to(self.obsidian_dir): path.read_bytes()
+            for path in self.obsidian_dir.rglob("*") if path.is_file()
+        } == expected
+        state = load_state(self.temp_dir / "state.json")
+        for section in ("hugo", "obsidian", "format"):
+            assert state[section] == expected_state[section]
+
+    def test_stats_json_reports_phases_and_io(self):
+        stats_path = self.temp_dir / "stats.json"
+        output = io.StringIO()
+        with contextlib.redirect_stdout(output):
+            self.run_sync("--pull", "--stats", "--stats-json", str(stats_path))
+        assert "Slowest posts:" in output.getvalue()
+
+        metrics = json.loads(stats_path.read_text())
+        for name in ("load_state", "scan", "sync", "save_state", "read", "convert", "write"):
+            assert name in metrics["phases"]
+        assert metrics["phases"]["convert"]["calls"] == 3
+        assert metrics["counters"]["files_written"] == 3
+        assert metrics["counters"]["bytes_written"] == sum(
+            path.stat().st_size for path in self.obsidian_dir.glob("*.md")
+        )
+        assert {post["post_id"] for post in metrics["slowest_posts"]} == {
+            "first", "second", "third"
+        }
+        assert metrics["summary"]["synced"] == 3
+        # Recording stops with the run
+        assert timing._recorder is None
+
+    def test_profile_writes_stats_file(self):
+        profile_path = self.temp_dir / "sync.prof"
+        with contextlib.redirect_stdout(io.StringIO()):
+            self.run_sync("--pull", "--profile", str(profile_path))
+        assert profile_path.stat().st_size > 0
+        assert (self.obsidian_dir / "first.md").exists()
+
+
+class TestScan:
+    """Test scanning and fingerprinting of post trees."""
+
+    def setup_method(self):
+        self.temp_dir = Path(tempfile.mkdtemp())
+        for i in range(12):
+            post_dir = self.temp_dir / f"section-{i % 3}" / f"post-{i}"
+            post_dir.mkdir(parents=True)
+            (post_dir / "index.md").write_text(f"post {i}")
+        (self.temp_dir / "top.md").write_text("top")
+        (self.temp_dir / "_index.md").write_text("section page")
+
+    def teardown_method(self):
+        shutil.rmtree(self.temp_dir)
+
+    def test_parallel_scan_matches_serial(self):
+        serial = scan_and_fingerprint(self.temp_dir, {}, "hugo", jobs=1)
+        parallel = scan_and_fingerprint(self.temp_dir, {}, "hugo", jobs=4)
+        assert parallel == serial
+        assert list(parallel[0]) == list(parallel[1]) == sorted(serial[0])
+        assert "_index" not in serial[0]
+        assert serial[1]["top"][0] == get_file_hash(self.temp_dir / "top.md")
+
+    def test_scan_reuses_stored_hashes(self):
+        state = {}
+        posts, fingerprints = scan_and_fingerprint(self.temp_dir, state, "hugo")
+        for post_id, (file_hash, file_stat) in fingerprints.items():
+            state.setdefault("hugo", {})[post_id] = file_hash
+            state.setdefault("stat", {}).setdefault("hugo", {})[post_id] = file_stat
+
+        with mock.patch("state.get_file_hash", side_effect=AssertionError("hashed")):
+            assert scan_and_fingerprint(self.temp_dir, state, "hugo", jobs=4)[1] == fingerprints
+
+    def test_ignored_entries_are_skipped(self):
+        for name in (".obsidian", ".trash", "attachments"):
+            (self.temp_dir / name).mkdir()
+            (self.temp_dir / name / "note.md").write_text("ignored")
+        (self.temp_dir / "section-0" / "draft.excalidraw.md").write_text("ignored")
+
+        expected = {f"section-{i % 3}/post-{i}" for i in range(12)} | {"top"}
+        posts = scan_posts(self.temp_dir, ignore=DEFAULT_IGNORE + ["attachments", "*.excalidraw.md"])
+        assert set(posts) == expected
+        assert "attachments/note" in scan_posts(self.temp_dir)
+
+    def test_symlinked_directories_are_not_followed(self):
+        expected = scan_posts(self.temp_dir)
+        (self.temp_dir / "section-0" / "up").symlink_to("..")
+        (self.temp_dir / "mirror").symlink_to(self.temp_dir / "section-1")
+        assert scan_posts(self.temp_dir) == expected
+
+    def test_unchanged_directories_are_not_listed(self):
+        dir_cache = {}
+        posts = scan_posts(self.temp_dir, dir_cache=dir_cache)
+        assert dir_cache["listing"] == {}  # too recent to trust yet
+
+        for path in [self.temp_dir, *self.temp_dir.rglob("*")]:
+            if path.is_dir():
+                os.utime(path, ns=(0, 0))
+        scan_posts(self.temp_dir, dir_cache=dir_cache)
+        assert len(dir_cache["listing"]) == 16
+
+        with mock.patch("os.scandir", side_effect=AssertionError("listed")):
+            assert scan_posts(self.temp_dir, dir_cache=dir_cache) == posts
+
+        (self.temp_dir / "section-1" / "new.md").write_text("new")
+        with mock.patch("os.scandir", wraps=os.scandir) as scandir:
+            assert "section-1/new" in scan_posts(self.temp_dir, dir_cache=dir_cache)
+        assert [call.args[0] for call in scandir.call_args_list] == [
+            str(self.temp_dir / "section-1")
+        ]
+
+
+class TestAssetTransfer:
+    """Test asset transfer modes and their fallback to copying."""
+
+    def setup_method(self):
+        self.temp_dir = Path(tempfile.mkdtemp())
+        self.source = self.temp_dir / "source.png"
+        self.source.write_bytes(b"image data")
+        self.dest = self.temp_dir / "dest.png"
+        self.dest.write_bytes(b"stale")
+
+    def teardown_method(self):
+        shutil.rmtree(self.temp_dir)
+
+    def test_copy(self):
+        assert transfer_asset(self.source, self.dest, "copy") == "copy"
+        assert self.dest.read_bytes() == b"image data"
+        assert self.dest.stat().st_ino != self.source.stat().st_ino
+
+    def test_hardlink_shares_inode(self):
+        assert transfer_asset(self.source, self.dest, "hardlink") == "hardlink"
+        assert self.dest.stat().st_ino == self.source.stat().st_ino
+        assert sorted(p.name for p in self.temp_dir.iterdir()) == ["dest.png", "source.png"]
+
+    def test_hardlink_uses_a_unique_temp_name(self):
+        # A leftover from an interrupted link must not block the next one
+        leftover = self.temp_dir / ".dest.png.link"
+        leftover.write_bytes(b"leftover")
+        assert transfer_asset(self.source, self.dest, "hardlink") == "hardlink"
+        assert self.dest.stat().st_ino == self.source.stat().st_ino
+        assert leftover.read_bytes() == b"leftover"
+
+    def test_temp_files_are_not_synced_as_assets(self):
+        bundle, target = self.temp_dir / "bundle", self.temp_dir / "target"
+        bundle.mkdir()
+        target.mkdir()
+        (bundle / "index.md").write_text("Post.")
+        for name in ("photo.png", ".photo.png.abc123.tmp", ".photo.png.link"):
+            (bundle / name).write_bytes(b"data")
+        state = {}
+        sync_assets(bundle / "index.md", target, "bundle", state, "hugo", "obsidian")
+        assert [p.name for p in target.iterdir()] == ["photo.png"]
+        assert list(state["assets"]["hugo"]["bundle"]) == ["photo.png"]
+
+    def test_hardlink_across_devices_falls_back_to_copy(self):
+        with mock.patch("os.link", side_effect=OSError(errno.EXDEV, "cross-device link")):
+            assert transfer_asset(self.source, self.dest, "hardlink") == "copy"
+        assert self.dest.read_bytes() == b"image data"
+
+    def test_reflink_matches_content(self):
+        # tmpfs and ext4 have no FICLONE support, so this exercises the
+        # fallback there and a real clone on Btrfs or XFS
+        for mode in ("reflink", "auto"):
+            assert transfer_asset(self.source, self.dest, mode) in ("reflink", "copy")
+            assert self.dest.read_bytes() == b"image data"
+            assert self.dest.stat().st_mtime_ns == self.source.stat().st_mtime_ns
+
+    def test_reflink_unsupported_falls_back_to_copy(self):
+        error = OSError(errno.EOPNOTSUPP, "Operation not supported")
+        with mock.patch("fcntl.ioctl", side_effect=error):
+            assert transfer_asset(self.source, self.dest, "reflink") == "copy"
+        assert self.dest.read_bytes() == b"image data"
+        assert sorted(p.name for p in self.temp_dir.iterdir()) == ["dest.png", "source.png"]
+
+
+class TestDurability:
+    """Test atomic writes and when they are fsynced."""
+
+    def setup_method(self):
+        self.temp_dir = Path(tempfile.mkdtemp())
+        self.path = self.temp_dir / "post.md"
+        self.path.write_bytes(b"old")
+        self.path.chmod(0o640)
+        self.synced = []
+
+    def teardown_method(self):
+        set_durability("batch")
+        sync_pending()
+        shutil.rmtree(self.temp_dir)
+
+    def fsync(self):
+        def record(path, directory=False):
+            self.synced.append(Path(path))
+        return mock.patch("durability._fsync", side_effect=record)
+
+    def test_failed_write_keeps_target(self):
+        with mock.patch("os.replace", side_effect=OSError(errno.ENOSPC, "No space left")):
+            with contextlib.suppress(OSError):
+                write_file(self.path, b"new")
+        assert self.path.read_bytes() == b"old"
+        assert [p.name for p in self.temp_dir.iterdir()] == ["post.md"]
+
+        write_file(self.path, b"new")
+        assert self.path.read_bytes() == b"new"
+        assert self.path.stat().st_mode & 0o777 == 0o640
+
+    def test_modes(self):
+        with self.fsync():
+            set_durability("none")
+            write_file(self.path, b"none")
+            sync_pending()
+            assert self.synced == []
+
+            set_durability("batch")
+            write_file(self.path, b"batch")
+            assert self.synced == []
+            sync_pending()
+            assert self.synced == [self.path, self.temp_dir]
+
+            self.synced.clear()
+            set_durability("strict")
+            write_file(self.path, b"strict")
+            assert len(self.synced) == 2 and self.synced[0].name.endswith(".tmp")
+            assert self.synced[1] == self.temp_dir
+
+    def test_created_directories_are_synced_in_their_parents(self):
+        bundle = self.temp_dir / "blog" / "post"
+        sync_pending()  # Leave out what earlier tests wrote
+        with self.fsync():
+            make_dirs(bundle)
+            make_dirs(bundle)
+            write_file(bundle / "index.md", b"new")
+            sync_pending()
+        assert sorted(self.synced) == sorted(
+            [self.temp_dir, self.temp_dir / "blog", bundle, bundle / "index.md"]
+        )
+
+
+class ScriptedWatcher:
+    """Watcher whose read() calls return the results of scripted steps."""
+
+    name = "scripted"
+
+    def __init__(self, *steps):
+        self.steps = list(steps)
+
+    def read(self, timeout=None):
+        return self.steps.pop(0)()
+
+    def close(self):
+        pass
+
+
+class TestWatch:
+    """Test watch mode change handling."""
+
+    def setup_method(self):
+        self.temp_dir = Path(tempfile.mkdtemp())
+
+    def teardown_method(self):
+        shutil.rmtree(self.temp_dir)
+
+    def test_apply_changes_updates_post_map(self):
+        (self.temp_dir / "old.md").write_text("old")
+        posts = scan_posts(self.temp_dir)
+
+        (self.temp_dir / "old.md").rename(self.temp_dir / "new.md")
+        bundle = self.temp_dir / "bundle"
+        bundle.mkdir()
+        (bundle / "index.md").write_text("bundle")
+        (self.temp_dir / ".obsidian").mkdir()
+        (self.temp_dir / ".obsidian" / "workspace.md").write_text("ignored")
+        changed = {
+            self.temp_dir / "old.md",
+            self.temp_dir / "new.md",
+            bundle,
+            self.temp_dir / ".obsidian" / "workspace.md",
+            Path("/elsewhere.md"),
+        }
+
+        assert apply_changes(changed, self.temp_dir, posts) == {"old", "new", "bundle"}
+        assert posts == {"new": self.temp_dir / "new.md", "bundle": bundle / "index.md"}
+
+    def test_watch_changes_coalesces_bursts(self):
+        a, b, c = Path("a.md"), Path("b.md"), Path("c.md")
+        watcher = ScriptedWatcher(
+            lambda: {a}, lambda: {a, b}, lambda: {a}, set, lambda: {c}, set
+        )
+        batches = watch_changes(watcher, debounce=0)
+        assert next(batches) == {a, b}
+        assert next(batches) == {c}
+
+    def test_polling_watcher_reports_changes(self):
+        (self.temp_dir / "post.md").write_text("one")
+        watcher = PollingWatcher([self.temp_dir])
+        (self.temp_dir / "post.md").write_text("changed")
+        (self.temp_dir / "new").mkdir()
+        assert watcher.read(0) == {self.temp_dir / "post.md", self.temp_dir / "new"}
+        assert watcher.read(0) == set()
+
+    def test_watchers_prune_ignored_trees(self):
+        for name in (".git/objects/ab", "attachments/2024", "posts"):
+            (self.temp_dir / name).mkdir(parents=True)
+        (self.temp_dir / ".git" / "objects" / "ab" / "blob").write_text("x")
+        (self.temp_dir / "posts" / "drawing.excalidraw.md").write_text("x")
+        (self.temp_dir / "posts" / "post.md").write_text("x")
+        ignored = ignore_filter(
+            [self.temp_dir], DEFAULT_IGNORE + ["attachments", "*.excalidraw.md"]
+        )
+
+        watcher = PollingWatcher([self.temp_dir], ignored=ignored)
+        assert sorted(watcher.snapshot) == [
+            self.temp_dir, self.temp_dir / "posts", self.temp_dir / "posts" / "post.md"
+        ]
+        if inotify_available():
+            watcher = InotifyWatcher([self.temp_dir], ignored)
+            try:
+                assert sorted(watcher.dirs.values()) == [self.temp_dir, self.temp_dir / "posts"]
+                (self.temp_dir / ".trash").mkdir()
+                watcher.read(1)
+                assert self.temp_dir / ".trash" not in watcher.dirs.values()
+            finally:
+                watcher.close()
+
+    def test_inotify_watcher_reports_changes(self):
+        if not inotify_available():
+            return
+        watcher = InotifyWatcher([self.temp_dir])
+        try:
+            (self.temp_dir / "bundle").mkdir()
+            (self.temp_dir / "bundle" / "index.md").write_text("x")
+            assert self.temp_dir / "bundle" in watcher.read(1)
+            (self.temp_dir / "bundle" / "index.md").write_text("y")
+            assert watcher.read(1) == {self.temp_dir / "bundle" / "index.md"}
+        finally:
+            watcher.close()
+
+    def test_watch_syncs_only_changed_posts(self):
+        hugo_dir = self.temp_dir / "hugo"
+        obsidian_dir = self.temp_dir / "obsidian"
+        hugo_dir.mkdir()
+        config_path = self.temp_dir / "config.yaml"
+        config_path.write_text(
+            f"hugo_content: {hugo_dir}\n"
+            f"obsidian_vault: {obsidian_dir}\n"
+            f"state_file: {self.temp_dir / 'state.json'}\n"
+        )
+        for name in ("first", "second"):
+            (hugo_dir / f"{name}.md").write_text(f"[{name}]({{{{< ref \"{name}.md\" >}}}})")
+
+        def edit():
+            (hugo_dir / "second.md").write_text("[[edited]]")
+            return {hugo_dir / "second.md"}
+
+        def stop():
+            raise KeyboardInterrupt
+
+        watcher = ScriptedWatcher(edit, set, stop)
+        argv = ["sync.py", "--config", str(config_path), "--watch", "--debounce", "0"]
+        with mock.patch.object(sys, "argv", argv), \
+                mock.patch("sync.open_watcher", return_value=watcher), \
+                mock.patch("sync.determine_action", wraps=determine_action) as action:
+            main()
+
+        assert (obsidian_dir / "second.md").read_text() == "[[edited]]"
+        assert [call.args[0] for call in action.call_args_list] == ["first", "second", "second"]
+        assert load_state(self.temp_dir / "state.json")["hugo"]["second"] == get_file_hash(
+            hugo_dir / "second.md"
+        )
+
+
+class TestConversionCache:
+    """Test the persistent conversion cache."""
+
+    def setup_method(self):
+        self.temp_dir = Path(tempfile.mkdtemp())
+        self.path = self.temp_dir / "conversions.db"
+
+    def teardown_method(self):
+        shutil.rmtree(self.temp_dir)
+
+    def test_entries_persist_across_opens(self):
+        cache = ConversionCache(self.path, version="v1")
+        assert cache.get("hugo_to_obsidian", "abc", b"source") is None
+        cache.put("hugo_to_obsidian", "abc", b"converted")
+        cache.put("hugo_to_obsidian", "def", None)
+        cache.close()
+
+        cache = ConversionCache(self.path, version="v1")
+        assert cache.get("hugo_to_obsidian", "abc", b"source") == b"converted"
+        assert cache.get("hugo_to_obsidian", "def", b"same") == b"same"
+        assert cache.get("obsidian_to_hugo", "abc", b"source") is None
+        assert cache.take_counts() == {"cache_hits": 2, "cache_misses": 1}
+        cache.close()
+
+    def test_new_converter_version_invalidates_entries(self):
+        cache = ConversionCache(self.path, version="v1")
+        cache.put("hugo_to_obsidian", "abc", b"converted")
+        cache.close()
+
+        cache = ConversionCache(self.path, version="v2")
+        assert cache.get("hugo_to_obsidian", "abc", b"source") is None
+        cache.close()
+        with sqlite3.connect(str(self.path)) as conn:
+            assert conn.execute("SELECT COUNT(*) FROM outputs").fetchone()[0] == 0
+
+    def test_least_recently_used_entries_are_evicted(self):
+        cache = ConversionCache(self.path, max_size=1300, version="v1")
+        for name in ("a", "b", "c"):
+            cache.put("hugo_to_obsidian", name, name.encode() * 300)
+            cache.flush()
+        assert cache.get("hugo_to_obsidian", "a", b"") is not None
+        cache.put("hugo_to_obsidian", "d", b"d" * 300)
+        cache.close()
+
+        cache = ConversionCache(self.path, max_size=1300, version="v1")
+        present = [
+            name for name in "abcd" if cache.get("hugo_to_obsidian", name, b"") is not None
+        ]
+        cache.close()
+        assert present == ["a", "c", "d"]
+
+    def test_buffered_outputs_are_flushed_at_the_bound(self):
+        cache = ConversionCache(self.path, max_size=1300, version="v1")
+        for i in range(20):
+            cache.put("hugo_to_obsidian", str(i), b"x" * 300)
+            assert len(cache._added) < 4
+        cache.close()
+        with sqlite3.connect(str(self.path)) as conn:
+            assert conn.execute("SELECT COUNT(*) FROM entries").fetchone()[0] <= 3
+        conn.close()
+
+    def test_sync_serves_conversions_after_state_reset(self):
+        hugo_dir = self.temp_dir / "hugo"
+        hugo_dir.mkdir()
+        (hugo_dir / "post.md").write_text('See [x]({{< ref "x.md" >}})')
+        (hugo_dir / "plain.md").write_text("Nothing to convert.")
+        (hugo_dir / "x.md").write_text("Linked.")
+        config_path = self.temp_dir / "config.yaml"
+        config_path.write_text(
+            f"hugo_content: {hugo_dir}\n"
+            f"obsidian_vault: {self.temp_dir / 'obsidian'}\n"
+            f"state_file: {self.temp_dir / 'state.json'}\n"
+        )
+        argv = ["--config", str(config_path), "--pull"]
+        with contextlib.redirect_stdout(io.StringIO()):
+            main(argv)
+        (self.temp_dir / "state.json").unlink()
+        shutil.rmtree(self.temp_dir / "obsidian")
+
+        output = io.StringIO()
+        with mock.patch("sync.hugo_to_obsidian") as convert, contextlib.redirect_stdout(output):
+            convert.__name__ = "hugo_to_obsidian"
+            main(argv)
+        convert.assert_not_called()
+        assert "Conversion cache: 3 hits, 0 misses (100% hit ratio)" in output.getvalue()
+        assert (self.temp_dir / "obsidian" / "post.md").read_text() == "See [[x]]"
+        assert (self.temp_dir / "obsidian" / "plain.md").read_text() == "Nothing to convert."
+
+        # A new post leaves the other posts' cached conversions valid
+        (hugo_dir / "new.md").write_text('See [x]({{< ref "x.md" >}}) again')
+        (self.temp_dir / "state.json").unlink()
+        shutil.rmtree(self.temp_dir / "obsidian")
+        output = io.StringIO()
+        with contextlib.redirect_stdout(output):
+            main(argv)
+        assert "Conversion cache: 3 hits, 1 misses" in output.getvalue()
+
+    def test_link_digest_only_covers_the_links_given(self):
+        index = NoteIndex({"x": "x.md", "y": "y.md"})
+        digest = index.link_digest(["x", "x#top"], "obsidian")
+        other = NoteIndex({"x": "x.md", "z": "z.md"})
+        assert other.link_digest(["x#top", "x"], "obsidian") == digest
+        moved = NoteIndex({os.path.join("blog", "x"): "blog/x.md", "y": "y.md"})
+        assert moved.link_digest(["x", "x#top"], "obsidian") != digest
+
+
+class TestOverlappedIO:
+    """Test the asyncio-driven write stage."""
+
+    def test_same_key_calls_run_in_order_others_overlap(self):
+        events = []
+        lock = threading.Lock()
+
+        def call(name, delay):
+            def run():
+                with lock:
+                    events.append(("start", name))
+                time.sleep(delay)
+                with lock:
+                    events.append(("end", name))
+                return name
+            return run
+
+        results, concurrency = run_ordered(
+            [("a", call("a1", 0.05)), ("b", call("b1", 0.01)), ("a", call("a2", 0.0))], 4
+        )
+        assert results == ["a1", "b1", "a2"]
+        assert events.index(("end", "a1")) < events.index(("start", "a2"))
+        assert events.index(("start", "b1")) < events.index(("end", "a1"))
+        assert concurrency["io_tasks"] == 3
+        assert concurrency["io_peak"] == 2
+
+    def test_first_error_is_raised(self):
+        def fail():
+            raise OSError("disk gone")
+
+        try:
+            run_ordered([("a", fail), ("a", lambda: "never")], 2)
+        except OSError as e:
+            assert str(e) == "disk gone"
+        else:
+            assert False, "expected OSError"
+
+    def test_outlinks_recorded_from_threads_keep_every_backlink(self):
+        # Each post drops and re-adds the shared target, emptying its
+        # backlinks list while other threads append to it
+        state = {}
+        posts = [f"post-{i}" for i in range(8)]
+
+        def relink(post_id):
+            for _ in range(1000):
+                record_outlinks(state, post_id, ["a", "b"])
+                record_outlinks(state, post_id, [])
+            record_outlinks(state, post_id, ["a", "b"])
+
+        interval = sys.getswitchinterval()
+        sys.setswitchinterval(1e-6)
+        try:
+            with ThreadPoolExecutor(max_workers=8) as executor:
+                list(executor.map(relink, posts))
+        finally:
+            sys.setswitchinterval(interval)
+        assert sorted(state["backlinks"]["a"]) == sorted(posts)
+        assert sorted(state["backlinks"]["b"]) == sorted(posts)
+
+    def test_posts_inside_a_bundle_share_its_key(self):
+        bundles = {("obsidian", "guide")}
+        assert _write_order_key(os.path.join("guide", "part-1"), "obsidian", bundles) == (
+            "obsidian", "guide"
+        )
+        assert _write_order_key(os.path.join("guide", "part-1"), "hugo", bundles) == (
+            "hugo", os.path.join("guide", "part-1")
+        )
+        assert _write_order_key("guide", "obsidian", bundles) == ("obsidian", "guide")
+
+    def test_bundle_translations_share_its_key(self):
+        hugo_posts = {
+            "trip.en": Path("trip", "index.en.md"), "trip.fr": Path("trip", "index.fr.md")
+        }
+        assert _writes_bundle("trip.fr", "obsidian", hugo_posts, {}, {})
+        assert bundle_id("trip.fr", hugo_posts["trip.fr"]) == "trip"
+        bundles = {("obsidian", "trip")}
+        assert _write_order_key("trip", "obsidian", bundles) == ("obsidian", "trip")
+
 
 class TestPostId:
     """Test post ID generation."""
@@ -282,12 +1703,29 @@ class TestPostId:
 
         assert hugo_id == obsidian_id == "my-post"
 
+    def test_translation_post_ids_match(self):
+        """index.fr.md and folder/folder.fr.md are the same translation."""
+        hugo_post = self.temp_dir / "hugo" / "my-post" / "index.fr.md"
+        obs_post = self.temp_dir / "obsidian" / "my-post" / "my-post.fr.md"
+        for post in (hugo_post, obs_post):
+            post.parent.mkdir(parents=True)
+            post.touch()
+
+        assert get_post_id(hugo_post, self.temp_dir / "hugo") == "my-post.fr"
+        assert get_post_id(obs_post, self.temp_dir / "obsidian") == "my-post.fr"
+        assert _walked_post_id("my-post/index.fr.md", "hugo") == "my-post.fr"
+        assert _walked_post_id("my-post/my-post.fr.md", "obsidian") == "my-post.fr"
+        assert not is_bundle_post(self.temp_dir / "my-post" / "photo.fr.png")
+
 
 def run_tests():
     """Run all tests and report results."""
     import traceback
 
-    test_classes = [TestConverters, TestPostFormat, TestState, TestPostId]
+    test_classes = [
+        TestConverters, TestPostFormat, TestState, TestSyncRun, TestScan, TestAssetTransfer,
+        TestDurability, TestWatch, TestConversionCache, TestOverlappedIO, TestPostId,
+    ]
     passed = 0
     failed = 0
 
@@ -324,6 +1762,5 @@ def run_tests():
 
 
 if __name__ == "__main__":
-    import sys
     success = run_tests()
     sys.exit(0 if success else 1)
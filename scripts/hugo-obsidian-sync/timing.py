@@ -0,0 +1,137 @@
+"""
+Phase timing and I/O counters for Hugo-Obsidian sync.
+
+Modules wrap their work in `with phase("name"):` and report I/O with
+count(); both do nothing until start_recording() is called, which is
+what --stats and --stats-json do. Phase times are summed over every
+call, so a phase that runs inside another (hash inside scan) or on
+several worker threads is reported next to it rather than subtracted
+from it.
+"""
+
+import contextlib
+import threading
+import time
+from collections import Counter
+from typing import Dict, Iterator, List, Optional, Tuple
+
+# Phases timed inside the main ones; listed apart in the report
+DETAIL_PHASES = ("hash", "read", "convert", "write", "assets")
+
+
+class Recorder:
+    """Accumulated phase times, counters and per-post sync times of one run."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.phases: Dict[str, List[float]] = {}  # name -> [seconds, calls]
+        self.counters: Counter = Counter()
+        self.posts: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def add_time(self, name: str, seconds: float) -> None:
+        with self._lock:
+            entry = self.phases.setdefault(name, [0.0, 0])
+            entry[0] += seconds
+            entry[1] += 1
+
+    def add_count(self, name: str, amount: int) -> None:
+        with self._lock:
+            self.counters[name] += amount
+
+    def add_post(self, post_id: str, seconds: float) -> None:
+        with self._lock:
+            self.posts[post_id] = self.posts.get(post_id, 0.0) + seconds
+
+    def slowest_posts(self, top: int = 5) -> List[Tuple[str, float]]:
+        """Return the top (post_id, seconds) pairs, slowest first."""
+        return sorted(self.posts.items(), key=lambda item: (-item[1], item[0]))[:top]
+
+    def to_dict(self, top: int = 10) -> Dict:
+        """Return the metrics as JSON-compatible values."""
+        return {
+            "total_seconds": time.perf_counter() - self.started,
+            "phases": {
+                name: {"seconds": seconds, "calls": calls}
+                for name, (seconds, calls) in self.phases.items()
+            },
+            "counters": dict(sorted(self.counters.items())),
+            "slowest_posts": [
+                {"post_id": post_id, "seconds": seconds}
+                for post_id, seconds in self.slowest_posts(top)
+            ],
+        }
+
+
+_recorder: Optional[Recorder] = None
+
+
+def start_recording() -> Recorder:
+    """Start recording and return the new recorder."""
+    global _recorder
+    _recorder = Recorder()
+    return _recorder
+
+
+def stop_recording() -> None:
+    """Stop recording; phase(), post_timer() and count() become no-ops again."""
+    global _recorder
+    _recorder = None
+
+
+@contextlib.contextmanager
+def _timed(add, key: str) -> Iterator[None]:
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        add(key, time.perf_counter() - start)
+
+
+_NOT_RECORDING = contextlib.nullcontext()
+
+
+def phase(name: str):
+    """Context manager that adds its wall time to a phase."""
+    recorder = _recorder
+    if recorder is None:
+        return _NOT_RECORDING
+    return _timed(recorder.add_time, name)
+
+
+def post_timer(post_id: str):
+    """Context manager that adds its wall time to a post, for the outlier list."""
+    recorder = _recorder
+    if recorder is None:
+        return _NOT_RECORDING
+    return _timed(recorder.add_post, post_id)
+
+
+def count(name: str, amount: int = 1) -> None:
+    """Add amount to a counter while recording."""
+    recorder = _recorder
+    if recorder is not None:
+        recorder.add_count(name, amount)
+
+
+def format_report(recorder: Recorder, top: int = 5) -> str:
+    """Return the human-readable --stats report."""
+    metrics = recorder.to_dict(top)
+    lines = [f"Timing: {metrics['total_seconds']:.3f}s total"]
+    main = [(n, p) for n, p in metrics["phases"].items() if n not in DETAIL_PHASES]
+    detail = [(n, p) for n, p in metrics["phases"].items() if n in DETAIL_PHASES]
+    for name, entry in main:
+        lines.append(f"  {name:<14} {entry['seconds']:9.3f}s")
+    if detail:
+        lines.append("  within those (summed over calls and threads):")
+        for name, entry in detail:
+            lines.append(f"    {name:<12} {entry['seconds']:9.3f}s  {entry['calls']} calls")
+    if metrics["counters"]:
+        lines.append("Counters:")
+        for name, value in metrics["counters"].items():
+            lines.append(f"  {name:<18} {value:,}")
+    if metrics["slowest_posts"]:
+        lines.append("Slowest posts:")
+        for post in metrics["slowest_posts"]:
+            lines.append(f"  {post['seconds']:9.3f}s  {post['post_id']}")
+    return "\n".join(lines)
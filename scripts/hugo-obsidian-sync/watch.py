@@ -0,0 +1,230 @@
+"""
+File change watching for Hugo-Obsidian sync.
+
+On Linux, changes are read from inotify through ctypes; elsewhere (or with
+poll=True) directory trees are polled and compared by stat. Both watchers
+report changed paths: files that were created, modified, moved or
+deleted, and directories that appeared. watch_changes() debounces them
+into batches, so an editor's burst of writes becomes one sync.
+
+Both watchers take an ignored(path) predicate and prune the entries it
+matches while walking, so ignored trees such as .git get no inotify
+watches and are not polled.
+"""
+
+import ctypes
+import ctypes.util
+import os
+import select
+import struct
+import sys
+import time
+from pathlib import Path
+from typing import Callable, Dict, Iterator, List, Optional, Set, Tuple
+
+# inotify event masks from <sys/inotify.h>
+IN_MODIFY = 0x00000002
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ISDIR = 0x40000000
+IN_CLOEXEC = 0o2000000
+
+_WATCH_MASK = (
+    IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE
+    | IN_DELETE_SELF | IN_MOVE_SELF
+)
+
+# struct inotify_event header: wd, mask, cookie, len
+_EVENT_HEADER = struct.Struct("iIII")
+
+# Whether a file or directory is ignored, judged by the entry itself (the
+# walk has already pruned ignored directories above it)
+Ignored = Callable[[Path], bool]
+
+
+def _ignore_nothing(path: Path) -> bool:
+    return False
+
+
+def _walk(directory: Path, ignored: Ignored) -> Iterator[Tuple[Path, List[str]]]:
+    """Yield (directory, file names) for a tree, pruning ignored entries."""
+    for dirpath, dirnames, filenames in os.walk(directory):
+        path = Path(dirpath)
+        dirnames[:] = [name for name in dirnames if not ignored(path / name)]
+        yield path, [name for name in filenames if not ignored(path / name)]
+
+
+def _load_libc() -> Optional[ctypes.CDLL]:
+    if not sys.platform.startswith("linux"):
+        return None
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        libc.inotify_init1, libc.inotify_add_watch, libc.inotify_rm_watch
+    except (OSError, AttributeError):
+        return None
+    return libc
+
+
+_libc = _load_libc()
+
+
+def inotify_available() -> bool:
+    """Return whether inotify can be used on this system."""
+    return _libc is not None
+
+
+class InotifyWatcher:
+    """Watch directory trees with one inotify watch per directory."""
+
+    name = "inotify"
+
+    def __init__(self, roots: List[Path], ignored: Ignored = _ignore_nothing):
+        self.fd = _libc.inotify_init1(IN_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        self.roots = roots
+        self.ignored = ignored
+        self.dirs: Dict[int, Path] = {}
+        for root in roots:
+            self._add_tree(root)
+
+    def _add_tree(self, directory: Path) -> None:
+        if self.ignored(directory):
+            return
+        for path, _ in _walk(directory, self.ignored):
+            wd = _libc.inotify_add_watch(self.fd, os.fsencode(path), _WATCH_MASK)
+            if wd >= 0:
+                self.dirs[wd] = path
+
+    def _remove_tree(self, directory: Path) -> None:
+        for wd, path in list(self.dirs.items()):
+            if path == directory or directory in path.parents:
+                _libc.inotify_rm_watch(self.fd, wd)
+                del self.dirs[wd]
+
+    def read(self, timeout: Optional[float] = None) -> Set[Path]:
+        """Wait up to timeout seconds (forever if None) and return changed paths."""
+        ready, _, _ = select.select([self.fd], [], [], timeout)
+        if not ready:
+            return set()
+
+        changed = set()
+        data = os.read(self.fd, 64 * 1024)
+        offset = 0
+        while offset < len(data):
+            wd, mask, _, length = _EVENT_HEADER.unpack_from(data, offset)
+            offset += _EVENT_HEADER.size
+            name = os.fsdecode(data[offset:offset + length].rstrip(b"\0"))
+            offset += length
+
+            if mask & IN_Q_OVERFLOW:
+                # Events were lost: report the roots so they are rescanned
+                changed.update(self.roots)
+                continue
+            if mask & IN_IGNORED:
+                self.dirs.pop(wd, None)
+                continue
+            directory = self.dirs.get(wd)
+            if directory is None:
+                continue
+            path = directory / name if name else directory
+            changed.add(path)
+            if mask & IN_ISDIR and mask & IN_MOVED_FROM:
+                self._remove_tree(path)
+            if mask & IN_ISDIR and mask & (IN_CREATE | IN_MOVED_TO):
+                # Files created before the new watch exists are picked up by
+                # rescanning the reported directory
+                self._add_tree(path)
+        return changed
+
+    def close(self) -> None:
+        os.close(self.fd)
+
+
+Snapshot = Dict[Path, Tuple[int, int, int]]
+
+
+class PollingWatcher:
+    """Watch directory trees by comparing stat snapshots."""
+
+    name = "polling"
+
+    def __init__(
+        self, roots: List[Path], interval: float = 1.0, ignored: Ignored = _ignore_nothing
+    ):
+        self.roots = roots
+        self.interval = interval
+        self.ignored = ignored
+        self.snapshot = self._take_snapshot()
+
+    def _take_snapshot(self) -> Snapshot:
+        snapshot: Snapshot = {}
+        for root in self.roots:
+            for directory, filenames in _walk(root, self.ignored):
+                try:
+                    snapshot[directory] = (0, 0, os.stat(directory).st_ino)
+                except FileNotFoundError:
+                    continue
+                for filename in filenames:
+                    path = directory / filename
+                    try:
+                        st = path.stat()
+                    except FileNotFoundError:
+                        continue
+                    snapshot[path] = (st.st_size, st.st_mtime_ns, st.st_ino)
+        return snapshot
+
+    def read(self, timeout: Optional[float] = None) -> Set[Path]:
+        """Sleep for timeout seconds (the interval if None) and return changed paths."""
+        time.sleep(self.interval if timeout is None else timeout)
+        snapshot = self._take_snapshot()
+        changed = {
+            path for path, stat in snapshot.items() if self.snapshot.get(path) != stat
+        }
+        changed.update(path for path in self.snapshot if path not in snapshot)
+        self.snapshot = snapshot
+        return changed
+
+    def close(self) -> None:
+        pass
+
+
+def open_watcher(
+    roots: List[Path],
+    poll: bool = False,
+    interval: float = 1.0,
+    ignored: Ignored = _ignore_nothing,
+):
+    """Return an inotify watcher for roots, or a polling one if unavailable or poll is set.
+
+    Entries matching ignored are not watched.
+    """
+    if not poll and inotify_available():
+        try:
+            return InotifyWatcher(roots, ignored)
+        except OSError:
+            pass
+    return PollingWatcher(roots, interval, ignored)
+
+
+def watch_changes(watcher, debounce: float = 0.5) -> Iterator[Set[Path]]:
+    """Yield batches of changed paths from a watcher.
+
+    A batch is yielded once no new change has arrived for debounce seconds,
+    so repeated events for the same files are coalesced.
+    """
+    pending: Set[Path] = set()
+    while True:
+        changed = watcher.read(debounce if pending else None)
+        if changed:
+            pending |= changed
+        elif pending:
+            yield pending
+            pending = set()